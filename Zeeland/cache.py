@@ -0,0 +1,105 @@
+import os
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# Pickled size of the entries of each LRULocMemCache, per LOCATION as
+# LocMemCache keeps the entries themselves
+_sizes = {}
+_missing = object()
+
+
+def max_bytes(params):
+    value = params.get("OPTIONS", {}).get("MAX_BYTES")
+    return int(value) if value else None
+
+
+class LRULocMemCache(LocMemCache):
+    """
+    LocMemCache that also limits the pickled size of its entries with the
+    MAX_BYTES option. LocMemCache keeps its entries in the order they were
+    last read or written, the least recently used ones are evicted first.
+    Entries larger than the limit are not stored.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        self._max_bytes = max_bytes(params)
+        self._sizes = _sizes.setdefault(name, {})
+
+    def _set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self._delete(key)
+        if self._max_bytes and len(value) > self._max_bytes:
+            return
+        super()._set(key, value, timeout)
+        self._sizes[key] = len(value)
+        if self._max_bytes:
+            total = sum(self._sizes.values())
+            while total > self._max_bytes:
+                old_key, _ = self._cache.popitem()
+                self._expire_info.pop(old_key, None)
+                total -= self._sizes.pop(old_key, 0)
+
+    def _cull(self):
+        super()._cull()
+        for key in set(self._sizes) - set(self._cache):
+            del self._sizes[key]
+
+    def _delete(self, key):
+        self._sizes.pop(key, None)
+        return super()._delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._expire_info.clear()
+            self._sizes.clear()
+
+
+class LRUFileBasedCache(FileBasedCache):
+    """
+    FileBasedCache that evicts the least recently used files instead of
+    random ones, once MAX_ENTRIES or the MAX_BYTES option is reached. A hit
+    updates the modification time of its file, culling removes the oldest
+    files until both are below CULL_TARGET of their limit.
+    """
+
+    CULL_TARGET = 0.9
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._max_bytes = max_bytes(params)
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        if value is _missing:
+            return default
+        try:
+            os.utime(self._key_to_file(key, version))
+        except FileNotFoundError:
+            pass
+        return value
+
+    def _cull(self):
+        files = []
+        for fname in self._list_cache_files():
+            try:
+                stat = os.stat(fname)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, fname))
+        count = len(files)
+        size = sum(file_size for _, file_size, _ in files)
+        if count < self._max_entries and not (self._max_bytes and size > self._max_bytes):
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+
+        max_count = int(self._max_entries * self.CULL_TARGET)
+        max_size = int(self._max_bytes * self.CULL_TARGET) if self._max_bytes else None
+        for _, file_size, fname in sorted(files):
+            if count <= max_count and (max_size is None or size <= max_size):
+                break
+            if self._delete(fname):
+                count -= 1
+                size -= file_size
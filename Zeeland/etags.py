@@ -0,0 +1,73 @@
+import hashlib
+from django.db.models import Count, Max
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from projects.models import ProjectDataVersion
+
+
+class ConditionalListMixin:
+    """
+    Weak ETags for the list action of a viewset.
+
+    The ETag is computed from the row count, highest id and latest
+    ``etag_updated_field`` of the filtered queryset and from the data
+    version of the ``project`` parameter, which also covers the related
+    records the serializer reads. A request whose If-None-Match matches
+    gets 304 Not Modified without the list being loaded or serialized.
+    Lists without a project get no ETag.
+    """
+
+    etag_updated_field = "updated_at"
+    etag_project_param = "project"
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method == "GET" and self.action == "list":
+            # dispatch() looks the handler up after initial()
+            self.get = self.conditional(self.get)
+
+    def get_list_etag(self, request):
+        project_id = request.query_params.get(self.etag_project_param)
+        if not project_id or not project_id.isdigit():
+            return None
+        state = (
+            self.filter_queryset(self.get_queryset())
+            .order_by()
+            .aggregate(
+                count=Count("pk", distinct=True),
+                last_id=Max("pk"),
+                last_updated=Max(self.etag_updated_field),
+            )
+        )
+        parts = [
+            self.__class__.__name__,
+            project_id,
+            ProjectDataVersion.get_version(project_id),
+            state["count"],
+            state["last_id"],
+            state["last_updated"],
+        ]
+        digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+        return "W/" + quote_etag(digest)
+
+    def conditional(self, handler):
+        def run(request, *args, **kwargs):
+            etag = self.get_list_etag(request)
+            if etag is None:
+                return handler(request, *args, **kwargs)
+
+            # Weak comparison, the W/ prefixes are ignored
+            requested = {
+                value[2:] if value.startswith("W/") else value
+                for value in parse_etags(request.headers.get("If-None-Match", ""))
+            }
+            if "*" in requested or etag[2:] in requested:
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = handler(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response["ETag"] = etag
+            return response
+
+        return run
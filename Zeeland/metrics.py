@@ -0,0 +1,179 @@
+import heapq
+import logging
+import threading
+import time
+from collections import deque
+from django.conf import settings
+from django.db import connection
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_endpoints = {}
+
+
+class EndpointMetrics:
+    """Totals of an endpoint and its latest samples, kept for percentiles."""
+
+    def __init__(self, samples):
+        self.count = 0
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.response_bytes = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=samples)
+        self.query_counts = deque(maxlen=samples)
+
+    def add(self, seconds, queries, sql_seconds, response_bytes, status_code):
+        self.count += 1
+        self.queries += queries
+        self.sql_seconds += sql_seconds
+        self.response_bytes += response_bytes
+        self.errors += status_code >= 500
+        self.latencies.append(seconds)
+        self.query_counts.append(queries)
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "latency_ms": {
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "max": round(latencies[-1] * 1000, 2) if latencies else 0,
+            },
+            "queries": {
+                "avg": round(self.queries / self.count, 1) if self.count else 0,
+                "max": max(self.query_counts, default=0),
+            },
+            "sql_ms_avg": round(self.sql_seconds * 1000 / self.count, 2) if self.count else 0,
+            "response_bytes_avg": round(self.response_bytes / self.count) if self.count else 0,
+        }
+
+
+def percentile(sorted_seconds, percent):
+    if not sorted_seconds:
+        return 0
+    index = min(int(len(sorted_seconds) * percent / 100), len(sorted_seconds) - 1)
+    return round(sorted_seconds[index] * 1000, 2)
+
+
+def record(endpoint, seconds, queries, sql_seconds, response_bytes, status_code):
+    with _lock:
+        metrics = _endpoints.get(endpoint)
+        if metrics is None:
+            metrics = _endpoints[endpoint] = EndpointMetrics(
+                getattr(settings, "REQUEST_METRICS_SAMPLES", 1000)
+            )
+        metrics.add(seconds, queries, sql_seconds, response_bytes, status_code)
+
+
+def get_metrics():
+    with _lock:
+        return {endpoint: metrics.summary() for endpoint, metrics in sorted(_endpoints.items())}
+
+
+def reset_metrics():
+    with _lock:
+        _endpoints.clear()
+
+
+class QueryTimer:
+    """Database execute wrapper counting the queries of a request."""
+
+    def __init__(self, keep=3):
+        self.count = 0
+        self.seconds = 0.0
+        self.keep = keep
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.seconds += duration
+            if len(self.slowest) < self.keep:
+                heapq.heappush(self.slowest, (duration, self.count, sql))
+            elif duration > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (duration, self.count, sql))
+
+
+class RequestMetricsMiddleware:
+    """
+    Record latency, SQL queries and response size per URL pattern and log
+    the requests slower than SLOW_REQUEST_THRESHOLD_MS with their slowest
+    statements.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+
+        if response.streaming and not response.is_async:
+            # Streamed rows are read while the server sends the response,
+            # record it once the content is exhausted or closed
+            response.streaming_content = self.stream(
+                request, response, response.streaming_content, timer, started
+            )
+        else:
+            response_bytes = 0 if response.streaming else len(response.content)
+            self.finish(request, response, timer, time.perf_counter() - started, response_bytes)
+        return response
+
+    def stream(self, request, response, content, timer, started):
+        response_bytes = 0
+        try:
+            with connection.execute_wrapper(timer):
+                for chunk in content:
+                    response_bytes += len(chunk)
+                    yield chunk
+        finally:
+            self.finish(request, response, timer, time.perf_counter() - started, response_bytes)
+
+    def finish(self, request, response, timer, seconds, response_bytes):
+        match = getattr(request, "resolver_match", None)
+        route = (match.url_name or match.route) if match else "<unresolved>"
+        endpoint = f"{request.method} {route}"
+        record(endpoint, seconds, timer.count, timer.seconds, response_bytes, response.status_code)
+
+        threshold = getattr(settings, "SLOW_REQUEST_THRESHOLD_MS", 1000)
+        if threshold is not None and seconds * 1000 > threshold:
+            statements = "\n".join(
+                f"  {duration * 1000:.1f} ms: {sql[:500]}"
+                for duration, number, sql in sorted(timer.slowest, reverse=True)
+            )
+            logger.warning(
+                "Slow request %s %s: %.0f ms, %d queries in %.0f ms\n%s",
+                request.method,
+                request.get_full_path(),
+                seconds * 1000,
+                timer.count,
+                timer.seconds * 1000,
+                statements,
+            )
+
+
+class RequestMetricsView(APIView):
+    """Metrics of this process per endpoint, DELETE starts them over."""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_metrics())
+
+    def delete(self, request):
+        reset_metrics()
+        return Response(status=204)
@@ -0,0 +1,149 @@
+import io
+from datetime import date
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from booking.models import Booking, PlotResale
+from customer.models import (
+    CustomerMessages,
+    CustomerMessagesDocuments,
+    CustomerMessagesReminder,
+    Customers,
+    Dealers,
+    DealersDocuments,
+    Department,
+)
+from payments.models import (
+    Bank,
+    BankTransfer,
+    BankTransferDocuments,
+    ExpensePerson,
+    ExpenseType,
+    JournalVoucher,
+    PaymentReminder,
+    PaymentReminderDocuments,
+)
+from projects.models import BalanceSheet, BalanceSheetAmountDetails, BalanceSheetDetails, Projects
+
+API_PREFIX = "/api/"
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    Seed a small and a large project and check that endpoints run at most
+    a fixed number of queries for both, i.e. that the serializers find
+    their relations prefetched instead of querying them per row.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("budget", "budget@example.com", "budget")
+        call_command("generate_dataset", scale=0.03, months=3, seed=1, stdout=io.StringIO())
+        call_command("generate_dataset", scale=0.1, months=8, seed=2, stdout=io.StringIO())
+        cls.small, cls.large = Projects.objects.order_by("id")
+        for project in (cls.small, cls.large):
+            cls.add_documents(project)
+
+    @classmethod
+    def add_documents(cls, project):
+        """The documents generate_dataset leaves out, a few per booking."""
+        department = Department.objects.create(name=f"Sales {project.id}")
+        Customers.objects.filter(project=project, reference="employee").update(
+            department=department
+        )
+        bookings = list(Booking.objects.filter(project=project).prefetch_related("plots"))
+        banks = list(Bank.objects.filter(project=project, account_type="Bank"))
+
+        for n, booking in enumerate(bookings):
+            reminder = PaymentReminder.objects.create(
+                project=project, booking=booking, reminder_date=date.today(), user=cls.user
+            )
+            PaymentReminderDocuments.objects.create(
+                reminder=reminder, file="reminder.pdf", description="Reminder", type="pdf"
+            )
+            message = CustomerMessages.objects.create(
+                user=cls.user, booking=booking, date=date.today()
+            )
+            CustomerMessagesDocuments.objects.create(
+                message=message, file="message.pdf", description="Message", type="pdf"
+            )
+            CustomerMessagesReminder.objects.create(message=message, date=date.today())
+            dealer = Dealers.objects.create(project=project, date=date.today(), name=f"Dealer {n}")
+            DealersDocuments.objects.create(
+                dealer=dealer, file="dealer.pdf", description="Dealer", type="pdf"
+            )
+            ExpensePerson.objects.create(project=project, name=f"Person {n}", date=date.today())
+            JournalVoucher.objects.create(
+                project=project, type="debit", date=date.today(), amount=1000
+            )
+            transfer = BankTransfer.objects.create(
+                project=project,
+                date=date.today(),
+                transfer_from=banks[0],
+                transfer_to=banks[-1],
+                amount=1000,
+            )
+            BankTransferDocuments.objects.create(
+                bank_transfer=transfer, file="transfer.pdf", description="Transfer", type="pdf"
+            )
+
+            # Every third booking is resold and its plots booked again
+            if n % 3 == 0:
+                PlotResale.objects.create(date=date.today(), booking=booking)
+                Booking.objects.filter(pk=booking.pk).update(status="close")
+                plots = list(booking.plots.all())
+                booking.pk = None
+                booking._state.adding = True
+                booking.booking_id = f"{booking.booking_id}-R"
+                booking.save()
+                booking.plots.set(plots)
+
+        ExpenseType.objects.create(name=f"Type {project.id}")
+        balance_sheet = BalanceSheet.objects.create(user=cls.user, date=date.today())
+        for name in ("Assets", "Liabilities"):
+            detail = BalanceSheetDetails.objects.create(balance_sheet=balance_sheet, detail=name)
+            BalanceSheetAmountDetails.objects.create(detail=detail, project=project, amount=1000)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def project_params(self, project):
+        return {
+            "project": project.id,
+            "project_id": project.id,
+            "start_date": "2000-01-01",
+            "end_date": "2100-12-31",
+        }
+
+    def count_queries(self, path, params):
+        for cache in caches.all():
+            cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(API_PREFIX + path, params)
+        self.assertEqual(response.status_code, 200, f"GET {path}: {response.content[:300]}")
+        return len(queries)
+
+    def assertQueryBudget(self, budget, path, params=None):
+        """
+        GET path for the small and the large project, params(project) adds
+        to the project and period parameters.
+        """
+        for project in (self.small, self.large):
+            query_params = self.project_params(project)
+            if params:
+                query_params.update(params(project))
+            count = self.count_queries(path, query_params)
+            self.assertLessEqual(
+                count, budget, f"GET {path} of project {project.id} ran {count} queries"
+            )
+
+    def assertDetailQueryBudget(self, budget, path, queryset):
+        """GET path<id>/ for the first and the last object of queryset."""
+        for pk in (queryset.order_by("pk").first().pk, queryset.order_by("pk").last().pk):
+            count = self.count_queries(f"{path}{pk}/", self.project_params(self.large))
+            self.assertLessEqual(count, budget, f"GET {path}{pk}/ ran {count} queries")
@@ -23,6 +23,7 @@ from rest_framework_simplejwt.views import (
 )
 from django.conf import settings
 from django.conf.urls.static import static
+from .metrics import RequestMetricsView
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -36,5 +37,6 @@ urlpatterns = [
     path("api/", include("user.urls")),
     path("api/", include("payments.urls")),
     path("api/", include("reports.urls")),
+    path("api/metrics/", RequestMetricsView.as_view(), name="request_metrics"),
 ]
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
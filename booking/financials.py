@@ -0,0 +1,214 @@
+import datetime
+from django.db import transaction
+from django.db.models import F, FloatField, Max, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from payments.models import IncomingFund
+from projects.models import ProjectDataVersion
+from .models import Booking, BookingFinancials
+
+# Incoming fund reference: the BookingFinancials total it is counted in
+FUND_TOTALS = {
+    "payment": "paid_amount",
+    "refund": "refunded_amount",
+    "Discount": "discount_amount",
+}
+FUND_VALUES = ("booking_id", "reference", "amount", "date")
+TOTAL_FIELDS = tuple(FUND_TOTALS.values())
+FINANCIAL_FIELDS = TOTAL_FIELDS + ("token_amount", "last_payment_date")
+
+
+def _as_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value[:10])
+    return value
+
+
+def fund_state(fund):
+    """The values of an incoming fund BookingFinancials depends on."""
+    return {field: getattr(fund, field) for field in FUND_VALUES}
+
+
+def token_amount(token):
+    """Amount a booking has received through its token, none once refunded."""
+    if token is None or token.status == "refunded":
+        return 0.0
+    return float(token.amount)
+
+
+def collect_fund_changes(rows, sign=1, changes=None):
+    """
+    Accumulate the deltas of ``rows`` (dicts of FUND_VALUES) into
+    {booking_id: {total field: delta, "latest_payment": date,
+    "payment_removed": bool}}.
+    """
+    if changes is None:
+        changes = {}
+    for row in rows:
+        field = FUND_TOTALS.get(row["reference"])
+        if field is None or not row["booking_id"]:
+            continue
+        change = changes.setdefault(
+            row["booking_id"],
+            {
+                **dict.fromkeys(TOTAL_FIELDS, 0.0),
+                "latest_payment": None,
+                "payment_removed": False,
+            },
+        )
+        change[field] += sign * float(row["amount"] or 0)
+        if row["reference"] != "payment":
+            continue
+        if sign < 0:
+            change["payment_removed"] = True
+        else:
+            payment_date = _as_date(row["date"])
+            if change["latest_payment"] is None or payment_date > change["latest_payment"]:
+                change["latest_payment"] = payment_date
+    return changes
+
+
+def latest_payment_date(booking_id):
+    return (
+        IncomingFund.objects.filter(booking_id=booking_id, reference="payment")
+        .order_by()
+        .values("booking_id")
+        .annotate(latest=Max("date"))
+        .values("latest")
+    )
+
+
+def apply_fund_changes(changes):
+    """Add the deltas built by collect_fund_changes to BookingFinancials."""
+    for booking_id, change in changes.items():
+        values = {
+            field: F(field) + change[field] for field in TOTAL_FIELDS if change[field]
+        }
+        # The removed payment may have been the latest one
+        if change["payment_removed"]:
+            values["last_payment_date"] = Subquery(latest_payment_date(booking_id))
+        financials = BookingFinancials.objects.filter(booking_id=booking_id)
+        if values and not financials.update(**values, updated_at=timezone.now()):
+            # The funds already include this change, the new row is built from them
+            rebuild_booking_financials(booking_ids=[booking_id])
+            continue
+        if change["latest_payment"] and not change["payment_removed"]:
+            financials.filter(
+                Q(last_payment_date__isnull=True)
+                | Q(last_payment_date__lt=change["latest_payment"])
+            ).update(
+                last_payment_date=change["latest_payment"], updated_at=timezone.now()
+            )
+
+
+def update_token_amount(booking):
+    """Store the token amount of a booking after its token was changed."""
+    amount = token_amount(booking.token)
+    updated = BookingFinancials.objects.filter(booking=booking).update(
+        token_amount=amount, updated_at=timezone.now()
+    )
+    if not updated:
+        rebuild_booking_financials(booking_ids=[booking.pk])
+
+
+def get_booking_financials(booking_id):
+    """BookingFinancials of a booking, built from its funds if it has none yet."""
+    financials = BookingFinancials.objects.filter(booking_id=booking_id).first()
+    if financials is None:
+        rebuild_booking_financials(booking_ids=[booking_id])
+        financials = BookingFinancials.objects.get(booking_id=booking_id)
+    return financials
+
+
+def financial_totals(bookings):
+    """{booking_id: BookingFinancials values} computed from funds and tokens."""
+    totals = {}
+    for row in bookings.order_by().values("id", "token__amount", "token__status").iterator():
+        totals[row["id"]] = {
+            **dict.fromkeys(TOTAL_FIELDS, 0.0),
+            "token_amount": (
+                float(row["token__amount"])
+                if row["token__amount"] is not None and row["token__status"] != "refunded"
+                else 0.0
+            ),
+            "last_payment_date": None,
+        }
+
+    zero = Value(0.0, output_field=FloatField())
+    # Prefixed, IncomingFund has a discount_amount field of its own
+    funds = (
+        IncomingFund.objects.filter(booking__in=bookings.values("id"))
+        .values("booking_id")
+        .annotate(
+            latest_payment=Max("date", filter=Q(reference="payment")),
+            **{
+                f"total_{field}": Coalesce(
+                    Sum("amount", filter=Q(reference=reference)), zero
+                )
+                for reference, field in FUND_TOTALS.items()
+            },
+        )
+        .order_by()
+    )
+    for row in funds.iterator():
+        values = totals.get(row["booking_id"])
+        if values is None:
+            continue
+        for field in TOTAL_FIELDS:
+            values[field] = row[f"total_{field}"]
+        values["last_payment_date"] = row["latest_payment"]
+    return totals
+
+
+def _differs(stored, expected):
+    if isinstance(expected, float):
+        return abs((stored or 0) - expected) > 0.005
+    return stored != expected
+
+
+def rebuild_booking_financials(project_id=None, booking_ids=None, check_only=False, batch_size=1000):
+    """
+    Compare BookingFinancials with the incoming funds and tokens of the
+    bookings and write the rows that are missing or differ, unless
+    check_only. Returns the ids of those bookings.
+    """
+    bookings = Booking.objects.all()
+    if project_id:
+        bookings = bookings.filter(project_id=project_id)
+    if booking_ids is not None:
+        bookings = bookings.filter(pk__in=booking_ids)
+
+    with transaction.atomic():
+        stored = BookingFinancials.objects.filter(booking__in=bookings.values("id"))
+        if not check_only:
+            # Funds posted meanwhile wait and then add to the rebuilt rows
+            stored = stored.select_for_update()
+        stored = {financials.booking_id: financials for financials in stored}
+
+        missing = []
+        drifted = []
+        now = timezone.now()
+        for booking_id, values in financial_totals(bookings).items():
+            financials = stored.get(booking_id)
+            if financials is None:
+                missing.append(BookingFinancials(booking_id=booking_id, **values))
+            elif any(_differs(getattr(financials, field), value) for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(financials, field, value)
+                financials.updated_at = now
+                drifted.append(financials)
+
+        if not check_only:
+            BookingFinancials.objects.bulk_create(missing, batch_size=batch_size)
+            BookingFinancials.objects.bulk_update(
+                drifted, FINANCIAL_FIELDS + ("updated_at",), batch_size=batch_size
+            )
+            if drifted:
+                ProjectDataVersion.bump_on_commit(
+                    *Booking.objects.filter(
+                        pk__in=[financials.booking_id for financials in drifted]
+                    ).values_list("project_id", flat=True)
+                )
+    return [financials.booking_id for financials in missing + drifted]
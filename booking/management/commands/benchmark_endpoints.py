@@ -0,0 +1,232 @@
+import json
+import statistics
+import time
+import tracemalloc
+from datetime import date, datetime
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from booking.models import Booking
+from customer.models import Customers, Dealers
+from payments.models import Bank
+from payments.urls import router, urlpatterns as payments_urlpatterns
+from projects.models import Projects
+from reports.urls import urlpatterns as reports_urlpatterns
+
+API_PREFIX = "/api/"
+
+# path: extra query parameters, filled from the sample documents of the project
+ENDPOINT_PARAMS = {
+    "dealer-ledger/": {"dealer_id": "dealer"},
+    "customer-ledger/": {"customer_id": "customer"},
+    "vendor-ledger/": {"vendor_id": "vendor"},
+    "employee-ledger/": {"employee_id": "employee"},
+    "plot-ledger/": {"plot_id": "plot"},
+    "v2/bank-transactions/": {"bank_id": "bank"},
+    "incoming-cheque-report/": {"bank_id": "bank"},
+    "outgoing-cheque-report/": {"bank_id": "bank"},
+}
+TIME_SERIES_PARAMS = {"source": "incoming", "granularity": "month"}
+# Outside INTERNAL_IPS, so the debug toolbar does not answer the requests
+CLIENT_REMOTE_ADDR = "192.0.2.1"
+
+
+def benchmark_client():
+    """Test client authenticated as the first superuser, the admin endpoints need one."""
+    user = User.objects.filter(is_superuser=True).order_by("id").first()
+    if user is None:
+        raise CommandError(
+            "No superuser found, create one with createsuperuser or run generate_dataset."
+        )
+    client = APIClient(raise_request_exception=False, REMOTE_ADDR=CLIENT_REMOTE_ADDR)
+    client.force_authenticate(user)
+    return client
+
+
+def clear_caches():
+    """Empty every cache alias, reports are cached apart from the default cache."""
+    for alias_cache in caches.all():
+        alias_cache.clear()
+
+
+def list_endpoints():
+    """Paths of every reports and payments endpoint that lists without an id."""
+    paths = [str(pattern.pattern) for pattern in reports_urlpatterns]
+    paths += [f"{prefix}/" for prefix, viewset, basename in router.registry]
+    paths += [
+        str(pattern.pattern)
+        for pattern in payments_urlpatterns
+        if not hasattr(pattern, "url_patterns")
+    ]
+    return [path for path in paths if "<" not in path]
+
+
+class Command(BaseCommand):
+    help = (
+        "Call every reports and payments list endpoint through the test client "
+        "and write wall time, query count and peak memory of each to a JSON file. "
+        "Use generate_dataset to create the data first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--project", type=int, help="Defaults to the largest project")
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--months", type=int, default=12, help="Report period up to today")
+        parser.add_argument("--output", help="JSON file, defaults to benchmark-<time>.json")
+        parser.add_argument("--compare", help="JSON file of an earlier run to compare with")
+        parser.add_argument("--endpoint", action="append", help="Only run these paths")
+
+    def handle(self, *args, **options):
+        project = self.get_project(options["project"])
+        sample = self.get_sample(project)
+        end_date = date.today()
+        params = {
+            "project": project.id,
+            "project_id": project.id,
+            "start_date": str(end_date - relativedelta(months=options["months"])),
+            "end_date": str(end_date),
+        }
+
+        client = benchmark_client()
+
+        results = {}
+        failed = []
+        for path in options["endpoint"] or list_endpoints():
+            endpoint_params = dict(params)
+            for name, document in ENDPOINT_PARAMS.get(path, {}).items():
+                if sample[document]:
+                    endpoint_params[name] = sample[document]
+            if path == "time-series/":
+                endpoint_params.update(TIME_SERIES_PARAMS)
+            # The test client sends its requests to "testserver"
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+                result = self.measure(client, API_PREFIX + path, endpoint_params, options["repeat"])
+            results[path] = result
+            if "error" in result:
+                failed.append(path)
+                self.stdout.write(
+                    self.style.ERROR(f"{path:<32} {result['status']} {result['error']}")
+                )
+                continue
+            self.stdout.write(
+                f"{path:<32} {result['status']} {result['wall_ms']['median']:9.1f} ms "
+                f"{result['queries']:5} queries {result['peak_memory_kb']:9.1f} KB"
+            )
+
+        report = {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "database": connection.vendor,
+            "project": project.id,
+            "repeat": options["repeat"],
+            "params": params,
+            "results": results,
+        }
+        output = options["output"] or f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json"
+        with open(output, "w") as file:
+            json.dump(report, file, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+
+        if options["compare"]:
+            self.compare(options["compare"], results)
+        if failed:
+            raise CommandError(f"{len(failed)} endpoints failed: {', '.join(failed)}")
+
+    def get_project(self, project_id):
+        if project_id:
+            return Projects.objects.get(pk=project_id)
+        project_id = (
+            Booking.objects.values("project_id")
+            .order_by()
+            .annotate(count=Count("id"))
+            .order_by("-count")
+            .values_list("project_id", flat=True)
+            .first()
+        )
+        if not project_id:
+            raise CommandError("No bookings found, run generate_dataset first.")
+        return Projects.objects.get(pk=project_id)
+
+    def get_sample(self, project):
+        """Ids of the documents the ledger endpoints are called for."""
+        booking = (
+            Booking.objects.filter(project=project)
+            .order_by("-total_receiving_amount")
+            .first()
+        )
+        people = Customers.objects.filter(project=project)
+        dealer = (
+            Booking.objects.filter(project=project, dealer__isnull=False)
+            .values_list("dealer_id", flat=True)
+            .first()
+            or people.filter(reference="dealer").values_list("id", flat=True).first()
+            or Dealers.objects.filter(project=project).values_list("id", flat=True).first()
+        )
+        return {
+            "customer": booking.customer_id if booking else None,
+            "plot": booking.plots.values_list("id", flat=True).first() if booking else None,
+            "dealer": dealer,
+            "vendor": people.filter(reference="vendor").values_list("id", flat=True).first(),
+            "employee": people.filter(reference="employee").values_list("id", flat=True).first(),
+            "bank": Bank.objects.filter(project=project, account_type="Bank")
+            .values_list("id", flat=True)
+            .first(),
+        }
+
+    def measure(self, client, path, params, repeat):
+        """Timings of a GET, or its status and error if it did not succeed."""
+        timings = []
+        for _ in range(repeat):
+            clear_caches()
+            queries = []
+            # The test client resets connection.queries on each request
+            with connection.execute_wrapper(
+                lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)
+            ):
+                started = time.perf_counter()
+                response = client.get(path, params)
+                timings.append((time.perf_counter() - started) * 1000)
+            if not 200 <= response.status_code < 300:
+                return {
+                    "status": response.status_code,
+                    "error": response.content[:300].decode(errors="replace"),
+                }
+
+        # Tracing allocations slows the request down, measure memory apart
+        clear_caches()
+        tracemalloc.start()
+        client.get(path, params)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return {
+            "status": response.status_code,
+            "wall_ms": {
+                "min": round(min(timings), 2),
+                "median": round(statistics.median(timings), 2),
+                "max": round(max(timings), 2),
+            },
+            "queries": len(queries),
+            "peak_memory_kb": round(peak / 1024, 1),
+            "response_bytes": len(response.content),
+        }
+
+    def compare(self, path, results):
+        with open(path) as file:
+            previous = json.load(file)["results"]
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\nCompared with {path}"))
+        for endpoint, result in results.items():
+            before = previous.get(endpoint)
+            if not before or "error" in before or "error" in result:
+                continue
+            before_ms = before["wall_ms"]["median"]
+            after_ms = result["wall_ms"]["median"]
+            self.stdout.write(
+                f"{endpoint:<32} {before_ms:9.1f} -> {after_ms:9.1f} ms "
+                f"({(after_ms - before_ms) / before_ms * 100 if before_ms else 0:+.0f}%) "
+                f"{before['queries']:5} -> {result['queries']:5} queries"
+            )
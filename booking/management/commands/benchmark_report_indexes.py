@@ -0,0 +1,250 @@
+import time
+from datetime import date
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from booking.models import Booking
+from payments.models import Bank, BankTransaction, IncomingFund
+from projects.models import Projects
+from .benchmark_endpoints import benchmark_client, clear_caches
+
+# model: names of the indexes added for the report queries
+REPORT_INDEXES = {
+    BankTransaction: [
+        "bank_tx_related_idx",
+        "bank_tx_project_bank_date_idx",
+        "bank_tx_bank_cleared_date_idx",
+    ],
+    IncomingFund: [
+        "fund_project_document_idx",
+        "fund_booking_reference_idx",
+        "fund_project_date_idx",
+    ],
+    Booking: ["booking_project_status_idx"],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the report endpoints and queries with and without the report "
+        "indexes on a project created by generate_dataset. It drops and "
+        "recreates those indexes, so it only runs with --scratch, against a "
+        "scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--project", type=int, help="Measure this project instead of generating one"
+        )
+        parser.add_argument(
+            "--scale", type=float, default=20, help="generate_dataset scale of the new project"
+        )
+        parser.add_argument("--months", type=int, default=24, help="Months of generated history")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument(
+            "--scratch",
+            action="store_true",
+            help="Confirm that the database is a scratch copy the indexes may be dropped from",
+        )
+
+    def handle(self, *args, **options):
+        if not options["scratch"]:
+            raise CommandError(
+                "This command generates data and drops the report indexes, pass "
+                "--scratch to confirm that the database is a scratch copy."
+            )
+        self.repeat = options["repeat"]
+        self.end_date = date.today()
+        self.start_date = self.end_date - relativedelta(months=options["months"])
+        project = self.get_project(options)
+        sample = self.get_sample(project)
+
+        present = self.present_indexes()
+        if present:
+            self.drop_indexes(present)
+            try:
+                before = self.measure(project, sample, "without report indexes")
+            finally:
+                self.create_indexes(present)
+            after = self.measure(project, sample, "with report indexes")
+            self.print_comparison(before, after)
+        else:
+            self.stdout.write(
+                self.style.WARNING("Report indexes not found, run the migrations first.")
+            )
+            self.measure(project, sample, "current schema")
+
+    def get_project(self, options):
+        if options["project"]:
+            return Projects.objects.get(pk=options["project"])
+        self.stdout.write("Generating benchmark data...")
+        call_command(
+            "generate_dataset",
+            scale=options["scale"],
+            months=options["months"],
+            seed=options["seed"],
+            stdout=self.stdout,
+        )
+        return Projects.objects.order_by("-id").first()
+
+    def get_sample(self, project):
+        """Documents in the middle of the project the queries are run for."""
+        bookings = Booking.objects.filter(project=project).order_by("id")
+        booking = bookings[bookings.count() // 2]
+        payments = IncomingFund.objects.filter(project=project).order_by("id")
+        return {
+            "booking": booking,
+            "customer": booking.customer,
+            "plot": booking.plots.first(),
+            "payment": payments[payments.count() // 2],
+            # Cheques are received on the bank account
+            "bank": Bank.objects.get(project=project, name="Bank Account"),
+        }
+
+    def endpoints(self, project, sample):
+        period = {"start_date": str(self.start_date), "end_date": str(self.end_date)}
+        project_period = {"project_id": project.id, **period}
+        return [
+            ("/api/incoming-fund-report/", project_period),
+            ("/api/incoming-payment-report/", project_period),
+            ("/api/incoming-cheque-report/", {**project_period, "bank_id": sample["bank"].id}),
+            ("/api/dashboard-summary/", {"project_id": project.id}),
+            ("/api/monthly-incoming-fund/", {"project_id": project.id}),
+            ("/api/customer-ledger/", {**project_period, "customer_id": sample["customer"].id}),
+            ("/api/plot-ledger/", {**period, "plot_id": sample["plot"].id}),
+            ("/api/balance-report/", project_period),
+            ("/api/profit-report/", project_period),
+            (
+                "/api/v2/bank-transactions/",
+                {"project": project.id, "bank_id": sample["bank"].id, **period},
+            ),
+        ]
+
+    def query_shapes(self, project, sample):
+        booking = sample["booking"]
+        return [
+            (
+                "bank transactions of a document",
+                BankTransaction.objects.filter(
+                    related_table="incoming_funds", related_id=sample["payment"].id
+                ),
+            ),
+            (
+                "account statement",
+                BankTransaction.objects.filter(
+                    project=project,
+                    bank=sample["bank"],
+                    transaction_date__range=[
+                        self.end_date - relativedelta(months=6),
+                        self.end_date,
+                    ],
+                ),
+            ),
+            (
+                "uncleared cheques",
+                BankTransaction.objects.filter(
+                    bank=sample["bank"],
+                    is_cheque_clear=False,
+                    transaction_date__lte=self.end_date,
+                ),
+            ),
+            (
+                "payment by document number",
+                IncomingFund.objects.filter(
+                    project=project, document_number=sample["payment"].document_number
+                ),
+            ),
+            (
+                "payments of a booking",
+                IncomingFund.objects.filter(booking=booking, reference="payment"),
+            ),
+            (
+                "payments in a period",
+                IncomingFund.objects.filter(
+                    project=project,
+                    date__range=[self.end_date - relativedelta(months=1), self.end_date],
+                ),
+            ),
+            (
+                "due installments",
+                Booking.objects.filter(
+                    project=project,
+                    status="active",
+                    booking_type="installment_payment",
+                    installment_date=booking.installment_date,
+                ),
+            ),
+        ]
+
+    def measure(self, project, sample, label):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n{label}"))
+        client = benchmark_client()
+        results = {}
+        for path, params in self.endpoints(project, sample):
+            timings = []
+            for _ in range(self.repeat):
+                clear_caches()
+                queries = []
+                # The test client resets connection.queries on each request
+                with connection.execute_wrapper(
+                    lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)
+                ), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+                    started = time.perf_counter()
+                    response = client.get(path, params)
+                    timings.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise CommandError(
+                        f"GET {path} returned {response.status_code}: {response.content[:300]!r}"
+                    )
+            results[path] = min(timings)
+            self.stdout.write(
+                f"{path:<40} {response.status_code} {min(timings) * 1000:9.1f} ms "
+                f"{len(queries):4} queries"
+            )
+
+        for name, queryset in self.query_shapes(project, sample):
+            timings = []
+            for _ in range(self.repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append(time.perf_counter() - started)
+            results[name] = min(timings)
+            self.stdout.write(f"{name:<40} {min(timings) * 1000:9.1f} ms")
+            self.stdout.write(f"    {queryset.explain()}".replace("\n", "\n    "))
+        return results
+
+    def print_comparison(self, before, after):
+        self.stdout.write(self.style.MIGRATE_HEADING("\nSpeedup"))
+        for name, seconds in after.items():
+            speedup = before[name] / seconds if seconds else 0
+            self.stdout.write(
+                f"{name:<40} {before[name] * 1000:9.1f} ms -> {seconds * 1000:9.1f} ms "
+                f"({speedup:.1f}x)"
+            )
+
+    def present_indexes(self):
+        """(model, index) of the report indexes that exist in the database."""
+        present = []
+        with connection.cursor() as cursor:
+            for model, names in REPORT_INDEXES.items():
+                constraints = connection.introspection.get_constraints(
+                    cursor, model._meta.db_table
+                )
+                for index in model._meta.indexes:
+                    if index.name in names and index.name in constraints:
+                        present.append((model, index))
+        return present
+
+    def drop_indexes(self, indexes):
+        with connection.schema_editor() as schema_editor:
+            for model, index in indexes:
+                schema_editor.remove_index(model, index)
+
+    def create_indexes(self, indexes):
+        with connection.schema_editor() as schema_editor:
+            for model, index in indexes:
+                schema_editor.add_index(model, index)
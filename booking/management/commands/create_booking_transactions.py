@@ -1,7 +1,8 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from booking.models import Booking
-from payments.models import BankTransaction, Bank
+from payments.models import BankTransaction
+from payments.accounts import get_account_id
 
 class Command(BaseCommand):
     help = 'Generate bank transactions for all existing bookings'
@@ -27,13 +28,11 @@ class Command(BaseCommand):
         plot_cost = sum(plot.cost_price for plot in booking.plots.all())
 
 
-        account_receivable_bank = Bank.objects.filter(
-            used_for="Account_Receivable", project=project
-        ).first()
-        if account_receivable_bank:
+        account_receivable_bank_id = get_account_id(project, "Account_Receivable")
+        if account_receivable_bank_id:
             BankTransaction.objects.create(
                 project=project,
-                bank=account_receivable_bank,
+                bank_id=account_receivable_bank_id,
                 transaction_type="Booking",
                 payment=0,
                 deposit=booking_amount,
@@ -43,13 +42,11 @@ class Command(BaseCommand):
             )
 
 
-        sale_bank = Bank.objects.filter(
-            used_for="Sale_Account", project=project
-        ).first()
-        if sale_bank:
+        sale_bank_id = get_account_id(project, "Sale_Account")
+        if sale_bank_id:
             BankTransaction.objects.create(
                 project=project,
-                bank=sale_bank,
+                bank_id=sale_bank_id,
                 transaction_type="Booking",
                 deposit=booking_amount,
                 payment=0,
@@ -58,13 +55,11 @@ class Command(BaseCommand):
                 related_id=booking.id,
             )
 
-        cogs_bank = Bank.objects.filter(
-            used_for="Cost_of_Good_Sold", project=project
-        ).first()
-        if cogs_bank:
+        cogs_bank_id = get_account_id(project, "Cost_of_Good_Sold")
+        if cogs_bank_id:
             BankTransaction.objects.create(
                 project=project,
-                bank=cogs_bank,
+                bank_id=cogs_bank_id,
                 transaction_type="Booking",
                 payment=0,
                 deposit=plot_cost,
@@ -74,13 +69,11 @@ class Command(BaseCommand):
             )
 
 
-        land_inventory_bank = Bank.objects.filter(
-            used_for="Land_Inventory", project=project
-        ).first()
-        if land_inventory_bank:
+        land_inventory_bank_id = get_account_id(project, "Land_Inventory")
+        if land_inventory_bank_id:
             BankTransaction.objects.create(
                 project=project,
-                bank=land_inventory_bank,
+                bank_id=land_inventory_bank_id,
                 transaction_type="Booking",
                 deposit=0,
                 payment=plot_cost,
@@ -91,13 +84,11 @@ class Command(BaseCommand):
 
         # Advance payment (credit - account receivable) (debit - bank)
         if advance_amount > 0:
-            account_receivable_bank = Bank.objects.filter(
-                used_for="Account_Receivable", project=project
-            ).first()
-            if account_receivable_bank:
+            account_receivable_bank_id = get_account_id(project, "Account_Receivable")
+            if account_receivable_bank_id:
                 BankTransaction.objects.create(
                     project=project,
-                    bank=account_receivable_bank,
+                    bank_id=account_receivable_bank_id,
                     transaction_type="Booking_Advance",
                     payment=advance_amount,
                     deposit=0,
@@ -108,16 +99,12 @@ class Command(BaseCommand):
 
 
         # Dealer Comission (credit - account payable) (debit - dealer expense)
-        account_payable_bank = Bank.objects.filter(
-            used_for="Account_Payable", project=project
-        ).first()
-        dealer_expense_bank = Bank.objects.filter(
-            used_for="Dealer_Expense", project=project
-        ).first()
-        if dealer_comission_amount > 0 and account_payable_bank and dealer_expense_bank:
+        account_payable_bank_id = get_account_id(project, "Account_Payable")
+        dealer_expense_bank_id = get_account_id(project, "Dealer_Expense")
+        if dealer_comission_amount > 0 and account_payable_bank_id and dealer_expense_bank_id:
             BankTransaction.objects.create(
                 project=project,
-                bank=account_payable_bank,
+                bank_id=account_payable_bank_id,
                 transaction_type="Dealer_Comission",
                 payment=0,
                 deposit=dealer_comission_amount,
@@ -128,7 +115,7 @@ class Command(BaseCommand):
 
             BankTransaction.objects.create(
                 project=project,
-                bank=dealer_expense_bank,
+                bank_id=dealer_expense_bank_id,
                 transaction_type="Dealer_Comission",
                 payment=0,
                 deposit=dealer_comission_amount,
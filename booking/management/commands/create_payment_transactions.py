@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
-from payments.models import IncomingFund, BankTransaction, Bank
+from payments.models import IncomingFund, BankTransaction
+from payments.accounts import get_account_id
 
 class Command(BaseCommand):
     help = 'Update all existing payment transactions'
@@ -33,14 +34,12 @@ class Command(BaseCommand):
         payment_amount = amount if reference == "payment" else 0
         deposit_amount = 0 if reference == "payment" else amount
 
-        account_receivable_bank = Bank.objects.filter(
-            used_for="Account_Receivable", project=project
-        ).first()
+        account_receivable_bank_id = get_account_id(project, "Account_Receivable")
 
         # Update or create the transaction for the account receivable bank
         BankTransaction.objects.create(
             project=project,
-            bank=account_receivable_bank,
+            bank_id=account_receivable_bank_id,
             transaction_type=transaction_type,
             payment=payment_amount,
             deposit=deposit_amount,
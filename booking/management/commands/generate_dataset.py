@@ -0,0 +1,484 @@
+import random
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from dateutil.relativedelta import relativedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from booking.models import Token
+from booking.serializers import BookingSerializer, TokenSerializer
+from customer.models import Customers
+from payments.models import Bank, BankTransaction
+from payments.serializers import (
+    BankDepositSerializer,
+    ChequeClearanceSerializer,
+    DealerPaymentsSerializer,
+    IncomingFundSerializer,
+    JournalEntrySerializer,
+    OutgoingFundSerializer,
+)
+from plots.models import Block, Plots
+from projects.models import Projects
+
+# name, main type, account type, detail type, used for
+ACCOUNTS = [
+    ("Cash in Hand", "Asset", "Bank", "Undeposited_Funds", None),
+    ("Bank Account", "Asset", "Bank", "Bank", None),
+    ("Account Receivable", "Asset", "Account_Receivable", "Account_Receivable", "Account_Receivable"),
+    ("Land Inventory", "Asset", "Inventory", "Inventory", "Land_Inventory"),
+    ("Account Payable", "Liabilities", "Account_Payable", "Account_Payable", "Account_Payable"),
+    ("Owner Equity", "Equity", "Equity", "Equity", None),
+    ("Plot Sales", "Income", "Income", "Sale_Account", "Sale_Account"),
+    ("Extra Refund Income", "Income", "Other_Income", "Other_Income", "Extra_Refund_Income"),
+    ("Cost of Land Sold", "Expense", "Cost_of_goods_sold", "Cost_of_goods_sold", "Cost_of_Good_Sold"),
+    ("Dealer Comission", "Expense", "Expenses", "Dealer_Expense", "Dealer_Expense"),
+    ("Discount Given", "Expense", "Expenses", "Discount", None),
+    ("Salaries", "Expense", "Expenses", "Salaries", None),
+    ("Utilities", "Expense", "Expenses", "Utilities", None),
+    ("Development Work", "Expense", "Expenses", "Development", None),
+]
+EXPENSE_ACCOUNTS = ["Salaries", "Utilities", "Development Work"]
+
+# Counts per project at scale 1
+SCALE = {
+    "blocks": 4,
+    "plots": 200,
+    "customers": 120,
+    "dealers": 8,
+    "vendors": 12,
+    "employees": 6,
+    "tokens": 40,
+    "bookings": 100,
+    "expenses_per_month": 12,
+    "journal_entries_per_month": 4,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a realistic dataset for benchmarking: projects with blocks, "
+        "plots, customers, dealers, tokens, bookings, payments, refunds, "
+        "discounts, expenses, deposits, journal entries and cheque clearances. "
+        "Documents are created through the API serializers so their bank "
+        "transactions are posted the same way."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--projects", type=int, default=1)
+        parser.add_argument(
+            "--scale", type=float, default=1, help="Multiplies the per project counts"
+        )
+        parser.add_argument(
+            "--months", type=int, default=24, help="Months of history up to today"
+        )
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--user", help="Username that owns the documents")
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.end_date = date.today()
+        self.start_date = self.end_date - relativedelta(months=options["months"])
+        self.counts = {
+            name: max(int(count * options["scale"]), 1) for name, count in SCALE.items()
+        }
+        self.user = self.get_user(options["user"])
+
+        for n in range(options["projects"]):
+            with transaction.atomic():
+                project, created = self.generate_project(n + 1)
+            summary = ", ".join(f"{count} {name}" for name, count in created.items())
+            self.stdout.write(
+                self.style.SUCCESS(f"Project {project.id} ({project.name}): {summary}")
+            )
+
+    def get_user(self, username):
+        if username:
+            return User.objects.get(username=username)
+        user = User.objects.filter(is_superuser=True).order_by("id").first()
+        if user is None:
+            # A superuser, so benchmark_endpoints can call the admin endpoints
+            user = User.objects.create_superuser("dataset")
+        return user
+
+    def random_date(self, start=None, end=None):
+        start = start or self.start_date
+        end = end or self.end_date
+        return start + timedelta(days=self.random.randint(0, max((end - start).days, 0)))
+
+    def months(self, start=None):
+        month = (start or self.start_date).replace(day=1)
+        while month <= self.end_date:
+            yield month
+            month += relativedelta(months=1)
+
+    def generate_project(self, number):
+        self.created = Counter()
+        project = Projects.objects.create(
+            name=f"Dataset Project {number}", cost_per_marla=self.random.choice([40000, 55000, 70000])
+        )
+        project.user.add(self.user)
+        self.project = project
+        self.banks = {
+            name: Bank.objects.create(
+                project=project,
+                name=name,
+                main_type=main_type,
+                account_type=account_type,
+                detail_type=detail_type,
+                used_for=used_for,
+            )
+            for name, main_type, account_type, detail_type, used_for in ACCOUNTS
+        }
+
+        plots = self.generate_plots()
+        customers = self.generate_people("customer", self.counts["customers"])
+        dealers = self.generate_people("dealer", self.counts["dealers"])
+        vendors = self.generate_people("vendor", self.counts["vendors"])
+        employees = self.generate_people("employee", self.counts["employees"])
+
+        tokens = self.generate_tokens(plots, customers)
+        bookings = self.generate_bookings(plots, customers, dealers, tokens)
+        self.generate_payments(bookings)
+        self.generate_dealer_payments(bookings)
+        self.generate_expenses(vendors + employees)
+        self.generate_journal_entries(vendors + employees)
+        self.generate_deposits()
+        self.generate_cheque_clearances()
+        return project, self.created
+
+    def payment_method(self):
+        """(bank, payment type) of a received or paid amount."""
+        if self.random.random() < 0.3:
+            return self.banks["Bank Account"], "Cheque"
+        if self.random.random() < 0.3:
+            return self.banks["Bank Account"], "Bank_Transfer"
+        return self.banks["Cash in Hand"], "cash"
+
+    def generate_plots(self):
+        blocks = Block.objects.bulk_create(
+            Block(project=self.project, name=f"Block {chr(65 + n % 26)}{n // 26 or ''}")
+            for n in range(self.counts["blocks"])
+        )
+        plots = []
+        for n in range(self.counts["plots"]):
+            marlas = self.random.choice([3, 5, 5, 7, 10, 20])
+            plot_type = self.random.choice([1, 1, 1, 2, 3])
+            rate_marla = self.project.cost_per_marla * (1 + plot_type * 0.25)
+            plots.append(
+                Plots(
+                    project=self.project,
+                    plot_number=str(n + 1),
+                    block=blocks[n % len(blocks)],
+                    type=plot_type,
+                    marlas=marlas,
+                    square_fts=marlas * 272,
+                    rate_marla=rate_marla,
+                    total=marlas * rate_marla,
+                    cost_price=marlas * self.project.cost_per_marla * 0.6,
+                )
+            )
+        plots = Plots.objects.bulk_create(plots)
+
+        # Every tenth plot is split in two sub-plots
+        sub_plots = Plots.objects.bulk_create(
+            Plots(
+                project=self.project,
+                plot_number=f"{parent.plot_number}-{part}",
+                block=parent.block,
+                type=parent.type,
+                marlas=parent.marlas / 2,
+                square_fts=parent.square_fts / 2,
+                rate_marla=parent.rate_marla,
+                total=parent.total / 2,
+                cost_price=parent.cost_price / 2,
+                parent_plot=parent,
+            )
+            for parent in plots[::10]
+            for part in ("A", "B")
+        )
+        self.created["plots"] += len(plots) + len(sub_plots)
+        # Split plots are sold through their sub-plots
+        return [plot for n, plot in enumerate(plots) if n % 10] + sub_plots
+
+    def generate_people(self, reference, count):
+        people = Customers.objects.bulk_create(
+            Customers(
+                project=self.project,
+                reference=reference,
+                name=f"{reference.title()} {n + 1}",
+                father_name=f"Father {n + 1}",
+                contact=f"0300{self.random.randint(1000000, 9999999)}",
+                cnic=f"35202{self.random.randint(10000000, 99999999)}",
+                address=f"House {n + 1}, Street {self.random.randint(1, 50)}",
+                joining_date=self.random_date() if reference == "employee" else None,
+            )
+            for n in range(count)
+        )
+        self.created[f"{reference}s"] += len(people)
+        return people
+
+    def generate_tokens(self, plots, customers):
+        tokens = []
+        for plot in self.random.sample(plots, min(self.counts["tokens"], len(plots) // 2)):
+            bank, payment_type = self.payment_method()
+            token_date = self.random_date(end=self.end_date - timedelta(days=30))
+            tokens.append(
+                TokenSerializer().create(
+                    {
+                        "project": self.project,
+                        "user": self.user,
+                        "customer": self.random.choice(customers),
+                        "plot": [{"id": plot.id}],
+                        "plot_amount": plot.total,
+                        "date": token_date,
+                        "expire_date": token_date + timedelta(days=30),
+                        "amount": round(plot.total * 0.02),
+                        "remarks": None,
+                        "bank": bank,
+                        "payment_type": payment_type,
+                    }
+                )
+            )
+        self.created["tokens"] += len(tokens)
+        return tokens
+
+    def generate_bookings(self, plots, customers, dealers, tokens):
+        token_plots = set(
+            Token.plot.through.objects.filter(token__in=tokens).values_list("plots_id", flat=True)
+        )
+        available = [plot for plot in plots if plot.id not in token_plots]
+        self.random.shuffle(available)
+
+        # Half of the tokens turn into a booking of their plot
+        sales = [
+            (token.plot.first(), token.customer, token)
+            for token in tokens[: len(tokens) // 2]
+        ]
+        sales += [
+            (plot, self.random.choice(customers), None)
+            for plot in available[: max(self.counts["bookings"] - len(sales), 0)]
+        ]
+
+        bookings = []
+        for plot, customer, token in sales:
+            booking_date = self.random_date(
+                token.date if token else None, self.end_date - timedelta(days=60)
+            )
+            full_payment = self.random.random() < 0.15
+            installment_plan = 0 if full_payment else self.random.choice([12, 24, 36])
+            advance = round(plot.total * (1 if full_payment else self.random.choice([0.2, 0.25, 0.3])))
+            token_amount = token.amount if token else 0
+            remaining = plot.total - advance - token_amount
+            dealer = self.random.choice(dealers) if self.random.random() < 0.4 else None
+            bank, payment_type = self.payment_method()
+            bookings.append(
+                BookingSerializer().create(
+                    {
+                        "project": self.project,
+                        "user": self.user,
+                        "customer": customer,
+                        "plots": [{"id": plot.id}],
+                        "booking_date": booking_date,
+                        "booking_type": "full_payment" if full_payment else "installment_payment",
+                        "installment_plan": installment_plan,
+                        "due_date": booking_date + relativedelta(months=installment_plan or 1),
+                        "installment_date": self.random.randint(1, 28),
+                        "installment_per_month": (
+                            round(remaining / installment_plan) if installment_plan else 0
+                        ),
+                        "total_amount": plot.total,
+                        "advance": advance,
+                        "remaining": remaining,
+                        "remarks": None,
+                        "bank": bank,
+                        "payment_type": payment_type,
+                        "dealer": dealer,
+                        "dealer_comission_amount": round(plot.total * 0.02) if dealer else 0,
+                        "token": token,
+                    }
+                )
+            )
+        self.created["bookings"] += len(bookings)
+        return bookings
+
+    def generate_payments(self, bookings):
+        serializer = IncomingFundSerializer()
+        for booking in bookings:
+            if booking.installment_plan:
+                months = list(self.months(booking.booking_date + relativedelta(months=1)))
+                for month in months[: booking.installment_plan]:
+                    # Some installments are missed
+                    if self.random.random() < 0.15:
+                        continue
+                    bank, payment_type = self.payment_method()
+                    discount = (
+                        round(booking.installment_per_month * 0.05)
+                        if self.random.random() < 0.1
+                        else 0
+                    )
+                    serializer.create(
+                        {
+                            "project": self.project,
+                            "booking": booking,
+                            "reference": "payment",
+                            "date": min(
+                                month.replace(day=min(booking.installment_date, 28)),
+                                self.end_date,
+                            ),
+                            "installement_month": month,
+                            "amount": booking.installment_per_month - discount,
+                            "discount_amount": discount,
+                            "bank": bank,
+                            "payment_type": payment_type,
+                        }
+                    )
+                    self.created["payments"] += 1
+                    self.created["discounts"] += bool(discount)
+
+            # A few customers are refunded part of what they paid
+            if self.random.random() < 0.05:
+                bank, payment_type = self.payment_method()
+                refund_date = self.random_date(booking.booking_date)
+                serializer.create(
+                    {
+                        "project": self.project,
+                        "booking": booking,
+                        "reference": "refund",
+                        "date": refund_date,
+                        "installement_month": refund_date.replace(day=1),
+                        "amount": round(booking.advance * 0.5),
+                        "bank": bank,
+                        "payment_type": payment_type,
+                    }
+                )
+                self.created["refunds"] += 1
+
+    def generate_dealer_payments(self, bookings):
+        serializer = DealerPaymentsSerializer()
+        for booking in bookings:
+            if not booking.dealer_id:
+                continue
+            installments = self.random.choice([1, 2])
+            for n in range(installments):
+                bank, payment_type = self.payment_method()
+                serializer.create(
+                    {
+                        "project": self.project,
+                        "booking": booking,
+                        "reference": "payment",
+                        "date": self.random_date(booking.booking_date),
+                        "amount": round(booking.dealer_comission_amount / installments),
+                        "bank": bank,
+                        "payment_type": payment_type,
+                    }
+                )
+                self.created["dealer payments"] += 1
+
+    def generate_expenses(self, payees):
+        serializer = OutgoingFundSerializer()
+        for month in self.months():
+            for n in range(self.counts["expenses_per_month"]):
+                bank, payment_type = self.payment_method()
+                details = [
+                    {
+                        "category": self.banks[name],
+                        "amount": self.random.randint(5, 200) * 1000,
+                        "description": name,
+                    }
+                    for name in self.random.sample(EXPENSE_ACCOUNTS, self.random.randint(1, 2))
+                ]
+                serializer.create(
+                    {
+                        "project": self.project,
+                        "payee": self.random.choice(payees),
+                        "date": self.random_date(month, min(month + relativedelta(months=1, days=-1), self.end_date)),
+                        "amount": sum(detail["amount"] for detail in details),
+                        "bank": bank,
+                        "payment_type": payment_type,
+                        "details": details,
+                    }
+                )
+                self.created["expenses"] += 1
+
+    def generate_journal_entries(self, people):
+        serializer = JournalEntrySerializer()
+        for month in self.months():
+            for n in range(self.counts["journal_entries_per_month"]):
+                person = self.random.choice(people)
+                amount = self.random.randint(10, 500) * 1000
+                serializer.create(
+                    {
+                        "project": self.project,
+                        "date": self.random_date(month, min(month + relativedelta(months=1, days=-1), self.end_date)),
+                        "description": "Purchase on credit",
+                        "details": [
+                            {
+                                "account": self.banks[self.random.choice(EXPENSE_ACCOUNTS)],
+                                "debit": amount,
+                                "credit": 0,
+                                "person": person,
+                            },
+                            {
+                                "account": self.banks["Account Payable"],
+                                "debit": 0,
+                                "credit": amount,
+                                "person": person,
+                            },
+                        ],
+                    }
+                )
+                self.created["journal entries"] += 1
+
+    def generate_deposits(self):
+        """Deposit the cash received each week into the bank account."""
+        undeposited = defaultdict(list)
+        for payment in BankTransaction.objects.filter(
+            project=self.project,
+            bank=self.banks["Cash in Hand"],
+            is_deposit=False,
+            deposit__gt=0,
+        ).order_by("transaction_date"):
+            week = payment.transaction_date - timedelta(days=payment.transaction_date.weekday())
+            undeposited[week].append(payment)
+
+        serializer = BankDepositSerializer()
+        for week, payments in undeposited.items():
+            deposit_date = min(week + timedelta(days=6), self.end_date)
+            if deposit_date >= self.end_date:
+                continue
+            amount = sum(payment.deposit for payment in payments)
+            serializer.create(
+                {
+                    "project": self.project,
+                    "deposit_to": self.banks["Bank Account"],
+                    "amount": amount,
+                    "payment_amount": amount,
+                    "date": deposit_date,
+                    "details": [{"payment": payment} for payment in payments],
+                }
+            )
+            self.created["deposits"] += 1
+
+    def generate_cheque_clearances(self):
+        """Clear most cheques at the end of the month they were written in."""
+        uncleared = defaultdict(list)
+        for cheque in BankTransaction.objects.filter(
+            project=self.project, is_cheque_clear=False
+        ).order_by("transaction_date"):
+            if self.random.random() < 0.85:
+                uncleared[cheque.transaction_date.replace(day=1)].append(cheque)
+
+        serializer = ChequeClearanceSerializer()
+        for month, cheques in uncleared.items():
+            clearance_date = month + relativedelta(months=1, days=-1)
+            if clearance_date >= self.end_date:
+                continue
+            serializer.create(
+                {
+                    "project": self.project,
+                    "date": clearance_date,
+                    "description": "Cheques cleared",
+                    "details": [{"expense": cheque} for cheque in cheques],
+                }
+            )
+            self.created["cheque clearances"] += 1
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from booking.models import Booking
+from booking.schedules import generate_schedules
+
+
+class Command(BaseCommand):
+    help = 'Generate the installment schedule of every booking and allocate its payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help='Only generate schedules for the given project id')
+
+    def handle(self, *args, **kwargs):
+        bookings = Booking.objects.order_by('id')
+        if kwargs.get('project'):
+            bookings = bookings.filter(project_id=kwargs['project'])
+
+        count = generate_schedules(bookings)
+        self.stdout.write(self.style.SUCCESS(f'Successfully generated {count} schedule rows.'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from booking.financials import rebuild_booking_financials
+
+
+class Command(BaseCommand):
+    help = 'Compare BookingFinancials with incoming_funds and tokens and repair the rows that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help='Only check the given project id')
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only list the bookings that drifted, without repairing them',
+        )
+
+    def handle(self, *args, **kwargs):
+        booking_ids = rebuild_booking_financials(
+            project_id=kwargs.get('project'), check_only=kwargs['check']
+        )
+        if booking_ids:
+            self.stdout.write(f'Bookings that drifted: {", ".join(map(str, sorted(booking_ids)))}')
+        if kwargs['check']:
+            self.stdout.write(f'{len(booking_ids)} bookings drifted.')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Successfully repaired {len(booking_ids)} booking financials.'))
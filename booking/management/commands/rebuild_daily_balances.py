@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from payments.balances import rebuild_daily_balances
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the AccountDailyBalance rollup from bank_transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help='Only rebuild the given project id')
+
+    def handle(self, *args, **kwargs):
+        count = rebuild_daily_balances(project_id=kwargs.get('project'))
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt {count} daily balances.'))
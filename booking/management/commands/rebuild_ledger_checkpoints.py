@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from reports.checkpoints import PARTY_SOURCES, rebuild_checkpoints
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly ledger opening balance checkpoints of every party'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help='Only rebuild the given project id')
+        parser.add_argument(
+            '--party-type',
+            choices=list(PARTY_SOURCES),
+            action='append',
+            help='Only rebuild the given party type (can be repeated)',
+        )
+
+    def handle(self, *args, **kwargs):
+        count = rebuild_checkpoints(
+            project_id=kwargs.get('project'), party_types=kwargs.get('party_type')
+        )
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt {count} ledger checkpoints.'))
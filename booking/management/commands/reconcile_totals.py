@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from payments.reconciliation import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the stored booking totals and account daily balances with incoming_funds '
+        'and bank_transactions and report the mismatches'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help='Only check the given project id')
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only check the bookings and accounts changed since the last run',
+        )
+        parser.add_argument('--fix', action='store_true', help='Write the recomputed totals')
+
+    def handle(self, *args, **kwargs):
+        run, bookings, accounts = reconcile(
+            project_id=kwargs.get('project'),
+            incremental=kwargs['incremental'],
+            fix=kwargs['fix'],
+        )
+        for row in bookings:
+            self.stdout.write(
+                f"Booking {row['booking_id']} ({row['id']}): received "
+                f"{row['total_receiving_amount']} expected {row['expected_total_receiving_amount']}, "
+                f"remaining {row['remaining']} expected {row['expected_remaining']}"
+            )
+        for row in accounts:
+            self.stdout.write(
+                f"Account {row['name']} ({row['id']}): deposits {row['deposit']} "
+                f"expected {row['expected_deposit']}, payments {row['payment']} "
+                f"expected {row['expected_payment']}"
+            )
+        since = f' changed since {run.since:%Y-%m-%d %H:%M:%S}' if run.since else ''
+        self.stdout.write(
+            f'Checked {run.bookings_checked} bookings and {run.accounts_checked} accounts{since}: '
+            f'{run.booking_mismatches} bookings and {run.account_mismatches} accounts mismatched.'
+        )
+        if run.fixed and (bookings or accounts):
+            self.stdout.write(self.style.SUCCESS('Successfully fixed the mismatched totals.'))
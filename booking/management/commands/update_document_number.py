@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from booking.models import Token
 from payments.models import IncomingFund
+from projects.sequences import reset_document_sequences
 
 class Command(BaseCommand):
     help = "Populate document_number for existing Token records."
@@ -27,4 +28,6 @@ class Command(BaseCommand):
                 payment.save(update_fields=['document_number'])
                 document_number += 1
 
+        # Restart the document sequences from the new numbers
+        reset_document_sequences(kinds=["token", "payment", "refund"])
         self.stdout.write(self.style.SUCCESS("Document numbers have been updated successfully."))
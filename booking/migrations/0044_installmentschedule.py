@@ -0,0 +1,85 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:40
+
+from django.db import migrations, models
+from django.db.models import FloatField, Q, Sum, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+from booking.schedules import build_schedule
+
+
+def populate_installment_schedules(apps, schema_editor):
+    Booking = apps.get_model("booking", "Booking")
+    InstallmentSchedule = apps.get_model("booking", "InstallmentSchedule")
+    IncomingFund = apps.get_model("payments", "IncomingFund")
+    zero = Value(0.0, output_field=FloatField())
+    # Payments and discounts less refunds, as allocate_payments spreads them
+    received = dict(
+        IncomingFund.objects.values("booking_id")
+        .annotate(
+            total=Coalesce(Sum("amount", filter=Q(reference__in=["payment", "Discount"])), zero)
+            - Coalesce(Sum("amount", filter=Q(reference="refund")), zero)
+        )
+        .order_by()
+        .values_list("booking_id", "total")
+    )
+    # The custom installment fields are on the model but in no migration,
+    # read them from the table where it has them
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        columns = {
+            column.name
+            for column in connection.introspection.get_table_description(
+                cursor, Booking._meta.db_table
+            )
+        }
+    fields = {field.name for field in Booking._meta.get_fields()}
+    bookings = Booking.objects.annotate(
+        **{
+            name: RawSQL(name, []) if name in columns else Value(None, output_field=FloatField())
+            for name in ("custom_installment_plan", "custom_installment_amount")
+            if name not in fields
+        }
+    )
+    batch = []
+    for booking in bookings.iterator(chunk_size=500):
+        available = max(received.get(booking.id, 0), 0)
+        for row in build_schedule(booking, model=InstallmentSchedule):
+            row.paid_amount = min(row.amount, available)
+            available -= row.paid_amount
+            batch.append(row)
+        if len(batch) >= 1000:
+            InstallmentSchedule.objects.bulk_create(batch)
+            batch = []
+    InstallmentSchedule.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_projects_cost_per_marla'),
+        ('payments', '0059_incomingfund_created_at_incomingfund_updated_at'),
+        ('booking', '0043_token_document_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstallmentSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('advance', 'Advance'), ('installment', 'Installment'), ('custom', 'Custom Installment')], default='installment', max_length=15)),
+                ('installment_number', models.IntegerField()),
+                ('due_date', models.DateField()),
+                ('amount', models.FloatField()),
+                ('paid_amount', models.FloatField(default=0)),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='installment_schedule', to='booking.booking')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='projects.projects')),
+            ],
+            options={
+                'db_table': 'installment_schedule',
+                'ordering': ['due_date', 'id'],
+                'indexes': [models.Index(fields=['project', 'due_date'], name='schedule_project_due_idx'), models.Index(fields=['booking', 'due_date'], name='schedule_booking_due_idx')],
+            },
+        ),
+        migrations.RunPython(populate_installment_schedules, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0044_installmentschedule'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['project', 'status', 'booking_type', 'installment_date'], name='booking_project_status_idx'),
+        ),
+    ]
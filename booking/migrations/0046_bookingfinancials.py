@@ -0,0 +1,72 @@
+# Generated by Django 4.2.16 on 2026-10-18 21:05
+
+from django.db import migrations, models
+from django.db.models import FloatField, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def populate_booking_financials(apps, schema_editor):
+    Booking = apps.get_model("booking", "Booking")
+    BookingFinancials = apps.get_model("booking", "BookingFinancials")
+    IncomingFund = apps.get_model("payments", "IncomingFund")
+    zero = Value(0.0, output_field=FloatField())
+    funds = {
+        row["booking_id"]: row
+        for row in IncomingFund.objects.values("booking_id")
+        .annotate(
+            paid=Coalesce(Sum("amount", filter=Q(reference="payment")), zero),
+            refunded=Coalesce(Sum("amount", filter=Q(reference="refund")), zero),
+            discount=Coalesce(Sum("amount", filter=Q(reference="Discount")), zero),
+            latest_payment=Max("date", filter=Q(reference="payment")),
+        )
+        .order_by()
+    }
+    batch = []
+    for booking in Booking.objects.values("id", "token__amount", "token__status").iterator():
+        row = funds.get(booking["id"], {})
+        batch.append(
+            BookingFinancials(
+                booking_id=booking["id"],
+                paid_amount=row.get("paid", 0),
+                refunded_amount=row.get("refunded", 0),
+                discount_amount=row.get("discount", 0),
+                token_amount=(
+                    booking["token__amount"] or 0
+                    if booking["token__status"] != "refunded"
+                    else 0
+                ),
+                last_payment_date=row.get("latest_payment"),
+            )
+        )
+        if len(batch) >= 1000:
+            BookingFinancials.objects.bulk_create(batch)
+            batch = []
+    BookingFinancials.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0061_report_indexes'),
+        ('booking', '0045_booking_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingFinancials',
+            fields=[
+                ('booking', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='financials', serialize=False, to='booking.booking')),
+                ('paid_amount', models.FloatField(default=0)),
+                ('refunded_amount', models.FloatField(default=0)),
+                ('discount_amount', models.FloatField(default=0)),
+                ('token_amount', models.FloatField(default=0)),
+                ('last_payment_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'booking_financials',
+            },
+        ),
+        migrations.RunPython(populate_booking_financials, migrations.RunPython.noop),
+    ]
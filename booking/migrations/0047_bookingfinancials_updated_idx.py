@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0046_bookingfinancials'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookingfinancials',
+            index=models.Index(fields=['updated_at'], name='booking_financials_updated_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F
 from projects.models import Projects
 from plots.models import Plots
 from customer.models import Customers
@@ -64,8 +65,81 @@ class Booking(models.Model):
     def __str__(self):
         return self.booking_id
 
+    def add_received_amount(self, amount):
+        """
+        Move amount from remaining to received in a single UPDATE, so
+        payments posted on the booking at the same time cannot overwrite
+        each other, then reload both totals. Refunds pass a negative amount.
+        """
+        Booking.objects.filter(pk=self.pk).update(
+            total_receiving_amount=F("total_receiving_amount") + amount,
+            remaining=F("remaining") - amount,
+        )
+        self.refresh_from_db(fields=["total_receiving_amount", "remaining"])
+
     class Meta:
         db_table = "booking"
+        indexes = [
+            models.Index(
+                fields=["project", "status", "booking_type", "installment_date"],
+                name="booking_project_status_idx",
+            ),
+        ]
+
+
+class InstallmentSchedule(models.Model):
+    """Expected payment of a booking, one row per installment due."""
+
+    Kinds = (
+        ("advance", "Advance"),
+        ("installment", "Installment"),
+        ("custom", "Custom Installment"),
+    )
+    project = models.ForeignKey(Projects, on_delete=models.PROTECT)
+    booking = models.ForeignKey(
+        Booking, related_name="installment_schedule", on_delete=models.CASCADE
+    )
+    kind = models.CharField(max_length=15, choices=Kinds, default="installment")
+    installment_number = models.IntegerField()
+    due_date = models.DateField()
+    amount = models.FloatField()
+    paid_amount = models.FloatField(default=0)
+
+    class Meta:
+        db_table = "installment_schedule"
+        ordering = ["due_date", "id"]
+        indexes = [
+            models.Index(fields=["project", "due_date"], name="schedule_project_due_idx"),
+            models.Index(fields=["booking", "due_date"], name="schedule_booking_due_idx"),
+        ]
+
+
+class BookingFinancials(models.Model):
+    """
+    Payment totals of a booking, updated with every incoming fund and token
+    change (see booking.financials).
+    """
+
+    booking = models.OneToOneField(
+        Booking, primary_key=True, related_name="financials", on_delete=models.CASCADE
+    )
+    paid_amount = models.FloatField(default=0)
+    refunded_amount = models.FloatField(default=0)
+    discount_amount = models.FloatField(default=0)
+    token_amount = models.FloatField(default=0)
+    last_payment_date = models.DateField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "booking_financials"
+        indexes = [
+            models.Index(fields=["updated_at"], name="booking_financials_updated_idx"),
+        ]
+
+    @property
+    def received_amount(self):
+        """Payments and discounts less refunds, without the token."""
+        return self.paid_amount + self.discount_amount - self.refunded_amount
 
 
 class BookingDocuments(models.Model):
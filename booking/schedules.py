@@ -0,0 +1,188 @@
+import calendar
+from datetime import date
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from .models import BookingFinancials, InstallmentSchedule
+
+
+def installment_due_date(month, installment_day):
+    """Installment day in the given month, clipped to the length of the month."""
+    last_day = calendar.monthrange(month.year, month.month)[1]
+    return month.replace(day=min(max(installment_day or 1, 1), last_day))
+
+
+def build_schedule(booking, model=InstallmentSchedule):
+    """
+    Expected payments of a booking: the advance on the booking date, one
+    installment per month on the installment day up to the due date month,
+    and the custom installments every custom_installment_plan months.
+    Migrations pass their historical ``model``.
+    """
+    rows = []
+    if booking.advance:
+        rows.append(
+            model(
+                project_id=booking.project_id,
+                booking=booking,
+                kind="advance",
+                installment_number=0,
+                due_date=booking.booking_date,
+                amount=booking.advance,
+            )
+        )
+
+    booking_month = booking.booking_date.replace(day=1)
+    if booking.due_date:
+        due_month = booking.due_date.replace(day=1)
+        months_count = (due_month.year - booking_month.year) * 12 + (
+            due_month.month - booking_month.month
+        )
+    else:
+        months_count = booking.installment_plan or 0
+
+    if booking.installment_per_month:
+        for number in range(1, months_count + 1):
+            rows.append(
+                model(
+                    project_id=booking.project_id,
+                    booking=booking,
+                    kind="installment",
+                    installment_number=number,
+                    due_date=installment_due_date(
+                        booking_month + relativedelta(months=number),
+                        booking.installment_date,
+                    ),
+                    amount=booking.installment_per_month,
+                )
+            )
+
+    custom_plan = int(booking.custom_installment_plan or 0)
+    custom_amount = booking.custom_installment_amount or 0
+    if custom_plan > 0 and custom_amount > 0 and booking.due_date:
+        number = 1
+        custom_date = booking.booking_date + relativedelta(months=custom_plan)
+        while custom_date <= booking.due_date:
+            rows.append(
+                model(
+                    project_id=booking.project_id,
+                    booking=booking,
+                    kind="custom",
+                    installment_number=number,
+                    due_date=custom_date,
+                    amount=custom_amount,
+                )
+            )
+            number += 1
+            custom_date = booking.booking_date + relativedelta(
+                months=custom_plan * number
+            )
+
+    rows.sort(key=lambda row: (row.due_date, row.installment_number))
+    return rows
+
+
+def generate_schedule(booking):
+    """Replace the schedule of a booking and allocate its payments against it."""
+    with transaction.atomic():
+        InstallmentSchedule.objects.filter(booking=booking).delete()
+        InstallmentSchedule.objects.bulk_create(build_schedule(booking))
+        allocate_payments([booking.id])
+
+
+def received_amounts(booking_ids):
+    """{booking_id: payments and discounts less refunds} for the given bookings."""
+    return {
+        financials.booking_id: financials.received_amount
+        for financials in BookingFinancials.objects.filter(booking_id__in=booking_ids)
+    }
+
+
+def allocate_payments(booking_ids):
+    """
+    Spread the amount received on each booking over its schedule rows,
+    oldest due date first.
+    """
+    booking_ids = [booking_id for booking_id in set(booking_ids) if booking_id]
+    if not booking_ids:
+        return
+    received = received_amounts(booking_ids)
+    changed = []
+    remaining = {}
+    for row in InstallmentSchedule.objects.filter(booking_id__in=booking_ids).order_by(
+        "booking_id", "due_date", "installment_number"
+    ):
+        available = remaining.setdefault(
+            row.booking_id, max(received.get(row.booking_id, 0), 0)
+        )
+        paid_amount = min(row.amount, available)
+        remaining[row.booking_id] = available - paid_amount
+        if paid_amount != row.paid_amount:
+            row.paid_amount = paid_amount
+            changed.append(row)
+    InstallmentSchedule.objects.bulk_update(changed, ["paid_amount"], batch_size=500)
+
+
+def generate_schedules(bookings, batch_size=500):
+    """Rebuild the schedules of many bookings, returns the number of rows created."""
+    count = 0
+    batch = []
+    for booking in bookings.iterator(chunk_size=batch_size):
+        batch.append(booking)
+        if len(batch) >= batch_size:
+            count += _generate_schedule_batch(batch)
+            batch = []
+    if batch:
+        count += _generate_schedule_batch(batch)
+    return count
+
+
+def _generate_schedule_batch(bookings):
+    rows = []
+    for booking in bookings:
+        rows.extend(build_schedule(booking))
+    booking_ids = [booking.id for booking in bookings]
+    with transaction.atomic():
+        InstallmentSchedule.objects.filter(booking_id__in=booking_ids).delete()
+        InstallmentSchedule.objects.bulk_create(rows, batch_size=1000)
+        allocate_payments(booking_ids)
+    return len(rows)
+
+
+def outstanding_filter(as_of=None):
+    """Q for the schedule rows due up to ``as_of`` that are not fully paid."""
+    as_of = as_of or date.today()
+    return Q(due_date__lte=as_of) & Q(amount__gt=F("paid_amount"))
+
+
+def schedule_total(expression, *filters, booking_ref="pk"):
+    """Subquery summing ``expression`` over the schedule rows of the outer booking."""
+    return Coalesce(
+        Subquery(
+            InstallmentSchedule.objects.filter(*filters, booking=OuterRef(booking_ref))
+            .order_by()
+            .values("booking")
+            .annotate(total=Sum(expression))
+            .values("total"),
+            output_field=FloatField(),
+        ),
+        Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def expected_amount(as_of=None, booking_ref="pk"):
+    """Subquery of the amount due from the outer booking up to ``as_of``."""
+    return schedule_total(
+        "amount", Q(due_date__lte=as_of or date.today()), booking_ref=booking_ref
+    )
+
+
+def outstanding_amount(as_of=None, booking_ref="pk"):
+    """Subquery of the unpaid amount of the outer booking due up to ``as_of``."""
+    return schedule_total(
+        F("amount") - F("paid_amount"),
+        outstanding_filter(as_of),
+        booking_ref=booking_ref,
+    )
@@ -1,14 +1,20 @@
 from rest_framework import serializers
 from django.db import transaction
+from django.utils import timezone
 from .models import Booking, BookingDocuments, Token, PlotResale, TokenDocuments
 from plots.models import Plots
-from payments.models import IncomingFund, Bank, BankTransaction, PaymentReminder
+from payments.models import IncomingFund, BankTransaction, PaymentReminder
 from customer.serializers import CustomersInfoSerializer
 from plots.serializers import PlotsSerializer
 from django.db.models import Sum, Q, Case, Value, F, When, FloatField
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 from django.contrib.auth.models import User
+from .financials import get_booking_financials
+from .schedules import generate_schedule
+from payments.posting import entry_line, post_entry, reverse_entry
+from payments.accounts import get_account_id
+from projects.sequences import next_document_number
 
 
 
@@ -82,16 +88,7 @@ class BookingSerializer(serializers.ModelSerializer):
         ).date()
         try:
             with transaction.atomic():
-                try:
-                    latest_booking = Booking.objects.filter(project=project).latest(
-                        "created_at"
-                    )
-                    latest_booking_number = int(latest_booking.booking_id.split("-")[1]) + 1
-                except Booking.DoesNotExist:
-                    latest_booking_number = 1
-
-                booking_id_str = f"{project.id}-{str(latest_booking_number).zfill(3)}"
-                validated_data["booking_id"] = booking_id_str
+                validated_data["booking_id"] = next_document_number(project, "booking")
                 token_amount = token.amount if token else 0
                 validated_data["total_receiving_amount"] = advance_amount + token_amount
 
@@ -113,14 +110,8 @@ class BookingSerializer(serializers.ModelSerializer):
                     BookingDocuments.objects.create(booking=booking, **file_data)
 
                 if advance_amount > 0:
-                    
-                    try:
-                        latest_payment = IncomingFund.objects.filter(project=project, reference="payment", previous_serial_num=None).latest("created_at")
-                        latest_payment_number = int(latest_payment.document_number) + 1
-                    except IncomingFund.DoesNotExist:
-                        latest_payment_number = 1
-                    document_number_str = str(latest_payment_number).zfill(3)
-                    
+                    document_number_str = next_document_number(project, "payment")
+
                     IncomingFund.objects.create(
                         project=project,
                         booking=booking,
@@ -159,12 +150,13 @@ class BookingSerializer(serializers.ModelSerializer):
                             )
                         today = custom_reminder
 
+                generate_schedule(booking)
                 return booking
         except Exception as e:
             raise serializers.ValidationError(f"Error creating booking: {e}")
 
     def create_bank_transactions(self, booking, validated_data):
-        """Create multiple bank transactions for different accounts."""
+        """Post the booking, its advance and the dealer comission."""
         project = validated_data.get("project")
         booking_date = validated_data.get("booking_date")
         booking_amount = validated_data.get("total_amount", 0)
@@ -172,135 +164,62 @@ class BookingSerializer(serializers.ModelSerializer):
         dealer_comission_amount = validated_data.get("dealer_comission_amount", 0)
         plot_cost = sum(plot.cost_price for plot in booking.plots.all())
 
-        advance_bank = validated_data.get("bank")
-        payment_type = validated_data.get("payment_type")
-        is_deposit = advance_bank.detail_type != "Undeposited_Funds"
-        is_cheque_clear = payment_type != "Cheque"
-
-        # Account receivable (Debit)
-        account_receivable_bank = Bank.objects.filter(
-            used_for="Account_Receivable", project=project
-        ).first()
-        if account_receivable_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=account_receivable_bank,
-                transaction_type="Booking",
-                payment=0,
-                deposit=booking_amount,
-                transaction_date=booking_date,
-                related_table="Booking",
-                related_id=booking.id,
-            )
-
-        # Sale account (Credit)
-        sale_bank = Bank.objects.filter(
-            used_for="Sale_Account", project=project
-        ).first()
-        if sale_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=sale_bank,
-                transaction_type="Booking",
-                deposit=booking_amount,
-                payment=0,
-                transaction_date=booking_date,
-                related_table="Booking",
-                related_id=booking.id,
-            )
-
-        # Cost of Goods Sold (COGS - Debit)
-        cogs_bank = Bank.objects.filter(
-            used_for="Cost_of_Good_Sold", project=project
-        ).first()
-        if cogs_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=cogs_bank,
-                transaction_type="Booking",
-                payment=0,
-                deposit=plot_cost,
-                transaction_date=booking_date,
-                related_table="Booking",
-                related_id=booking.id,
-            )
-
-        # Land Inventory (Credit)
-        land_inventory_bank = Bank.objects.filter(
-            used_for="Land_Inventory", project=project
-        ).first()
-        if land_inventory_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=land_inventory_bank,
-                transaction_type="Booking",
-                deposit=0,
-                payment=plot_cost,
-                transaction_date=booking_date,
-                related_table="Booking",
-                related_id=booking.id,
-            )
+        lines = [
+            # Account receivable (Debit) and sale account (Credit)
+            entry_line("Account_Receivable", deposit=booking_amount),
+            entry_line("Sale_Account", deposit=booking_amount),
+            # Cost of Goods Sold (COGS - Debit) and land inventory (Credit)
+            entry_line("Cost_of_Good_Sold", deposit=plot_cost),
+            entry_line("Land_Inventory", payment=plot_cost),
+        ]
+        lines += self.advance_lines(
+            advance_amount, validated_data.get("bank"), validated_data.get("payment_type")
+        )
 
-        # Advance payment (credit - account receivable) (debit - bank)
-        if advance_amount > 0 and account_receivable_bank and advance_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=account_receivable_bank,
-                transaction_type="Booking_Advance",
+        # Dealer Comission (credit - account payable) (debit - dealer expense)
+        if dealer_comission_amount > 0:
+            lines += [
+                entry_line(
+                    "Account_Payable",
+                    deposit=dealer_comission_amount,
+                    transaction_type="Dealer_Comission",
+                    group="comission",
+                ),
+                entry_line(
+                    "Dealer_Expense",
+                    deposit=dealer_comission_amount,
+                    transaction_type="Dealer_Comission",
+                    group="comission",
+                ),
+            ]
+
+        post_entry(project, lines, "Booking", booking_date, "Booking", booking.id)
+
+    def advance_lines(self, advance_amount, advance_bank, payment_type):
+        """Advance payment (credit - account receivable) (debit - bank)."""
+        if not (advance_amount > 0 and advance_bank):
+            return []
+        payment_amount = 0
+        deposit_amount = advance_amount
+        if advance_bank.main_type in ["Equity"]:
+            payment_amount, deposit_amount = deposit_amount, payment_amount
+        return [
+            entry_line(
+                "Account_Receivable",
                 payment=advance_amount,
-                deposit=0,
-                transaction_date=booking_date,
-                related_table="Booking",
-                related_id=booking.id,
-            )
-
-            payment_amount = 0
-            deposit_amount = advance_amount
-            if advance_bank.main_type in ["Equity"]:
-                payment_amount, deposit_amount = deposit_amount, payment_amount
-            
-            BankTransaction.objects.create(
-                project=project,
-                bank=advance_bank,
                 transaction_type="Booking_Advance",
+                group="advance",
+            ),
+            entry_line(
+                advance_bank,
                 payment=payment_amount,
                 deposit=deposit_amount,
-                transaction_date=booking_date,
-                related_table="Booking",
-                related_id=booking.id,
-                is_deposit=is_deposit,
-                is_cheque_clear=is_cheque_clear,
-            )
-
-        # Dealer Comission (credit - account payable) (debit - dealer expense)
-        account_payable_bank = Bank.objects.filter(
-            used_for="Account_Payable", project=project
-        ).first()
-        dealer_expense_bank = Bank.objects.filter(
-            used_for="Dealer_Expense", project=project
-        ).first()
-        if dealer_comission_amount > 0 and account_payable_bank and dealer_expense_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=account_payable_bank,
-                transaction_type="Dealer_Comission",
-                payment=0,
-                deposit=dealer_comission_amount,
-                transaction_date=booking_date,
-                related_table="Booking",
-                related_id=booking.id,
-            )
-
-            BankTransaction.objects.create(
-                project=project,
-                bank=dealer_expense_bank,
-                transaction_type="Dealer_Comission",
-                payment=0,
-                deposit=dealer_comission_amount,
-                transaction_date=booking_date,
-                related_table="Booking",
-                related_id=booking.id,
-            )
+                transaction_type="Booking_Advance",
+                is_deposit=advance_bank.detail_type != "Undeposited_Funds",
+                is_cheque_clear=payment_type != "Cheque",
+                group="advance",
+            ),
+        ]
 
     def update(self, instance, validated_data):
         files_data = validated_data.pop("files", [])
@@ -320,6 +239,9 @@ class BookingSerializer(serializers.ModelSerializer):
 
         try:
             with transaction.atomic():
+                # Payments posted on the booking meanwhile wait for this lock,
+                # so the totals recomputed below include them
+                Booking.objects.select_for_update().get(pk=instance.pk)
                 self.update_bank_transactions(instance, validated_data)
                 if instance.plots.exists():
                     for existing_plot in instance.plots.all():
@@ -348,13 +270,8 @@ class BookingSerializer(serializers.ModelSerializer):
                     advance_payment_obj.save()
                 else:
                     # If no advance payment exists, and advance_amount > 0, create a new IncomingFund             
-                    try:
-                        latest_payment = IncomingFund.objects.filter(project=project, reference="payment", previous_serial_num=None).latest("created_at")
-                        latest_payment_number = int(latest_payment.document_number) + 1
-                    except IncomingFund.DoesNotExist:
-                        latest_payment_number = 1
-                    document_number_str = str(latest_payment_number).zfill(3)
                     if advance_amount > 0:
+                        document_number_str = next_document_number(project, "payment")
                         IncomingFund.objects.create(
                             project=instance.project,
                             document_number=document_number_str,
@@ -370,61 +287,24 @@ class BookingSerializer(serializers.ModelSerializer):
                             cheque_number=validated_data.get("cheque_number"),
                             discount_amount=0
                         )
-                        # Account receivable (Debit)
-                        account_receivable_bank = Bank.objects.filter(
-                            used_for="Account_Receivable", project=project
-                        ).first()
-                        advance_bank = validated_data.get("bank")
-                        payment_type = validated_data.get("payment_type")
-                        is_deposit = advance_bank.detail_type != "Undeposited_Funds"
-                        is_cheque_clear = payment_type != "Cheque"
-                        if advance_amount > 0 and account_receivable_bank and advance_bank:
-                            BankTransaction.objects.create(
-                                project=project,
-                                bank=account_receivable_bank,
-                                transaction_type="Booking_Advance",
-                                payment=advance_amount,
-                                deposit=0,
-                                transaction_date=booking_date,
-                                related_table="Booking",
-                                related_id=instance.id,
-                            )
-
-                            payment_amount = 0
-                            deposit_amount = advance_amount
-                            if advance_bank.main_type in ["Equity"]:
-                                payment_amount, deposit_amount = deposit_amount, payment_amount
-                            
-                            BankTransaction.objects.create(
-                                project=project,
-                                bank=advance_bank,
-                                transaction_type="Booking_Advance",
-                                payment=payment_amount,
-                                deposit=deposit_amount,
-                                transaction_date=booking_date,
-                                related_table="Booking",
-                                related_id=instance.id,
-                                is_deposit=is_deposit,
-                                is_cheque_clear=is_cheque_clear,
-                            )
-
-
-                payments = (
-                    IncomingFund.objects.filter(booking=instance.id).aggregate(
-                        total=Sum(
-                            Case(
-                                When(reference="payment", then=F("amount")),
-                                When(reference="return", then=F("amount") * -1),
-                                default=Value(0),
-                                output_field=FloatField(),
-                            )
+                        post_entry(
+                            project,
+                            self.advance_lines(
+                                advance_amount,
+                                validated_data.get("bank"),
+                                validated_data.get("payment_type"),
+                            ),
+                            "Booking_Advance",
+                            booking_date,
+                            "Booking",
+                            instance.id,
                         )
-                    )["total"]
-                    or 0.0
-                )
+
+                financials = get_booking_financials(instance.id)
+                payments = financials.received_amount
                 instance.total_receiving_amount = payments + token_amount
                 instance.remaining = instance.total_amount - payments - token_amount
-                instance.save()
+                instance.save(update_fields=["total_receiving_amount", "remaining"])
 
                 # Handle file updates and deletions
                 existing_files = BookingDocuments.objects.filter(booking=instance)
@@ -462,11 +342,7 @@ class BookingSerializer(serializers.ModelSerializer):
                 # **Create New Custom Installment Reminders**
                 if custom_installment_plan > 0 and custom_installment_amount > 0:
                     today = booking_date  # Start from booking date
-                    total_paid = (
-                        IncomingFund.objects.filter(booking=instance, reference="payment")
-                        .aggregate(total_paid=Sum("amount"))
-                        .get("total_paid", 0) or 0
-                    )
+                    total_paid = financials.paid_amount
 
                     # Determine how many full installments have been covered
                     num_paid_installments = total_paid // custom_installment_amount
@@ -507,6 +383,7 @@ class BookingSerializer(serializers.ModelSerializer):
                             )
                         new_reminder_date += relativedelta(months=custom_installment_plan)
 
+                generate_schedule(instance)
                 return instance
         except Exception as e:
             raise serializers.ValidationError(f"Error updating booking: {e}")
@@ -525,58 +402,50 @@ class BookingSerializer(serializers.ModelSerializer):
 
 
         # Account receivable (Debit)
-        account_receivable_bank = Bank.objects.filter(
-            used_for="Account_Receivable", project=project
-        ).first()
-        if account_receivable_bank:
+        account_receivable_bank_id = get_account_id(project, "Account_Receivable")
+        if account_receivable_bank_id:
             BankTransaction.objects.filter(
                 project=project,
-                bank=account_receivable_bank,
+                bank_id=account_receivable_bank_id,
                 related_table="Booking",
                 related_id=booking.id,
             ).update(payment=0, deposit=booking_amount, transaction_date=booking_date)
 
         # Sale account (Credit)
-        sale_bank = Bank.objects.filter(
-            used_for="Sale_Account", project=project
-        ).first()
-        if sale_bank:
+        sale_bank_id = get_account_id(project, "Sale_Account")
+        if sale_bank_id:
             BankTransaction.objects.filter(
                 project=project,
-                bank=sale_bank,
+                bank_id=sale_bank_id,
                 related_table="Booking",
                 related_id=booking.id,
             ).update(deposit=booking_amount, payment=0, transaction_date=booking_date)
 
         # Cost of Goods Sold (COGS - Debit)
-        cogs_bank = Bank.objects.filter(
-            used_for="Cost_of_Good_Sold", project=project
-        ).first()
-        if cogs_bank:
+        cogs_bank_id = get_account_id(project, "Cost_of_Good_Sold")
+        if cogs_bank_id:
             BankTransaction.objects.filter(
                 project=project,
-                bank=cogs_bank,
+                bank_id=cogs_bank_id,
                 related_table="Booking",
                 related_id=booking.id,
             ).update(payment=0, deposit=plot_cost, transaction_date=booking_date)
 
         # Land Inventory (Credit)
-        land_inventory_bank = Bank.objects.filter(
-            used_for="Land_Inventory", project=project
-        ).first()
-        if land_inventory_bank:
+        land_inventory_bank_id = get_account_id(project, "Land_Inventory")
+        if land_inventory_bank_id:
             BankTransaction.objects.filter(
                 project=project,
-                bank=land_inventory_bank,
+                bank_id=land_inventory_bank_id,
                 related_table="Booking",
                 related_id=booking.id,
             ).update(deposit=0, payment=plot_cost, transaction_date=booking_date)
 
         # Advance payment (Credit - Account Receivable) (Debit - Bank)
-        if advance_amount > 0 and account_receivable_bank and new_bank:
+        if advance_amount > 0 and account_receivable_bank_id and new_bank:
             BankTransaction.objects.filter(
                 project=project,
-                bank=account_receivable_bank,
+                bank_id=account_receivable_bank_id,
                 transaction_type="Booking_Advance",
                 related_table="Booking",
                 related_id=booking.id,
@@ -621,17 +490,13 @@ class BookingSerializer(serializers.ModelSerializer):
             )
 
         # Dealer Comission (Credit - Account Payable) (Debit - Dealer Expense)
-        account_payable_bank = Bank.objects.filter(
-            used_for="Account_Payable", project=project
-        ).first()
-        dealer_expense_bank = Bank.objects.filter(
-            used_for="Dealer_Expense", project=project
-        ).first()
-        if dealer_comission_amount > 0 and account_payable_bank and dealer_expense_bank:
+        account_payable_bank_id = get_account_id(project, "Account_Payable")
+        dealer_expense_bank_id = get_account_id(project, "Dealer_Expense")
+        if dealer_comission_amount > 0 and account_payable_bank_id and dealer_expense_bank_id:
             # Update or create transaction for account payable bank
             BankTransaction.objects.update_or_create(
                 project=project,
-                bank=account_payable_bank,
+                bank_id=account_payable_bank_id,
                 transaction_type="Dealer_Comission",
                 related_table="Booking",
                 related_id=booking.id,
@@ -645,7 +510,7 @@ class BookingSerializer(serializers.ModelSerializer):
             # Update or create transaction for dealer expense bank
             BankTransaction.objects.update_or_create(
                 project=project,
-                bank=dealer_expense_bank,
+                bank_id=dealer_expense_bank_id,
                 transaction_type="Dealer_Comission",
                 related_table="Booking",
                 related_id=booking.id,
@@ -718,16 +583,7 @@ class TokenSerializer(serializers.ModelSerializer):
         plots_data = validated_data.pop("plot", [])
         project=validated_data.get("project")
         
-        try:
-            latest_token = Token.objects.filter(project=project).latest(
-                "created_at"
-            )
-            latest_token_number = int(latest_token.document_number) + 1
-        except Token.DoesNotExist:
-            latest_token_number = 1
-
-        document_number_str = str(latest_token_number).zfill(3)
-        validated_data["document_number"] = document_number_str
+        validated_data["document_number"] = next_document_number(project, "token")
         print(validated_data)
         token = Token.objects.create(**validated_data)
 
@@ -735,7 +591,9 @@ class TokenSerializer(serializers.ModelSerializer):
             plot_ids = [plot["id"] for plot in plots_data]
             token.plot.set(plot_ids)  # Associate plots with the token
             for plot_id in plot_ids:
-                Plots.objects.filter(id=plot_id).update(status="pending")
+                Plots.objects.filter(id=plot_id).update(
+                    status="pending", updated_at=timezone.now()
+                )
         
 
         for file_data in files_data:
@@ -754,13 +612,11 @@ class TokenSerializer(serializers.ModelSerializer):
         is_deposit = bank.detail_type != "Undeposited_Funds"
         is_cheque_clear = payment_type != "Cheque"
 
-        account_receivable_bank = Bank.objects.filter(
-            used_for="Account_Receivable", project=project
-        ).first()
+        account_receivable_bank_id = get_account_id(project, "Account_Receivable")
 
         BankTransaction.objects.create(
             project=project,
-            bank=account_receivable_bank,
+            bank_id=account_receivable_bank_id,
             transaction_type="Token",
             payment=amount,
             deposit=0,
@@ -808,10 +664,14 @@ class TokenSerializer(serializers.ModelSerializer):
             # Set previous plots back to 'active' if no longer associated
             plots_to_revert = set(current_plot_ids) - set(new_plot_ids)
             if plots_to_revert:
-                Plots.objects.filter(id__in=plots_to_revert).update(status="active")
+                Plots.objects.filter(id__in=plots_to_revert).update(
+                    status="active", updated_at=timezone.now()
+                )
 
             # Set the new plots to 'pending'
-            Plots.objects.filter(id__in=new_plot_ids).update(status="pending")
+            Plots.objects.filter(id__in=new_plot_ids).update(
+                status="pending", updated_at=timezone.now()
+            )
 
         # Handle file updates and deletions
         existing_files = TokenDocuments.objects.filter(token=instance)
@@ -846,13 +706,11 @@ class TokenSerializer(serializers.ModelSerializer):
         main_type=new_bank.main_type
 
 
-        account_receivable_bank = Bank.objects.filter(
-            used_for="Account_Receivable", project=project
-        ).first()
+        account_receivable_bank_id = get_account_id(project, "Account_Receivable")
 
         BankTransaction.objects.filter(
             project=project,
-            bank=account_receivable_bank,
+            bank_id=account_receivable_bank_id,
             transaction_type="Token",
             related_table="token",
             related_id=payment.id,
@@ -939,213 +797,72 @@ class PlotResaleSerializer(serializers.ModelSerializer):
         return plot_resale
 
     def create_bank_transactions(self, plot_resale, validated_data):
-        """Create multiple bank transactions for different accounts."""
+        """Post the closing of a booking settled with the customer."""
         project = plot_resale.booking.project
         date = validated_data.get("date")
         remaining = validated_data.get("remaining")
         company_amount_paid = validated_data.get("company_amount_paid")
         amount_received = validated_data.get("amount_received")
-        plot_cost = sum(plot.cost_price for plot in plot_resale.booking.plots.all())
-        booking_amount = plot_resale.booking.total_amount
 
+        lines = []
         if company_amount_paid > amount_received:
-            extra_refund_expense = Bank.objects.filter(
-                used_for="Extra_Refund_Expense", project=project
-            ).first()
-            BankTransaction.objects.create(
-                project=project,
-                bank=extra_refund_expense,
-                transaction_type="Close_Booking",
-                payment=0,
-                deposit=company_amount_paid - amount_received,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
+            lines.append(
+                entry_line(
+                    "Extra_Refund_Expense", deposit=company_amount_paid - amount_received
+                )
             )
         elif company_amount_paid < amount_received:
-            extra_refund_income = Bank.objects.filter(
-                used_for="Extra_Refund_Income", project=project
-            ).first()
-            BankTransaction.objects.create(
-                project=project,
-                bank=extra_refund_income,
-                transaction_type="Close_Booking",
-                payment=0,
-                deposit=amount_received - company_amount_paid,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
-
-        # Account Payable (credit)
-        account_payable_bank = Bank.objects.filter(
-            used_for="Account_Payable", project=project
-        ).first()
-        if account_payable_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=account_payable_bank,
-                transaction_type="Close_Booking",
-                payment=0,
-                deposit=company_amount_paid,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
-
-        # Account receivable (credit)
-        account_receivable_bank = Bank.objects.filter(
-            used_for="Account_Receivable", project=project
-        ).first()
-        if account_receivable_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=account_receivable_bank,
-                transaction_type="Close_Booking",
-                payment=remaining,
-                deposit=0,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
-
-        # Sale account (debit with booking price)
-        sale_bank = Bank.objects.filter(
-            used_for="Sale_Account", project=project
-        ).first()
-        if sale_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=sale_bank,
-                transaction_type="Close_Booking",
-                deposit=0,
-                payment=booking_amount,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
-
-        # Cost of Goods Sold (COGS - credit)
-        cogs_bank = Bank.objects.filter(
-            used_for="Cost_of_Good_Sold", project=project
-        ).first()
-        if cogs_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=cogs_bank,
-                transaction_type="Close_Booking",
-                payment=plot_cost,
-                deposit=0,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
-
-        # Land Inventory (debit)
-        land_inventory_bank = Bank.objects.filter(
-            used_for="Land_Inventory", project=project
-        ).first()
-        if land_inventory_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=land_inventory_bank,
-                transaction_type="Close_Booking",
-                deposit=plot_cost,
-                payment=0,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
+            lines.append(
+                entry_line(
+                    "Extra_Refund_Income", deposit=amount_received - company_amount_paid
+                )
             )
+        lines += self.closing_lines(plot_resale, company_amount_paid, remaining)
+
+        # remaining comes from the request and is not checked against the
+        # booking, so the entry is not checked for balance
+        post_entry(
+            project,
+            lines,
+            "Close_Booking",
+            date,
+            "plot_resale",
+            plot_resale.id,
+            validate=False,
+        )
 
     def create_bank_transactions_manual(self, plot_resale, validated_data):
-        """Create multiple bank transactions for different accounts."""
+        """Post the closing of a booking for the amount paid by the company."""
         project = plot_resale.booking.project
         date = validated_data.get("date")
         company_amount_paid = validated_data.get("company_amount_paid")
-        plot_cost = sum(plot.cost_price for plot in plot_resale.booking.plots.all())
         booking_amount = plot_resale.booking.total_amount
         remaining=float(booking_amount)-float(company_amount_paid)
 
-        # Account Payable (credit)
-        account_payable_bank = Bank.objects.filter(
-            used_for="Account_Payable", project=project
-        ).first()
-        if account_payable_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=account_payable_bank,
-                transaction_type="Close_Booking",
-                payment=0,
-                deposit=company_amount_paid,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
-
-        # Account receivable (credit)
-        account_receivable_bank = Bank.objects.filter(
-            used_for="Account_Receivable", project=project
-        ).first()
-        if account_receivable_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=account_receivable_bank,
-                transaction_type="Close_Booking",
-                payment=remaining,
-                deposit=0,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
-
-        # Sale account (debit with booking price)
-        sale_bank = Bank.objects.filter(
-            used_for="Sale_Account", project=project
-        ).first()
-        if sale_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=sale_bank,
-                transaction_type="Close_Booking",
-                deposit=0,
-                payment=booking_amount,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
-
-        # Cost of Goods Sold (COGS - credit)
-        cogs_bank = Bank.objects.filter(
-            used_for="Cost_of_Good_Sold", project=project
-        ).first()
-        if cogs_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=cogs_bank,
-                transaction_type="Close_Booking",
-                payment=plot_cost,
-                deposit=0,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
-
-        # Land Inventory (debit)
-        land_inventory_bank = Bank.objects.filter(
-            used_for="Land_Inventory", project=project
-        ).first()
-        if land_inventory_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=land_inventory_bank,
-                transaction_type="Close_Booking",
-                deposit=plot_cost,
-                payment=0,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
+        post_entry(
+            project,
+            self.closing_lines(plot_resale, company_amount_paid, remaining),
+            "Close_Booking",
+            date,
+            "plot_resale",
+            plot_resale.id,
+        )
 
+    def closing_lines(self, plot_resale, company_amount_paid, remaining):
+        plot_cost = sum(plot.cost_price for plot in plot_resale.booking.plots.all())
+        booking_amount = plot_resale.booking.total_amount
+        return [
+            # Account Payable (credit)
+            entry_line("Account_Payable", deposit=company_amount_paid),
+            # Account receivable (credit)
+            entry_line("Account_Receivable", payment=remaining),
+            # Sale account (debit with booking price)
+            entry_line("Sale_Account", payment=booking_amount),
+            # Cost of Goods Sold (COGS - credit)
+            entry_line("Cost_of_Good_Sold", payment=plot_cost),
+            # Land Inventory (debit)
+            entry_line("Land_Inventory", deposit=plot_cost),
+        ]
 
     @transaction.atomic
     def update(self, instance, validated_data):
@@ -1162,214 +879,9 @@ class PlotResaleSerializer(serializers.ModelSerializer):
         return instance
 
     def update_bank_transactions(self, plot_resale, validated_data):
-        BankTransaction.objects.filter(related_id=plot_resale.id, transaction_type="Close_Booking").delete()
-        
-        project = plot_resale.booking.project
-        date = validated_data.get("date")
-        remaining = validated_data.get("remaining")
-        company_amount_paid = validated_data.get("company_amount_paid")
-        amount_received = validated_data.get("amount_received")
-        plot_cost = sum(plot.cost_price for plot in plot_resale.booking.plots.all())
-        booking_amount = plot_resale.booking.total_amount
-
-        if company_amount_paid > amount_received:
-            extra_refund_expense = Bank.objects.filter(
-                used_for="Extra_Refund_Expense", project=project
-            ).first()
-            BankTransaction.objects.create(
-                project=project,
-                bank=extra_refund_expense,
-                transaction_type="Close_Booking",
-                payment=0,
-                deposit=company_amount_paid - amount_received,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
-        elif company_amount_paid < amount_received:
-            extra_refund_income = Bank.objects.filter(
-                used_for="Extra_Refund_Income", project=project
-            ).first()
-            BankTransaction.objects.create(
-                project=project,
-                bank=extra_refund_income,
-                transaction_type="Close_Booking",
-                payment=0,
-                deposit=amount_received - company_amount_paid,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
-
-        # Account Payable (credit)
-        account_payable_bank = Bank.objects.filter(
-            used_for="Account_Payable", project=project
-        ).first()
-        if account_payable_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=account_payable_bank,
-                transaction_type="Close_Booking",
-                payment=0,
-                deposit=company_amount_paid,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
-
-        # Account receivable (credit)
-        account_receivable_bank = Bank.objects.filter(
-            used_for="Account_Receivable", project=project
-        ).first()
-        if account_receivable_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=account_receivable_bank,
-                transaction_type="Close_Booking",
-                payment=remaining,
-                deposit=0,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
-
-        # Sale account (debit with booking price)
-        sale_bank = Bank.objects.filter(
-            used_for="Sale_Account", project=project
-        ).first()
-        if sale_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=sale_bank,
-                transaction_type="Close_Booking",
-                deposit=0,
-                payment=booking_amount,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
-
-        # Cost of Goods Sold (COGS - credit)
-        cogs_bank = Bank.objects.filter(
-            used_for="Cost_of_Good_Sold", project=project
-        ).first()
-        if cogs_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=cogs_bank,
-                transaction_type="Close_Booking",
-                payment=plot_cost,
-                deposit=0,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
-
-        # Land Inventory (debit)
-        land_inventory_bank = Bank.objects.filter(
-            used_for="Land_Inventory", project=project
-        ).first()
-        if land_inventory_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=land_inventory_bank,
-                transaction_type="Close_Booking",
-                deposit=plot_cost,
-                payment=0,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
+        reverse_entry("plot_resale", plot_resale.id, ["Close_Booking"])
+        self.create_bank_transactions(plot_resale, validated_data)
 
     def update_bank_transactions_manual(self, plot_resale, validated_data):
-        BankTransaction.objects.filter(related_id=plot_resale.id, transaction_type="Close_Booking").delete()
-        
-        project = plot_resale.booking.project
-        date = validated_data.get("date")
-        company_amount_paid = validated_data.get("company_amount_paid")
-        plot_cost = sum(plot.cost_price for plot in plot_resale.booking.plots.all())
-        booking_amount = plot_resale.booking.total_amount
-        remaining=float(booking_amount)-float(company_amount_paid)
-
-
-       
-        # Account Payable (credit)
-        account_payable_bank = Bank.objects.filter(
-            used_for="Account_Payable", project=project
-        ).first()
-        if account_payable_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=account_payable_bank,
-                transaction_type="Close_Booking",
-                payment=0,
-                deposit=company_amount_paid,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
-
-        # Account receivable (credit)
-        account_receivable_bank = Bank.objects.filter(
-            used_for="Account_Receivable", project=project
-        ).first()
-        if account_receivable_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=account_receivable_bank,
-                transaction_type="Close_Booking",
-                payment=remaining,
-                deposit=0,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
-
-        # Sale account (debit with booking price)
-        sale_bank = Bank.objects.filter(
-            used_for="Sale_Account", project=project
-        ).first()
-        if sale_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=sale_bank,
-                transaction_type="Close_Booking",
-                deposit=0,
-                payment=booking_amount,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
-
-        # Cost of Goods Sold (COGS - credit)
-        cogs_bank = Bank.objects.filter(
-            used_for="Cost_of_Good_Sold", project=project
-        ).first()
-        if cogs_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=cogs_bank,
-                transaction_type="Close_Booking",
-                payment=plot_cost,
-                deposit=0,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
-
-        # Land Inventory (debit)
-        land_inventory_bank = Bank.objects.filter(
-            used_for="Land_Inventory", project=project
-        ).first()
-        if land_inventory_bank:
-            BankTransaction.objects.create(
-                project=project,
-                bank=land_inventory_bank,
-                transaction_type="Close_Booking",
-                deposit=plot_cost,
-                payment=0,
-                transaction_date=date,
-                related_table="plot_resale",
-                related_id=plot_resale.id,
-            )
-    
\ No newline at end of file
+        reverse_entry("plot_resale", plot_resale.id, ["Close_Booking"])
+        self.create_bank_transactions_manual(plot_resale, validated_data)
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .financials import token_amount, update_token_amount
+from .models import Booking, BookingFinancials, Token
+
+
+@receiver(post_save, sender=Booking)
+def update_booking_financials_token(sender, instance, created, update_fields=None, **kwargs):
+    # Saves of the received totals alone do not touch the token
+    if update_fields is not None and "token" not in update_fields:
+        return
+    update_token_amount(instance)
+
+
+@receiver(post_save, sender=Token)
+def update_token_bookings_financials(sender, instance, **kwargs):
+    BookingFinancials.objects.filter(booking__token=instance).update(
+        token_amount=token_amount(instance), updated_at=timezone.now()
+    )
@@ -1,3 +1,66 @@
+import io
+from django.core.management import call_command
 from django.test import TestCase
+from payments.models import IncomingFund
+from Zeeland.testing import QueryBudgetTestCase
+from .financials import rebuild_booking_financials
+from .models import Booking, BookingFinancials, PlotResale, Token
 
-# Create your tests here.
+
+class BookingQueryBudgetTests(QueryBudgetTestCase):
+    def test_bookings(self):
+        # The list ETag adds its aggregate and the data version lookup
+        self.assertQueryBudget(6, "booking/")
+        self.assertDetailQueryBudget(4, "booking/", Booking.objects.filter(project=self.large))
+
+    def test_bookings_for_payments(self):
+        self.assertQueryBudget(2, "booking-for-payments/")
+
+    def test_latest_booking_id(self):
+        self.assertLessEqual(
+            self.count_queries(f"booking/{self.large.id}/latest-booking/", {}), 3
+        )
+
+    def test_tokens(self):
+        self.assertQueryBudget(4, "plot-token/")
+        self.assertDetailQueryBudget(4, "plot-token/", Token.objects.filter(project=self.large))
+
+    def test_plot_resales(self):
+        self.assertQueryBudget(2, "plot-resale/")
+        self.assertDetailQueryBudget(
+            2, "plot-resale/", PlotResale.objects.filter(booking__project=self.large)
+        )
+
+
+class BookingFinancialsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("generate_dataset", scale=0.05, months=4, seed=3, stdout=io.StringIO())
+
+    def assertNoDrift(self):
+        self.assertEqual(rebuild_booking_financials(check_only=True), [])
+
+    def test_dataset_totals_match_funds(self):
+        self.assertEqual(BookingFinancials.objects.count(), Booking.objects.count())
+        self.assertNoDrift()
+
+    def test_fund_and_token_changes(self):
+        payment = IncomingFund.objects.filter(reference="payment").order_by("-date").first()
+        payment.amount += 100
+        payment.save()
+        self.assertNoDrift()
+        payment.delete()
+        self.assertNoDrift()
+
+        booking = Booking.objects.filter(token__isnull=False).first()
+        booking.token.status = "refunded"
+        booking.token.save()
+        self.assertEqual(BookingFinancials.objects.get(booking=booking).token_amount, 0)
+        self.assertNoDrift()
+
+    def test_rebuild_repairs_drift(self):
+        booking = Booking.objects.first()
+        BookingFinancials.objects.filter(booking=booking).update(paid_amount=-1)
+        self.assertEqual(rebuild_booking_financials(check_only=True), [booking.id])
+        self.assertEqual(rebuild_booking_financials(), [booking.id])
+        self.assertNoDrift()
@@ -11,11 +11,15 @@ from .serializers import (
 )
 from .models import Booking, Token, PlotResale
 from payments.models import BankTransaction,Bank
+from payments.accounts import get_account_id
+from projects.sequences import peek_document_number
+from django.db import transaction
 from django.db.models import Q
 from rest_framework.views import APIView
+from Zeeland.etags import ConditionalListMixin
 
 
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows Booking to be viewed or edited.
     """
@@ -52,7 +56,7 @@ class BookingViewSet(viewsets.ModelViewSet):
         queryset = (
             Booking.objects.filter(query_filters)
             .select_related("customer", "dealer", "bank")
-            .prefetch_related("files", "plots")
+            .prefetch_related("files", "plots__block")
         )
         return queryset
 
@@ -93,12 +97,7 @@ class BookingForPaymentsListView(ListAPIView):
 
 @api_view(["GET"])
 def latest_booking_id(request, project):
-    try:
-        latest_booking = Booking.objects.filter(project_id=project).latest("created_at")
-        booking_id = int(latest_booking.booking_id.split("-")[1]) + 1
-    except Booking.DoesNotExist:
-        booking_id = 1
-    booking_id_str = str(project) + "-" + str(booking_id).zfill(3)
+    booking_id_str = peek_document_number(project, "booking")
     return Response({"booking_id": booking_id_str}, status=status.HTTP_200_OK)
 
 
@@ -135,7 +134,7 @@ class TokenViewSet(viewsets.ModelViewSet):
         queryset = (
             Token.objects.filter(query_filters)
             .select_related("customer", "bank")
-            .prefetch_related("files", "plot")
+            .prefetch_related("files", "plot__block")
         )
         return queryset
 
@@ -150,7 +149,11 @@ class PlotResaleViewSet(viewsets.ModelViewSet):
     serializer_class = PlotResaleSerializer
 
     def get_queryset(self):
-        queryset = PlotResale.objects.all().select_related("booking__customer")
+        queryset = (
+            PlotResale.objects.all()
+            .select_related("booking__customer")
+            .prefetch_related("booking__plots")
+        )
         project_id = self.request.query_params.get("project")
         plot_id = self.request.query_params.get("plot_id")
         if project_id:
@@ -176,6 +179,7 @@ class PlotResaleViewSet(viewsets.ModelViewSet):
 
 
 class UpdateTokenStatusView(APIView):
+    @transaction.atomic
     def patch(self, request, token_id):
         try:
             token = Token.objects.get(pk=token_id)
@@ -208,6 +212,7 @@ class UpdateTokenStatusView(APIView):
         return Response({"status": token.status}, status=status.HTTP_200_OK)
 
 class RefundTokenViewSet(APIView):
+    @transaction.atomic
     def patch(self, request, token_id):
         try:
             token = Token.objects.get(pk=token_id)
@@ -260,13 +265,11 @@ class RefundTokenViewSet(APIView):
         token_type = refundPayment_type
         is_deposit = bank.detail_type != "Undeposited_Funds"
         is_cheque_clear = token_type != "Cheque"
-        account_receivable_bank = Bank.objects.filter(
-            used_for="Account_Receivable", project=project
-        ).first()
+        account_receivable_bank_id = get_account_id(project, "Account_Receivable")
 
         BankTransaction.objects.create(
             project=project,
-            bank=account_receivable_bank,
+            bank_id=account_receivable_bank_id,
             transaction_type="TokenRefund",
             payment=0,
             deposit=amount,
@@ -29,7 +29,7 @@ class Customers(models.Model):
     gender = models.BooleanField(default=True)
     remarks = models.TextField(blank=True, null=True)
     joining_date = models.DateField(blank=True, null=True)
-
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -1,3 +1,77 @@
+import io
+from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.test import TestCase
+from rest_framework.test import APIClient
+from projects.models import Projects
+from Zeeland.testing import QueryBudgetTestCase
+from .models import CustomerMessages, CustomerMessagesReminder, Customers, Dealers, Department
 
-# Create your tests here.
+
+class CustomerQueryBudgetTests(QueryBudgetTestCase):
+    def test_customers(self):
+        # The list ETag adds its aggregate and the data version lookup
+        self.assertQueryBudget(4, "customers/")
+        self.assertDetailQueryBudget(2, "customers/", Customers.objects.filter(project=self.large))
+
+    def test_dealers(self):
+        self.assertQueryBudget(2, "dealers/")
+        self.assertDetailQueryBudget(2, "dealers/", Dealers.objects.filter(project=self.large))
+
+    def test_departments(self):
+        self.assertQueryBudget(1, "departments/")
+        self.assertDetailQueryBudget(1, "departments/", Department.objects.all())
+
+    def test_customer_messages(self):
+        self.assertQueryBudget(2, "customer-messages/")
+        self.assertDetailQueryBudget(
+            2, "customer-messages/", CustomerMessages.objects.filter(booking__project=self.large)
+        )
+
+    def test_customer_message_reminders(self):
+        # Reminders are listed per user, not per project
+        self.assertQueryBudget(2, "customer-messages-reminder/")
+        self.assertDetailQueryBudget(
+            2, "customer-messages-reminder/", CustomerMessagesReminder.objects.all()
+        )
+
+
+class CustomerListETagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("etag", "etag@example.com", "etag")
+        call_command("generate_dataset", scale=0.03, months=2, seed=5, stdout=io.StringIO())
+        cls.project = Projects.objects.get()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_customers(self, etag=None, **params):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get("/api/customers/", {"project": self.project.id, **params}, **headers)
+
+    def test_not_modified_until_a_customer_changes(self):
+        response = self.get_customers()
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+
+        # Only the aggregate and the data version, nothing is serialized
+        with self.assertNumQueries(2):
+            response = self.get_customers(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(self.get_customers(etag, reference="vendor").status_code, 200)
+
+        customer = Customers.objects.filter(project=self.project).first()
+        customer.contact = "0300-0000000"
+        customer.save()
+        response = self.get_customers(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_list_without_project_has_no_etag(self):
+        response = self.client.get("/api/customers/")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("ETag"))
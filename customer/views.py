@@ -10,6 +10,7 @@ from .serializers import (
 )
 from .models import Customers, CustomerMessages, CustomerMessagesReminder, Dealers,Department
 from booking.models import Booking
+from Zeeland.etags import ConditionalListMixin
 
 
 class DepartmentViewSet(viewsets.ModelViewSet):
@@ -18,7 +19,7 @@ class DepartmentViewSet(viewsets.ModelViewSet):
 
 
 
-class CustomersViewSet(viewsets.ModelViewSet):
+class CustomersViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows Customers to be viewed or edited.
     """
@@ -26,7 +27,7 @@ class CustomersViewSet(viewsets.ModelViewSet):
     serializer_class = CustomersSerializer
 
     def get_queryset(self):
-        queryset = Customers.objects.all().prefetch_related("files")
+        queryset = Customers.objects.all().select_related("department").prefetch_related("files")
         project_id = self.request.query_params.get("project")
         department_id = self.request.query_params.get("department_id")
         reference_string = self.request.query_params.get("reference")
@@ -100,7 +101,11 @@ class CustomerMessagesListCreateView(generics.ListCreateAPIView):
 
 
 class CustomerMessagesDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = CustomerMessages.objects.all()
+    queryset = (
+        CustomerMessages.objects.all()
+        .select_related("booking__customer", "user")
+        .prefetch_related("files")
+    )
     serializer_class = CustomerMessagesSerializer
 
 
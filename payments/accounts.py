@@ -0,0 +1,72 @@
+import threading
+import time
+from django.conf import settings
+from .models import Bank
+
+# Accounts found by name rather than by role
+NAMED_ACCOUNTS = ("Discount Given",)
+
+_lock = threading.Lock()
+_registry = {}
+
+
+class ProjectAccounts:
+    """Role and named accounts of a project, as loaded by the registry."""
+
+    def __init__(self, banks):
+        self.roles = {}
+        self.names = {}
+        self.main_types = {}
+        # The lowest id wins, matching Bank.objects.filter(...).first()
+        for bank in sorted(banks, key=lambda bank: bank["id"]):
+            if bank["used_for"]:
+                self.roles.setdefault(bank["used_for"], bank["id"])
+            if bank["name"] in NAMED_ACCOUNTS:
+                self.names.setdefault(bank["name"], bank["id"])
+            self.main_types[bank["id"]] = bank["main_type"]
+        self.loaded_at = time.monotonic()
+
+
+def _project_id(project):
+    return getattr(project, "pk", project)
+
+
+def get_project_accounts(project):
+    """
+    Accounts of a project, loaded with one query on first use and kept in
+    process until a Bank of the project changes.
+
+    Other processes only see a change once their copy is older than
+    ACCOUNT_REGISTRY_TIMEOUT seconds.
+    """
+    project_id = _project_id(project)
+    timeout = getattr(settings, "ACCOUNT_REGISTRY_TIMEOUT", 300)
+    accounts = _registry.get(project_id)
+    if accounts is None or time.monotonic() - accounts.loaded_at > timeout:
+        banks = Bank.objects.filter(project_id=project_id).filter(
+            used_for__isnull=False
+        ) | Bank.objects.filter(project_id=project_id, name__in=NAMED_ACCOUNTS)
+        accounts = ProjectAccounts(banks.values("id", "used_for", "name", "main_type"))
+        with _lock:
+            _registry[project_id] = accounts
+    return accounts
+
+
+def get_account_id(project, role):
+    """Id of the project account used for ``role``, None if there is none."""
+    return get_project_accounts(project).roles.get(role)
+
+
+def get_account_ids(project, roles):
+    """{role: account id} for every role of the project that has an account."""
+    accounts = get_project_accounts(project)
+    return {role: accounts.roles[role] for role in roles if role in accounts.roles}
+
+
+def get_named_account_id(project, name):
+    return get_project_accounts(project).names.get(name)
+
+
+def invalidate_project_accounts(project):
+    with _lock:
+        _registry.pop(_project_id(project), None)
@@ -0,0 +1,259 @@
+import datetime
+from django.db import transaction
+from django.db.models import Q, F, Sum, Value, FloatField, Case, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from projects.models import ProjectDataVersion, Projects
+from .models import Bank, BankTransaction, AccountDailyBalance
+
+ROLLUP_VALUES = (
+    "project_id",
+    "bank_id",
+    "transaction_date",
+    "deposit",
+    "payment",
+    "is_cheque_clear",
+)
+
+
+def _as_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value[:10])
+    return value
+
+
+def collect_daily_balance_changes(rows, sign=1, changes=None):
+    """
+    Accumulate the rollup deltas of ``rows`` (BankTransaction instances or
+    dicts of ROLLUP_VALUES) into {(project_id, bank_id, date): [deposit,
+    payment, cleared_deposit, cleared_payment]}.
+    """
+    if changes is None:
+        changes = {}
+    for row in rows:
+        if isinstance(row, BankTransaction):
+            row = row.rollup_state()
+        key = (row["project_id"], row["bank_id"], _as_date(row["transaction_date"]))
+        if None in key:
+            continue
+        deposit = sign * float(row["deposit"] or 0)
+        payment = sign * float(row["payment"] or 0)
+        delta = changes.setdefault(key, [0, 0, 0, 0])
+        delta[0] += deposit
+        delta[1] += payment
+        if row["is_cheque_clear"]:
+            delta[2] += deposit
+            delta[3] += payment
+    return changes
+
+
+def apply_daily_balance_changes(changes):
+    """Add the deltas built by collect_daily_balance_changes to AccountDailyBalance."""
+    for (project_id, bank_id, date), delta in changes.items():
+        if not any(delta):
+            continue
+        deposit, payment, cleared_deposit, cleared_payment = delta
+        updated = AccountDailyBalance.objects.filter(
+            project_id=project_id, bank_id=bank_id, date=date
+        ).update(
+            deposit=F("deposit") + deposit,
+            payment=F("payment") + payment,
+            cleared_deposit=F("cleared_deposit") + cleared_deposit,
+            cleared_payment=F("cleared_payment") + cleared_payment,
+            updated_at=timezone.now(),
+        )
+        # A pure decrement of a missing bucket happens when the account is
+        # being cascade deleted, there is nothing to create then
+        if updated or not any(value > 0 for value in delta):
+            continue
+        with transaction.atomic():
+            day, created = AccountDailyBalance.objects.get_or_create(
+                project_id=project_id,
+                bank_id=bank_id,
+                date=date,
+                defaults={
+                    "deposit": deposit,
+                    "payment": payment,
+                    "cleared_deposit": cleared_deposit,
+                    "cleared_payment": cleared_payment,
+                },
+            )
+            if not created:
+                AccountDailyBalance.objects.filter(pk=day.pk).update(
+                    deposit=F("deposit") + deposit,
+                    payment=F("payment") + payment,
+                    cleared_deposit=F("cleared_deposit") + cleared_deposit,
+                    cleared_payment=F("cleared_payment") + cleared_payment,
+                    updated_at=timezone.now(),
+                )
+
+
+def daily_balance_totals(transactions):
+    """Group a BankTransaction queryset into AccountDailyBalance values."""
+    zero = Value(0, output_field=FloatField())
+    return (
+        transactions.values("project_id", "bank_id", "transaction_date")
+        .annotate(
+            deposit_sum=Coalesce(Sum("deposit"), zero),
+            payment_sum=Coalesce(Sum("payment"), zero),
+            cleared_deposit_sum=Coalesce(
+                Sum(Case(When(is_cheque_clear=True, then="deposit"), default=zero)),
+                zero,
+            ),
+            cleared_payment_sum=Coalesce(
+                Sum(Case(When(is_cheque_clear=True, then="payment"), default=zero)),
+                zero,
+            ),
+        )
+        .order_by()
+    )
+
+
+def rebuild_daily_balances(project_id=None, bank_ids=None, batch_size=1000):
+    """Recreate AccountDailyBalance from bank_transactions, returns the row count."""
+    transactions = BankTransaction.objects.all()
+    days = AccountDailyBalance.objects.all()
+    if project_id:
+        transactions = transactions.filter(project_id=project_id)
+        days = days.filter(project_id=project_id)
+    if bank_ids is not None:
+        transactions = transactions.filter(bank_id__in=bank_ids)
+        days = days.filter(bank_id__in=bank_ids)
+
+    count = 0
+    with transaction.atomic():
+        if bank_ids is not None:
+            # Postings to these accounts wait and then add to the rebuilt rows
+            list(days.select_for_update().values_list("id"))
+        days.delete()
+        batch = []
+        for row in daily_balance_totals(transactions).iterator():
+            batch.append(
+                AccountDailyBalance(
+                    project_id=row["project_id"],
+                    bank_id=row["bank_id"],
+                    date=row["transaction_date"],
+                    deposit=row["deposit_sum"],
+                    payment=row["payment_sum"],
+                    cleared_deposit=row["cleared_deposit_sum"],
+                    cleared_payment=row["cleared_payment_sum"],
+                )
+            )
+            if len(batch) >= batch_size:
+                AccountDailyBalance.objects.bulk_create(batch)
+                count += len(batch)
+                batch = []
+        AccountDailyBalance.objects.bulk_create(batch)
+        count += len(batch)
+        if project_id:
+            ProjectDataVersion.bump_on_commit(project_id)
+        elif bank_ids is not None:
+            ProjectDataVersion.bump_on_commit(
+                *Bank.objects.filter(pk__in=bank_ids).values_list("project_id", flat=True)
+            )
+        else:
+            ProjectDataVersion.bump_on_commit(*Projects.objects.values_list("id", flat=True))
+    return count
+
+
+def get_account_balances(
+    project_id=None, start_date=None, end_date=None, banks=None, cleared_only=False
+):
+    """
+    Return {bank_id: deposit - payment} computed in a single grouped query
+    over the AccountDailyBalance rollup.
+    """
+    query_filters = Q()
+    if project_id:
+        query_filters &= Q(project_id=project_id)
+    if start_date:
+        query_filters &= Q(date__gte=start_date)
+    if end_date:
+        query_filters &= Q(date__lte=end_date)
+    if banks is not None:
+        query_filters &= Q(bank__in=banks)
+
+    deposit_field, payment_field = "deposit", "payment"
+    if cleared_only:
+        deposit_field, payment_field = "cleared_deposit", "cleared_payment"
+
+    totals = (
+        AccountDailyBalance.objects.filter(query_filters)
+        .values("bank_id")
+        .annotate(
+            deposit_sum=Coalesce(Sum(deposit_field), Value(0, output_field=FloatField())),
+            payment_sum=Coalesce(Sum(payment_field), Value(0, output_field=FloatField())),
+        )
+        .order_by()
+    )
+    return {row["bank_id"]: row["deposit_sum"] - row["payment_sum"] for row in totals}
+
+
+def build_account_tree(banks, balances, balance_type=float):
+    """
+    Nest accounts under their parent_account in linear time.
+
+    Returns a list of (bank, entry) tuples for the top level accounts. A parent
+    that is not part of ``banks`` gets a zero balance placeholder entry so its
+    sub accounts are still grouped together. ``banks`` should be fetched with
+    select_related("parent_account") to avoid a query per placeholder.
+    """
+    entries = {}
+    for bank in banks:
+        entries[bank.id] = (
+            bank,
+            {
+                "bank_name": bank.name,
+                "bank_id": bank.id,
+                "balance": balance_type(balances.get(bank.id, 0)),
+                "sub_accounts": [],
+            },
+        )
+
+    roots = []
+    placeholders = {}
+    for bank, entry in entries.values():
+        parent_id = bank.parent_account_id
+        if parent_id is None:
+            roots.append((bank, entry))
+        elif parent_id in entries:
+            entries[parent_id][1]["sub_accounts"].append(entry)
+        else:
+            if parent_id not in placeholders:
+                parent = bank.parent_account
+                placeholders[parent_id] = (
+                    parent,
+                    {
+                        "bank_name": parent.name,
+                        "bank_id": parent.id,
+                        "balance": balance_type(0),
+                        "sub_accounts": [],
+                    },
+                )
+                roots.append(placeholders[parent_id])
+            placeholders[parent_id][1]["sub_accounts"].append(entry)
+    return roots
+
+
+def get_account_tree(bank_filters, project_id=None, start_date=None, end_date=None, balance_type=float):
+    """
+    Load the accounts matching ``bank_filters`` and their balances.
+
+    Returns (banks, balances, roots) using two queries regardless of the
+    number of accounts or transactions.
+    """
+    bank_queryset = Bank.objects.filter(bank_filters)
+    banks = list(bank_queryset.select_related("parent_account").order_by("id"))
+    balances = {
+        bank_id: balance_type(balance)
+        for bank_id, balance in get_account_balances(
+            project_id=project_id,
+            start_date=start_date,
+            end_date=end_date,
+            banks=bank_queryset.values("id"),
+        ).items()
+    }
+    roots = build_account_tree(banks, balances, balance_type=balance_type)
+    return banks, balances, roots
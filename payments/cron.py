@@ -1,15 +1,87 @@
 from django_cron import CronJobBase, Schedule
 from django.utils.timezone import now
 from booking.models import Booking
-from .models import PaymentReminder, IncomingFund
-from django.db.models.functions import Coalesce,Cast
+from booking.schedules import outstanding_amount
+from .models import PaymentReminder
 from django.db import transaction
-from django.db.models import Sum,FloatField
+from django.db.models import Exists, F, OuterRef, Q
 from django.contrib.auth.models import User
+import calendar
 import logging
+import time
 logger = logging.getLogger(__name__)
 
 
+def generate_payment_reminders(today=None, chunk_size=500):
+    """
+    Create a reminder for every active installment booking whose installment
+    day is today and whose schedule has an unpaid amount due.
+
+    Bookings that already have a reminder for today are skipped, so running
+    it more than once a day does not duplicate reminders. Returns the run
+    statistics.
+    """
+    started = time.monotonic()
+    today = today or now()
+    reminder_date = today.date() if hasattr(today, "date") else today
+    stats = {"date": str(reminder_date), "due": 0, "created": 0, "write_seconds": 0.0}
+
+    # Installment days past the end of a short month fall on its last day
+    day_filter = Q(installment_date=reminder_date.day)
+    if reminder_date.day == calendar.monthrange(reminder_date.year, reminder_date.month)[1]:
+        day_filter = Q(installment_date__gte=reminder_date.day)
+
+    bookings = (
+        Booking.objects.filter(
+            day_filter, booking_type="installment_payment", status="active"
+        )
+        .annotate(
+            short_fall=outstanding_amount(reminder_date),
+            has_reminder=Exists(
+                PaymentReminder.objects.filter(
+                    booking=OuterRef("pk"), reminder_date=reminder_date
+                )
+            ),
+        )
+        .filter(short_fall__gt=0.5, has_reminder=False)
+        .values("id", "project_id", "booking_id", "short_fall", contact=F("customer__contact"))
+        .order_by("id")
+    )
+
+    admin_user = User.objects.get(pk=1)  # Fetch the user instance once
+    batch = []
+    for booking in bookings.iterator(chunk_size=chunk_size):
+        stats["due"] += 1
+        short_fall_amount = round(booking["short_fall"])
+        batch.append(
+            PaymentReminder(
+                project_id=booking["project_id"],
+                booking_id=booking["id"],
+                reminder_date=reminder_date,
+                user=admin_user,
+                contact=booking["contact"],
+                worked_on=False,
+                remarks=f"Payment not recieved for booking {booking['booking_id']} outstanding amount: {float(short_fall_amount)}",
+            )
+        )
+        if len(batch) >= chunk_size:
+            _create_reminders(batch, stats)
+            batch = []
+    if batch:
+        _create_reminders(batch, stats)
+
+    stats["write_seconds"] = round(stats["write_seconds"], 3)
+    stats["total_seconds"] = round(time.monotonic() - started, 3)
+    return stats
+
+
+def _create_reminders(reminders, stats):
+    started = time.monotonic()
+    with transaction.atomic():
+        PaymentReminder.objects.bulk_create(reminders)
+    stats["created"] += len(reminders)
+    stats["write_seconds"] += time.monotonic() - started
+
 
 class GeneratePaymentReminders(CronJobBase):
     RUN_EVERY_MINS = 1  # Runs daily (adjust as needed)
@@ -18,57 +90,11 @@ class GeneratePaymentReminders(CronJobBase):
 
     def do(self):
         today = now()
-        with transaction.atomic():
-            logger.info(f"Running payment reminder cron job for {today}")
-            day_of_month = today.day
-            bookings = Booking.objects.filter(booking_type="installment_payment", project_id=6, installment_date= day_of_month, status="active")
-            logger.info(f"Found {len(bookings)} active installment bookings")
-
-            for booking in bookings:
-                logger.info(f"Processing booking {booking.booking_id}")
-                token_amount_received = 0.0
-                if booking.token:
-                    if booking.token.status!="refunded":
-                        token_amount_received=booking.token.amount
-
-                installment_received_amount = (
-                    IncomingFund.objects
-                    .filter(booking=booking, reference__in=["payment", "Discount"])
-                    .annotate(amount_as_float=Cast("amount", FloatField()))  # Cast amount to FloatField
-                    .aggregate(total=Coalesce(Sum("amount_as_float"), 0.0)).get("total", 0.0)
-                )
-                refunded_amount= (
-                    IncomingFund.objects
-                    .filter(booking=booking, reference="refund")
-                    .annotate(amount_as_float=Cast("amount", FloatField()))  # Cast amount to FloatField
-                    .aggregate(total=Coalesce(Sum("amount_as_float"), 0.0)).get("total", 0.0)
-                )
-                booking_received_amount = installment_received_amount + token_amount_received - refunded_amount
-                reminder_date = today.date()  # Store a proper date
-                booking_date=booking.booking_date
-                due_date=booking.due_date
-                if today.year < due_date.year or (today.year == due_date.year and today.month < due_date.month):
-                    due_date = today.date()
-                booking_months_count = (due_date.year - booking_date.year) * 12 + (due_date.month - booking_date.month)
-                logger.info(f"Processing due_date {booking_months_count}")
-
-                booking_payments_total= booking_months_count * booking.installment_per_month + token_amount_received + booking.advance
-                logger.info(f"Processing booking_payments_total {booking_payments_total}")
-                logger.info(f"Processing booking_received_amount {booking_received_amount}")
-                short_fall_amount=round(booking_payments_total-booking_received_amount)
-                logger.info(f"Processing short_fall_amount {short_fall_amount}")
-
-
-                if booking_payments_total > booking_received_amount:
-                    admin_user = User.objects.get(pk=1)  # Fetch the user instance
-                    PaymentReminder.objects.create(
-                        project=booking.project,
-                        booking=booking,
-                        reminder_date=reminder_date,
-                        user=admin_user,
-                        contact=booking.customer.contact,
-                        worked_on=False,
-                        created_at=today,
-                        updated_at=today,
-                        remarks=f"Payment not recieved for booking {booking.booking_id} outstanding amount: {float(short_fall_amount)}"
-                    )
\ No newline at end of file
+        logger.info(f"Running payment reminder cron job for {today}")
+        stats = generate_payment_reminders(today)
+        logger.info(
+            f"Payment reminders for {stats['date']}: {stats['due']} bookings due, "
+            f"{stats['created']} reminders created in {stats['total_seconds']}s "
+            f"({stats['write_seconds']}s writing)"
+        )
+        return stats
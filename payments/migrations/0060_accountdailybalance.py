@@ -0,0 +1,75 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:12
+
+from django.db import migrations, models
+from django.db.models import Case, FloatField, Sum, Value, When
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def populate_daily_balances(apps, schema_editor):
+    BankTransaction = apps.get_model("payments", "BankTransaction")
+    AccountDailyBalance = apps.get_model("payments", "AccountDailyBalance")
+    zero = Value(0, output_field=FloatField())
+    totals = (
+        BankTransaction.objects.values("project_id", "bank_id", "transaction_date")
+        .annotate(
+            deposit_sum=Coalesce(Sum("deposit"), zero),
+            payment_sum=Coalesce(Sum("payment"), zero),
+            cleared_deposit_sum=Coalesce(
+                Sum(Case(When(is_cheque_clear=True, then="deposit"), default=zero)),
+                zero,
+            ),
+            cleared_payment_sum=Coalesce(
+                Sum(Case(When(is_cheque_clear=True, then="payment"), default=zero)),
+                zero,
+            ),
+        )
+        .order_by()
+    )
+    batch = []
+    for row in totals.iterator():
+        batch.append(
+            AccountDailyBalance(
+                project_id=row["project_id"],
+                bank_id=row["bank_id"],
+                date=row["transaction_date"],
+                deposit=row["deposit_sum"],
+                payment=row["payment_sum"],
+                cleared_deposit=row["cleared_deposit_sum"],
+                cleared_payment=row["cleared_payment_sum"],
+            )
+        )
+        if len(batch) >= 1000:
+            AccountDailyBalance.objects.bulk_create(batch)
+            batch = []
+    AccountDailyBalance.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_projects_cost_per_marla'),
+        ('payments', '0059_incomingfund_created_at_incomingfund_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountDailyBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('deposit', models.FloatField(default=0)),
+                ('payment', models.FloatField(default=0)),
+                ('cleared_deposit', models.FloatField(default=0)),
+                ('cleared_payment', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('bank', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='payments.bank')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='projects.projects')),
+            ],
+            options={
+                'db_table': 'account_daily_balances',
+                'unique_together': {('project', 'bank', 'date')},
+            },
+        ),
+        migrations.RunPython(populate_daily_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.16 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0060_accountdailybalance'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='banktransaction',
+            index=models.Index(fields=['related_table', 'related_id'], name='bank_tx_related_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='banktransaction',
+            index=models.Index(fields=['project', 'bank', 'transaction_date'], name='bank_tx_project_bank_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='banktransaction',
+            index=models.Index(fields=['bank', 'is_cheque_clear', 'transaction_date'], name='bank_tx_bank_cleared_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incomingfund',
+            index=models.Index(fields=['project', 'document_number'], name='fund_project_document_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incomingfund',
+            index=models.Index(fields=['booking', 'reference'], name='fund_booking_reference_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incomingfund',
+            index=models.Index(fields=['project', 'date'], name='fund_project_date_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.16 on 2026-10-18 22:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_projects_cost_per_marla'),
+        ('payments', '0061_report_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('since', models.DateTimeField(blank=True, null=True)),
+                ('fixed', models.BooleanField(default=False)),
+                ('bookings_checked', models.IntegerField(default=0)),
+                ('booking_mismatches', models.IntegerField(default=0)),
+                ('accounts_checked', models.IntegerField(default=0)),
+                ('account_mismatches', models.IntegerField(default=0)),
+                ('project', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='projects.projects')),
+            ],
+            options={
+                'db_table': 'reconciliation_runs',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='accountdailybalance',
+            index=models.Index(fields=['updated_at'], name='daily_balance_updated_idx'),
+        ),
+    ]
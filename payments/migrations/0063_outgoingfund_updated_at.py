@@ -0,0 +1,20 @@
+# Generated by Django 4.2.16 on 2026-10-18 23:30
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0062_reconciliationrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outgoingfund',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
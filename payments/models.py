@@ -1,5 +1,5 @@
-from django.db import models
-from projects.models import Projects
+from django.db import models, transaction
+from projects.models import ProjectDataVersion, Projects
 from booking.models import Booking
 from customer.models import Customers
 from plots.models import Plots
@@ -26,6 +26,56 @@ class Bank(models.Model):
     class Meta:
         db_table = "banks"
 
+class BankTransactionQuerySet(models.QuerySet):
+    """
+    Keeps AccountDailyBalance and the project data versions in step with
+    bulk writes, which bypass the post_save / post_delete signals.
+    """
+
+    rollup_fields = {
+        "project",
+        "project_id",
+        "bank",
+        "bank_id",
+        "deposit",
+        "payment",
+        "transaction_date",
+        "is_cheque_clear",
+    }
+
+    def update(self, **kwargs):
+        if not self.rollup_fields.intersection(kwargs):
+            return super().update(**kwargs)
+
+        from .balances import ROLLUP_VALUES, apply_daily_balance_changes, collect_daily_balance_changes
+
+        with transaction.atomic(using=self.db):
+            before = list(self.values("pk", *ROLLUP_VALUES))
+            rows = super().update(**kwargs)
+            pks = [row["pk"] for row in before]
+            after = list(
+                BankTransaction.objects.using(self.db)
+                .filter(pk__in=pks)
+                .values(*ROLLUP_VALUES)
+            )
+            changes = collect_daily_balance_changes(before, sign=-1)
+            collect_daily_balance_changes(after, sign=1, changes=changes)
+            apply_daily_balance_changes(changes)
+            ProjectDataVersion.bump_on_commit(*(project_id for project_id, _, _ in changes))
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .balances import apply_daily_balance_changes, collect_daily_balance_changes
+
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            apply_daily_balance_changes(collect_daily_balance_changes(objs, sign=1))
+            ProjectDataVersion.bump_on_commit(*(obj.project_id for obj in objs))
+            for obj in objs:
+                obj._rollup_state = obj.rollup_state()
+        return objs
+
+
 class BankTransaction(models.Model):
     project = models.ForeignKey(Projects, on_delete=models.PROTECT)
     bank = models.ForeignKey(Bank, on_delete=models.CASCADE)
@@ -38,8 +88,79 @@ class BankTransaction(models.Model):
     is_deposit = models.BooleanField(default=True)
     is_cheque_clear=models.BooleanField(default=True)
 
+    objects = BankTransactionQuerySet.as_manager()
+
     class Meta:
         db_table = "bank_transactions"
+        indexes = [
+            models.Index(fields=["related_table", "related_id"], name="bank_tx_related_idx"),
+            models.Index(
+                fields=["project", "bank", "transaction_date"],
+                name="bank_tx_project_bank_date_idx",
+            ),
+            models.Index(
+                fields=["bank", "is_cheque_clear", "transaction_date"],
+                name="bank_tx_bank_cleared_date_idx",
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so a later save() can move the amounts
+        # out of the daily balance bucket they were counted in
+        instance._rollup_state = instance.rollup_state()
+        return instance
+
+    def rollup_state(self):
+        return {
+            "project_id": self.__dict__.get("project_id"),
+            "bank_id": self.__dict__.get("bank_id"),
+            "transaction_date": self.__dict__.get("transaction_date"),
+            "deposit": self.__dict__.get("deposit"),
+            "payment": self.__dict__.get("payment"),
+            "is_cheque_clear": self.__dict__.get("is_cheque_clear"),
+        }
+
+
+class AccountDailyBalance(models.Model):
+    """Deposit and payment totals of an account for a single day."""
+
+    project = models.ForeignKey(Projects, on_delete=models.CASCADE)
+    bank = models.ForeignKey(Bank, on_delete=models.CASCADE)
+    date = models.DateField()
+    deposit = models.FloatField(default=0)
+    payment = models.FloatField(default=0)
+    cleared_deposit = models.FloatField(default=0)
+    cleared_payment = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "account_daily_balances"
+        unique_together = ("project", "bank", "date")
+        indexes = [
+            models.Index(fields=["updated_at"], name="daily_balance_updated_idx"),
+        ]
+
+
+class ReconciliationRun(models.Model):
+    """
+    A comparison of the stored booking and account totals with the rows
+    they are made of, see payments.reconciliation.
+    """
+
+    project = models.ForeignKey(Projects, on_delete=models.CASCADE, blank=True, null=True)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(blank=True, null=True)
+    since = models.DateTimeField(blank=True, null=True)
+    fixed = models.BooleanField(default=False)
+    bookings_checked = models.IntegerField(default=0)
+    booking_mismatches = models.IntegerField(default=0)
+    accounts_checked = models.IntegerField(default=0)
+    account_mismatches = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "reconciliation_runs"
 
 class MonthField(models.DateField):
     def to_python(self, value):
@@ -82,6 +203,11 @@ class IncomingFund(models.Model):
 
     class Meta:
         db_table = "incoming_funds"
+        indexes = [
+            models.Index(fields=["project", "document_number"], name="fund_project_document_idx"),
+            models.Index(fields=["booking", "reference"], name="fund_booking_reference_idx"),
+            models.Index(fields=["project", "date"], name="fund_project_date_idx"),
+        ]
 
 
 class IncomingFundDocuments(models.Model):
@@ -128,6 +254,7 @@ class OutgoingFund(models.Model):
     bank = models.ForeignKey(
         Bank, related_name="expenses", on_delete=models.PROTECT, blank=True, null=True
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = "outgoing_funds"
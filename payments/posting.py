@@ -0,0 +1,147 @@
+import logging
+from django.db import transaction
+from rest_framework import serializers
+from projects.models import ProjectDataVersion
+from .models import Bank, BankTransaction
+from .accounts import get_project_accounts
+
+logger = logging.getLogger(__name__)
+
+# Main types whose balance grows with a debit or with a credit. A deposit
+# is an increase of the account, so it is a debit for the first and a
+# credit for the second.
+DEBIT_MAIN_TYPES = {"asset", "assets", "expense", "expenses"}
+CREDIT_MAIN_TYPES = {"liability", "liabilities", "equity", "income"}
+
+
+def entry_line(account, deposit=0, payment=0, **fields):
+    """
+    One line of a journal entry. ``account`` is a Bank, the id of a role or
+    named account of the project, or the used_for role of the project
+    account, e.g. entry_line("Sale_Account", deposit=amount).
+    Lines sharing a ``group`` are only posted together.
+    """
+    return {"account": account, "deposit": deposit or 0, "payment": payment or 0, **fields}
+
+
+def resolve_account(accounts, account):
+    """(bank id, main type) of a line account, (None, None) if there is none."""
+    if isinstance(account, Bank):
+        return account.id, account.main_type
+    if isinstance(account, str):
+        account = accounts.roles.get(account)
+    if account is None:
+        return None, None
+    return account, accounts.main_types.get(account)
+
+
+def debit_credit(main_type, deposit, payment):
+    if (main_type or "").lower() in DEBIT_MAIN_TYPES:
+        return deposit, payment
+    return payment, deposit
+
+
+def check_balanced(lines):
+    """
+    Raise a ValidationError unless the debits of the lines equal their
+    credits. Entries with an account of an unknown main type are not
+    checked, as its side cannot be told.
+    """
+    unknown = {
+        line["main_type"]
+        for line in lines
+        if (line["main_type"] or "").lower() not in DEBIT_MAIN_TYPES | CREDIT_MAIN_TYPES
+    }
+    if unknown:
+        logger.warning("Entry not checked, unknown main types %s", sorted(unknown, key=str))
+        return
+    debit = credit = 0
+    for line in lines:
+        line_debit, line_credit = debit_credit(
+            line["main_type"], float(line["deposit"]), float(line["payment"])
+        )
+        debit += line_debit
+        credit += line_credit
+    if abs(debit - credit) > 0.01:
+        raise serializers.ValidationError(
+            f"Unbalanced entry: debits {round(debit, 2)} and credits {round(credit, 2)}"
+        )
+
+
+@transaction.atomic
+def post_entry(
+    project,
+    lines,
+    transaction_type,
+    transaction_date,
+    related_table,
+    related_id,
+    validate=True,
+):
+    """
+    Write the lines of one business event as bank transactions with a single
+    bulk_create.
+
+    Lines whose role has no account in the project are skipped with the
+    rest of their group, as the project may not use that account. When
+    every account is found the entry must balance unless ``validate`` is
+    False.
+    """
+    accounts = get_project_accounts(project)
+    resolved = []
+    missing_groups = set()
+    for line in lines:
+        line = dict(line)
+        line["bank_id"], line["main_type"] = resolve_account(
+            accounts, line.pop("account")
+        )
+        resolved.append(line)
+        if line["bank_id"] is None:
+            missing_groups.add(line.get("group"))
+    resolved = [
+        line
+        for line in resolved
+        if line["bank_id"] is not None
+        and (line.get("group") is None or line.get("group") not in missing_groups)
+    ]
+
+    if validate and len(resolved) == len(lines):
+        check_balanced(resolved)
+
+    # bulk_create sends no post_save, bump the version cached reports use
+    project_id = getattr(project, "pk", project)
+    transaction.on_commit(lambda: ProjectDataVersion.bump(project_id))
+    return BankTransaction.objects.bulk_create(
+        [
+            BankTransaction(
+                project_id=project_id,
+                bank_id=line["bank_id"],
+                transaction_type=line.get("transaction_type", transaction_type),
+                transaction_date=transaction_date,
+                related_table=related_table,
+                related_id=related_id,
+                deposit=line["deposit"],
+                payment=line["payment"],
+                **{
+                    field: line[field]
+                    for field in ("is_deposit", "is_cheque_clear")
+                    if field in line
+                },
+            )
+            for line in resolved
+        ]
+    )
+
+
+def reverse_entry(related_table, related_id, transaction_types=None):
+    """
+    Delete the bank transactions of a business event. BankTransaction has
+    delete signals, so Django loads the rows and updates the daily
+    balances, checkpoints and data version for each of them.
+    """
+    transactions = BankTransaction.objects.filter(
+        related_table=related_table, related_id=related_id
+    )
+    if transaction_types:
+        transactions = transactions.filter(transaction_type__in=transaction_types)
+    return transactions.delete()
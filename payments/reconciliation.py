@@ -0,0 +1,233 @@
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from booking.models import Booking
+from projects.models import ProjectDataVersion
+from .balances import rebuild_daily_balances
+from .models import AccountDailyBalance, Bank, BankTransaction, IncomingFund, ReconciliationRun
+
+# Stored and recomputed totals closer than this are taken as equal
+TOLERANCE = 0.01
+# AccountDailyBalance totals compared with the transactions of an account
+ACCOUNT_TOTALS = ("deposit", "payment", "cleared_deposit", "cleared_payment")
+
+
+def received_totals(bookings):
+    """{booking_id: payments and discounts less refunds} read from incoming_funds."""
+    totals = (
+        IncomingFund.objects.filter(booking__in=bookings.values("id"))
+        .values("booking_id")
+        .annotate(
+            total=Coalesce(
+                Sum(
+                    Case(
+                        When(reference__in=["payment", "Discount"], then=F("amount")),
+                        When(reference="refund", then=F("amount") * -1),
+                        default=Value(0.0),
+                        output_field=FloatField(),
+                    )
+                ),
+                Value(0.0),
+                output_field=FloatField(),
+            )
+        )
+        .order_by()
+    )
+    return {row["booking_id"]: row["total"] for row in totals}
+
+
+def booking_mismatches(bookings):
+    """
+    Compare total_receiving_amount and remaining of ``bookings`` with their
+    incoming funds and token, returns (checked, mismatches).
+    """
+    received = received_totals(bookings)
+    checked = 0
+    mismatches = []
+    for booking in (
+        bookings.order_by("id")
+        .values(
+            "id",
+            "booking_id",
+            "project_id",
+            "total_amount",
+            "total_receiving_amount",
+            "remaining",
+            "token__amount",
+        )
+        .iterator()
+    ):
+        checked += 1
+        # The token counts as received, as when the booking is saved
+        expected = received.get(booking["id"], 0.0) + (booking["token__amount"] or 0)
+        expected_remaining = booking["total_amount"] - expected
+        if (
+            abs(booking["total_receiving_amount"] - expected) > TOLERANCE
+            or abs(booking["remaining"] - expected_remaining) > TOLERANCE
+        ):
+            mismatches.append(
+                {
+                    "id": booking["id"],
+                    "booking_id": booking["booking_id"],
+                    "project_id": booking["project_id"],
+                    "total_receiving_amount": booking["total_receiving_amount"],
+                    "expected_total_receiving_amount": round(expected, 2),
+                    "remaining": booking["remaining"],
+                    "expected_remaining": round(expected_remaining, 2),
+                }
+            )
+    return checked, mismatches
+
+
+def account_totals(rows):
+    """{bank_id: (deposit, payment, cleared deposit, cleared payment)} of grouped rows."""
+    return {
+        row["bank_id"]: tuple(row[f"total_{field}"] for field in ACCOUNT_TOTALS) for row in rows
+    }
+
+
+def account_mismatches(banks):
+    """
+    Compare the AccountDailyBalance totals of ``banks`` with their
+    transactions, returns (checked, mismatches).
+    """
+    zero = Value(0.0, output_field=FloatField())
+    stored = account_totals(
+        AccountDailyBalance.objects.filter(bank__in=banks.values("id"))
+        .values("bank_id")
+        .annotate(**{f"total_{field}": Coalesce(Sum(field), zero) for field in ACCOUNT_TOTALS})
+        .order_by()
+    )
+    expected = account_totals(
+        BankTransaction.objects.filter(bank__in=banks.values("id"))
+        .values("bank_id")
+        .annotate(
+            total_deposit=Coalesce(Sum("deposit"), zero),
+            total_payment=Coalesce(Sum("payment"), zero),
+            total_cleared_deposit=Coalesce(Sum("deposit", filter=Q(is_cheque_clear=True)), zero),
+            total_cleared_payment=Coalesce(Sum("payment", filter=Q(is_cheque_clear=True)), zero),
+        )
+        .order_by()
+    )
+    checked = 0
+    mismatches = []
+    nothing = (0.0,) * len(ACCOUNT_TOTALS)
+    for bank in banks.order_by("id").values("id", "name", "project_id").iterator():
+        checked += 1
+        stored_totals = stored.get(bank["id"], nothing)
+        expected_totals = expected.get(bank["id"], nothing)
+        if any(
+            abs(value - expected_value) > TOLERANCE
+            for value, expected_value in zip(stored_totals, expected_totals)
+        ):
+            mismatches.append(
+                {
+                    "id": bank["id"],
+                    "name": bank["name"],
+                    "project_id": bank["project_id"],
+                    **dict(zip(ACCOUNT_TOTALS, stored_totals)),
+                    **{
+                        f"expected_{field}": round(value, 2)
+                        for field, value in zip(ACCOUNT_TOTALS, expected_totals)
+                    },
+                }
+            )
+    return checked, mismatches
+
+
+def last_run(project_id=None):
+    """Latest finished run that covered ``project_id``."""
+    runs = ReconciliationRun.objects.filter(finished_at__isnull=False)
+    if project_id:
+        runs = runs.filter(Q(project__isnull=True) | Q(project_id=project_id))
+    else:
+        runs = runs.filter(project__isnull=True)
+    return runs.order_by("-started_at").first()
+
+
+def fix_bookings(mismatches):
+    """Write the expected totals, rechecked with the bookings locked."""
+    booking_ids = [row["id"] for row in mismatches]
+    # Payments posted meanwhile wait for the lock and then add to the fixed totals
+    list(Booking.objects.filter(pk__in=booking_ids).select_for_update().values_list("id"))
+    _, mismatches = booking_mismatches(Booking.objects.filter(pk__in=booking_ids))
+    Booking.objects.bulk_update(
+        [
+            Booking(
+                pk=row["id"],
+                total_receiving_amount=row["expected_total_receiving_amount"],
+                remaining=row["expected_remaining"],
+            )
+            for row in mismatches
+        ],
+        ["total_receiving_amount", "remaining"],
+        batch_size=500,
+    )
+
+
+def fix_accounts(mismatches):
+    """Rebuild the daily balances of the accounts from their transactions."""
+    rebuild_daily_balances(bank_ids=[row["id"] for row in mismatches])
+
+
+def reconcile(project_id=None, incremental=False, fix=False):
+    """
+    Compare the stored booking totals and account daily balances with the
+    rows they are made of and, with ``fix``, write the recomputed values.
+
+    Incremental runs only check the bookings and accounts whose funds,
+    token or transactions changed since the last run. Every run is
+    recorded, returns (run, booking mismatches, account mismatches).
+    """
+    run = ReconciliationRun(project_id=project_id, started_at=timezone.now(), fixed=fix)
+    bookings = Booking.objects.all()
+    banks = Bank.objects.all()
+    if project_id:
+        bookings = bookings.filter(project_id=project_id)
+        banks = banks.filter(project_id=project_id)
+
+    previous = last_run(project_id) if incremental else None
+    if previous:
+        run.since = previous.started_at
+        bookings = bookings.filter(
+            Q(updated_at__gte=run.since)
+            | Q(financials__updated_at__gte=run.since)
+            | Q(token__updated_at__gte=run.since)
+        )
+        banks = banks.filter(
+            id__in=AccountDailyBalance.objects.filter(updated_at__gte=run.since).values("bank_id")
+        )
+
+    run.bookings_checked, bookings_found = booking_mismatches(bookings)
+    run.accounts_checked, accounts_found = account_mismatches(banks)
+    run.booking_mismatches = len(bookings_found)
+    run.account_mismatches = len(accounts_found)
+
+    with transaction.atomic():
+        if fix and bookings_found:
+            fix_bookings(bookings_found)
+        if fix and accounts_found:
+            fix_accounts(accounts_found)
+        if fix:
+            ProjectDataVersion.bump_on_commit(
+                *(row["project_id"] for row in bookings_found + accounts_found)
+            )
+        run.finished_at = timezone.now()
+        run.save()
+    return run, bookings_found, accounts_found
+
+
+def run_summary(run):
+    return {
+        "id": run.id,
+        "project": run.project_id,
+        "started_at": run.started_at,
+        "finished_at": run.finished_at,
+        "since": run.since,
+        "fixed": run.fixed,
+        "bookings_checked": run.bookings_checked,
+        "booking_mismatches": run.booking_mismatches,
+        "accounts_checked": run.accounts_checked,
+        "account_mismatches": run.account_mismatches,
+    }
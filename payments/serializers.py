@@ -3,6 +3,9 @@ from booking.models import Booking, Token
 from plots.models import Plots
 from customer.models import Customers, Dealers
 from payments.models import IncomingFund
+from .posting import entry_line, post_entry
+from .accounts import get_account_id, get_named_account_id
+from projects.sequences import claim_document_number, next_document_number
 from .models import (
     ExpenseType,
     IncomingFund,
@@ -34,7 +37,7 @@ from .models import (
 import datetime
 import re
 from django.db import transaction
-from django.db.models import Sum, ProtectedError
+from django.db.models import ProtectedError
 from rest_framework.exceptions import ValidationError
 from django.core.files.base import ContentFile
 from urllib.request import urlopen
@@ -57,6 +60,81 @@ class BankSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+RELATED_OBJECT_QUERYSETS = {
+    "incoming_funds": lambda: IncomingFund.objects.select_related(
+        "booking__customer"
+    ).prefetch_related("booking__plots"),
+    "Booking": lambda: Booking.objects.select_related("customer").prefetch_related(
+        "plots"
+    ),
+    "token": lambda: Token.objects.select_related("customer").prefetch_related("plot"),
+    "OutgoingFund": lambda: OutgoingFund.objects.select_related("payee"),
+    "dealer_payments": lambda: DealerPayments.objects.select_related(
+        "booking__dealer"
+    ).prefetch_related("booking__plots"),
+}
+
+
+def load_related_objects(transactions):
+    """
+    Load the records referenced by related_table / related_id of the given
+    transactions, one query per table plus its prefetches.
+
+    Returns {(related_table, related_id): instance}.
+    """
+    ids_by_table = {}
+    for obj in transactions:
+        if obj.related_table in RELATED_OBJECT_QUERYSETS:
+            ids_by_table.setdefault(obj.related_table, set()).add(obj.related_id)
+
+    related_objects = {}
+    for related_table, ids in ids_by_table.items():
+        queryset = RELATED_OBJECT_QUERYSETS[related_table]().filter(pk__in=ids)
+        for instance in queryset:
+            related_objects[(related_table, instance.pk)] = instance
+    return related_objects
+
+
+def attach_related_objects(transactions):
+    """
+    Cache the record referenced by each transaction on it, loading those
+    not cached yet together. BankTransactionSerializer uses the cache.
+    """
+    transactions = [obj for obj in transactions if not hasattr(obj, "_related_object")]
+    related_objects = load_related_objects(transactions)
+    for obj in transactions:
+        obj._related_object = related_objects.get((obj.related_table, obj.related_id))
+
+
+class NestedTransactionsListSerializer(serializers.ListSerializer):
+    """
+    Load the records of the bank transactions nested in all the items at
+    once instead of per transaction. The child serializer lists them in
+    get_transactions().
+    """
+
+    def to_representation(self, data):
+        instances = list(data.all() if hasattr(data, "all") else data)
+        attach_related_objects(
+            obj for instance in instances for obj in self.child.get_transactions(instance)
+        )
+        return super().to_representation(instances)
+
+
+def get_plot_info_list(plots):
+    return [
+        f"{plot.plot_number} || {plot.get_type_display()} || {plot.get_plot_size()}"
+        for plot in plots
+    ]
+
+
+class BankTransactionListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        transactions = list(data.all() if hasattr(data, "all") else data)
+        self.child.related_objects = load_related_objects(transactions)
+        return super().to_representation(transactions)
+
+
 class BankTransactionSerializer(serializers.ModelSerializer):
     bank_name = serializers.CharField(source="bank.name", read_only=True)
     customer_name = serializers.SerializerMethodField()
@@ -66,125 +144,52 @@ class BankTransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = BankTransaction
         fields = "__all__"
+        list_serializer_class = BankTransactionListSerializer
+
+    def get_related_object(self, obj):
+        related_objects = getattr(self, "related_objects", None)
+        if related_objects is not None:
+            return related_objects.get((obj.related_table, obj.related_id))
+        # Serializing a single transaction, only resolve this one
+        if not hasattr(obj, "_related_object"):
+            obj._related_object = load_related_objects([obj]).get(
+                (obj.related_table, obj.related_id)
+            )
+        return obj._related_object
 
     def get_customer_name(self, obj):
+        related_instance = self.get_related_object(obj)
+        if related_instance is None:
+            return None
         if obj.related_table == "incoming_funds":
-            try:
-                related_instance = IncomingFund.objects.get(pk=obj.related_id)
-                return related_instance.booking.customer.name
-            except IncomingFund.DoesNotExist:
-                return None
-        elif obj.related_table == "Booking":
-            try:
-                related_instance = Booking.objects.get(pk=obj.related_id)
-                return related_instance.customer.name
-            except Booking.DoesNotExist:
-                return None
-        elif obj.related_table == "token":
-            try:
-                related_instance = Token.objects.get(pk=obj.related_id)
-                return related_instance.customer.name
-            except Token.DoesNotExist:
-                return None
+            return related_instance.booking.customer.name
+        elif obj.related_table in ("Booking", "token"):
+            return related_instance.customer.name
         elif obj.related_table == "OutgoingFund":
-            try:
-                related_instance = OutgoingFund.objects.get(pk=obj.related_id)
-                return related_instance.payee.name if related_instance.payee else None
-            except OutgoingFund.DoesNotExist:
-                return None
+            return related_instance.payee.name if related_instance.payee else None
         elif obj.related_table == "dealer_payments":
-            try:
-                related_instance = DealerPayments.objects.get(pk=obj.related_id)
-                return related_instance.booking.dealer.name if related_instance.booking.dealer else None
-            except DealerPayments.DoesNotExist:
-                return None
+            return related_instance.booking.dealer.name if related_instance.booking.dealer else None
         return None
 
     def get_plot_number(self, obj):
-        if obj.related_table == "incoming_funds":
-            try:
-                related_instance = IncomingFund.objects.get(pk=obj.related_id)
-                plots = related_instance.booking.plots.all()
-                plot_info = [
-                    f"{plot.plot_number} || {plot.get_type_display()} || {plot.get_plot_size()}"
-                    for plot in plots
-                ]
-                return plot_info
-            except IncomingFund.DoesNotExist:
-                return None
+        related_instance = self.get_related_object(obj)
+        if related_instance is None:
+            return None
+        if obj.related_table in ("incoming_funds", "dealer_payments"):
+            return get_plot_info_list(related_instance.booking.plots.all())
         elif obj.related_table == "Booking":
-            try:
-                related_instance = Booking.objects.get(pk=obj.related_id)
-                plots = related_instance.plots.all()
-                plot_info = [
-                    f"{plot.plot_number} || {plot.get_type_display()} || {plot.get_plot_size()}"
-                    for plot in plots
-                ]
-                return plot_info
-            except Booking.DoesNotExist:
-                return None
+            return get_plot_info_list(related_instance.plots.all())
         elif obj.related_table == "token":
-            try:
-                related_instance = Token.objects.get(pk=obj.related_id)
-                plots = related_instance.plot.all()
-                plot_info = [
-                    f"{plot.plot_number} || {plot.get_type_display()} || {plot.get_plot_size()}"
-                    for plot in plots
-                ]
-                return plot_info
-            except Token.DoesNotExist:
-                return None
-        elif obj.related_table == "dealer_payments":
-            try:
-                related_instance = DealerPayments.objects.get(pk=obj.related_id)
-                plots = related_instance.booking.plots.all()
-                plot_info = [
-                    f"{plot.plot_number} || {plot.get_type_display()} || {plot.get_plot_size()}"
-                    for plot in plots
-                ]
-                return plot_info
-            except DealerPayments.DoesNotExist:
-                return None
+            return get_plot_info_list(related_instance.plot.all())
         return None
 
     def get_cheque_number(self, obj):
-        if obj.related_table == "incoming_funds":
-            try:
-                related_instance = IncomingFund.objects.get(pk=obj.related_id)
-                return related_instance.cheque_number
-            except IncomingFund.DoesNotExist:
-                return None
-        elif obj.related_table == "Booking":
-            try:
-                related_instance = Booking.objects.get(pk=obj.related_id)
-                return related_instance.cheque_number
-            except Booking.DoesNotExist:
-                return None
-        elif obj.related_table == "token" and obj.transaction_type == "TokenRefund":
-                    try:
-                        related_instance = Token.objects.get(pk=obj.related_id)
-                        return related_instance.refund_cheque_number
-                    except Token.DoesNotExist:
-                        return None   
-        elif obj.related_table == "token":
-            try:
-                related_instance = Token.objects.get(pk=obj.related_id)
-                return related_instance.cheque_number
-            except Token.DoesNotExist:
-                return None
-        elif obj.related_table == "OutgoingFund":
-            try:
-                related_instance = OutgoingFund.objects.get(pk=obj.related_id)
-                return related_instance.cheque_number
-            except OutgoingFund.DoesNotExist:
-                return None
-        elif obj.related_table == "dealer_payments":
-            try:
-                related_instance = DealerPayments.objects.get(pk=obj.related_id)
-                return related_instance.cheque_number
-            except DealerPayments.DoesNotExist:
-                return None
-        return None
+        related_instance = self.get_related_object(obj)
+        if related_instance is None:
+            return None
+        if obj.related_table == "token" and obj.transaction_type == "TokenRefund":
+            return related_instance.refund_cheque_number
+        return related_instance.cheque_number
 
 
 class MonthField(serializers.Field):
@@ -286,40 +291,23 @@ class IncomingFundSerializer(serializers.ModelSerializer):
             validated_data["previous_serial_num"] = str(int(validated_data["previous_serial_num"]) - 1)
 
         if reference == "payment":
-            booking.total_receiving_amount += amount
-            booking.remaining -= amount
+            booking.add_received_amount(amount)
         elif reference == "refund":
-            booking.total_receiving_amount -= amount
-            booking.remaining += amount
+            booking.add_received_amount(-amount)
         else:
             raise ValueError("Invalid reference type")
-        booking.save()
         if reference == "refund" and (validated_data.get("document_number") is None or validated_data.get("document_number") == ""):
-            try:
-                latest_payment = IncomingFund.objects.filter(project=project, reference="refund").latest("created_at")
-                if not latest_payment.document_number.startswith("R-"):
-                    validated_data["document_number"] = "R-001"
-                else:
-                    latest_payment_number = int(latest_payment.document_number.split("-")[1].lstrip('0')) + 1
-                    document_number_str = str(latest_payment_number).zfill(3)
-                    validated_data["document_number"] = "R-" + document_number_str
-            except IncomingFund.DoesNotExist:
-                validated_data["document_number"] = "R-001"
+            validated_data["document_number"] = next_document_number(project, "refund")
             validated_data["discount_amount"] = 0
-
-        if IncomingFund.objects.filter(project=project, document_number=validated_data.get("document_number")).exists():
+        elif not validated_data.get("document_number"):
+            validated_data["document_number"] = next_document_number(project, reference)
+        elif IncomingFund.objects.filter(project=project, document_number=validated_data.get("document_number")).exists():
             if(validated_data.get("previous_serial_num")):
                 raise serializers.ValidationError({"document_num_error": [f"A row with the same document number : {validated_data['document_number']} already exists."]})
             else:
-                temp = 0
-                latest_payment_number = int(validated_data.get("document_number"))
-                while temp == 0:
-                        if IncomingFund.objects.filter(project=project, document_number=str(latest_payment_number)).exists():
-                            latest_payment_number = latest_payment_number + 1
-                        else:
-                            temp = 1
-                document_number_str = str(latest_payment_number).zfill(3)
-                validated_data["document_number"] = document_number_str
+                validated_data["document_number"] = next_document_number(project, reference)
+        else:
+            claim_document_number(project, reference, validated_data["document_number"])
 
         incoming_fund = IncomingFund.objects.create(**validated_data)
         for file_data in files_data:
@@ -328,11 +316,8 @@ class IncomingFundSerializer(serializers.ModelSerializer):
             )
         self.create_bank_transactions(incoming_fund, validated_data)
         if discount_amount and discount_amount != "0":
-            booking.total_receiving_amount += float(discount_amount)
-            booking.remaining -= float(discount_amount)
-            booking.save()
-            bank_id= Bank.objects.filter(project=project, name="Discount Given").values('id').first()
-            validated_data["bank_id"]=bank_id['id']
+            booking.add_received_amount(float(discount_amount))
+            validated_data["bank_id"]=get_named_account_id(project, "Discount Given")
             validated_data["payment_type"]="Discount_Given"
             validated_data["reference"]="Discount"
             validated_data["amount"]=discount_amount
@@ -418,54 +403,47 @@ class IncomingFundSerializer(serializers.ModelSerializer):
         return incoming_fund
 
     def create_discount_transaction(self, payment, validated_data):
-        """Create multiple bank transactions for different accounts."""
+        """Post the discount given with a payment."""
         project = validated_data.get("project")
         date = validated_data.get("date")
         amount = validated_data.get("amount", 0)
         bank = validated_data.get("bank")
-        bank_id=validated_data.get("bank_id")
         main_type=bank.main_type
         payment_type = validated_data.get("payment_type")
         is_deposit = bank.detail_type != "Undeposited_Funds"
         is_cheque_clear = payment_type != "Cheque"
 
-        target_bank = Bank.objects.filter(
-            used_for="Account_Receivable", project=project
-        ).first()
-        discount_bank=Bank.objects.filter(project=project, name="Discount Given").first()
-
-        BankTransaction.objects.create(
-            project=project,
-            bank=target_bank,
-            transaction_type="Customer_Payment",
-            payment=amount,
-            deposit=0,
-            transaction_date=date,
-            related_table="incoming_funds",
-            related_id=payment.id,
-        )
+        discount_bank_id = get_named_account_id(project, "Discount Given")
 
         payment_amount = 0
         deposit_amount = amount
         if main_type in ["Equity"]:
             payment_amount, deposit_amount = deposit_amount, payment_amount
-            
-        BankTransaction.objects.create(
-            project=project,
-            bank=discount_bank,
-            transaction_type="Customer_Payment",
-            payment=deposit_amount,
-            deposit=payment_amount,
-            transaction_date=date,
-            related_table="incoming_funds",
-            related_id=payment.id,
-            is_deposit=is_deposit,
-            is_cheque_clear=is_cheque_clear,
-        )
 
+        # The discount line follows the sign convention of the payment bank,
+        # so the entry is not checked for balance
+        post_entry(
+            project,
+            [
+                entry_line("Account_Receivable", payment=amount, group="discount"),
+                entry_line(
+                    discount_bank_id,
+                    payment=deposit_amount,
+                    deposit=payment_amount,
+                    is_deposit=is_deposit,
+                    is_cheque_clear=is_cheque_clear,
+                    group="discount",
+                ),
+            ],
+            "Customer_Payment",
+            date,
+            "incoming_funds",
+            payment.id,
+            validate=False,
+        )
 
     def create_bank_transactions(self, payment, validated_data):
-        """Create multiple bank transactions for different accounts."""
+        """Post a customer payment or refund."""
         project = validated_data.get("project")
         date = validated_data.get("date")
         reference = validated_data.get("reference")
@@ -478,71 +456,38 @@ class IncomingFundSerializer(serializers.ModelSerializer):
 
         #debit in account payable and credit in bank/equity
         if reference == "refund":
-            target_bank = Bank.objects.filter(
-                used_for="Account_Payable", project=project
-            ).first()
-            BankTransaction.objects.create(
-                project=project,
-                bank=target_bank,
-                transaction_type="Customer_Refund",
-                payment=amount,
-                deposit=0,
-                transaction_date=date,
-                related_table="incoming_funds",
-                related_id=payment.id,
-            )
-            
+            transaction_type = "Customer_Refund"
+            target_line = entry_line("Account_Payable", payment=amount, group="payment")
             payment_amount = amount
             deposit_amount = 0
-            if main_type in ["Equity"]:
-                payment_amount, deposit_amount = deposit_amount, payment_amount
-            
-            BankTransaction.objects.create(
-                project=project,
-                bank=bank,
-                transaction_type="Customer_Refund",
-                payment=payment_amount,
-                deposit=deposit_amount,
-                transaction_date=date,
-                related_table="incoming_funds",
-                related_id=payment.id,
-                is_deposit=is_deposit,
-                is_cheque_clear=is_cheque_clear,
-            )
          #credit in account receivable and debit in bank/equity
         else:
-            target_bank = Bank.objects.filter(
-                used_for="Account_Receivable", project=project
-            ).first()
-
-            BankTransaction.objects.create(
-                project=project,
-                bank=target_bank,
-                transaction_type="Customer_Payment",
-                payment=amount,
-                deposit=0,
-                transaction_date=date,
-                related_table="incoming_funds",
-                related_id=payment.id,
-            )
-
+            transaction_type = "Customer_Payment"
+            target_line = entry_line("Account_Receivable", payment=amount, group="payment")
             payment_amount = 0
             deposit_amount = amount
-            if main_type in ["Equity"]:
-                payment_amount, deposit_amount = deposit_amount, payment_amount
-            
-            BankTransaction.objects.create(
-                project=project,
-                bank=bank,
-                transaction_type="Customer_Payment",
-                payment=payment_amount,
-                deposit=deposit_amount,
-                transaction_date=date,
-                related_table="incoming_funds",
-                related_id=payment.id,
-                is_deposit=is_deposit,
-                is_cheque_clear=is_cheque_clear,
-            )
+
+        if main_type in ["Equity"]:
+            payment_amount, deposit_amount = deposit_amount, payment_amount
+
+        post_entry(
+            project,
+            [
+                target_line,
+                entry_line(
+                    bank,
+                    payment=payment_amount,
+                    deposit=deposit_amount,
+                    is_deposit=is_deposit,
+                    is_cheque_clear=is_cheque_clear,
+                    group="payment",
+                ),
+            ],
+            transaction_type,
+            date,
+            "incoming_funds",
+            payment.id,
+        )
 
     @transaction.atomic
     def update(self, instance, validated_data):
@@ -558,31 +503,23 @@ class IncomingFundSerializer(serializers.ModelSerializer):
 
             if new_amount != old_amount:
                 if reference == "payment":
-                    booking.total_receiving_amount += new_amount - old_amount
-                    booking.remaining -= new_amount - old_amount
-                    booking.save()
+                    booking.add_received_amount(new_amount - old_amount)
                 elif reference == "refund":
-                    booking.total_receiving_amount -= new_amount - old_amount
-                    booking.remaining += new_amount - old_amount
-                    booking.save()
+                    booking.add_received_amount(old_amount - new_amount)
                 else:
                     raise ValueError(f"Invalid reference type: {reference}")
 
             if float(discount_amount) != float(old_discount_amount) or new_date != old_date:
                 try:
-                    discount_instance = IncomingFund.objects.get(document_number="D-"+instance.document_number)
+                    discount_instance = IncomingFund.objects.get(project=instance.project, document_number="D-"+instance.document_number)
                     if discount_instance:
-                        # Fetch the IncomingFund instance
-                        discount_instance = IncomingFund.objects.get(document_number="D-"+instance.document_number)
                         # Track whether the discount amount has changed
                         is_discount_amount_changed = float(discount_amount) != float(old_discount_amount)
                         # Track whether the date has changed
                         is_date_change= new_date != old_date
                         # Update discount amount if it has changed
                         if is_discount_amount_changed:
-                            booking.total_receiving_amount += float(discount_amount) - float(old_discount_amount)
-                            booking.remaining -= discount_amount - old_discount_amount
-                            booking.save()
+                            booking.add_received_amount(float(discount_amount) - float(old_discount_amount))
                             discount_instance.amount = discount_amount
 
                         # Update date if it has changed
@@ -635,20 +572,20 @@ class IncomingFundSerializer(serializers.ModelSerializer):
     
     def update_discount_transaction(self, id, project, discount_amount,new_date):
         """Update bank transactions for discount amount changes"""
-        discount_bank = Bank.objects.filter(project=project, name="Discount Given").first()
-        target_bank = Bank.objects.filter(used_for="Account_Receivable", project=project).first()
+        discount_bank_id = get_named_account_id(project, "Discount Given")
+        target_bank_id = get_account_id(project, "Account_Receivable")
 
         # Retrieve the relevant bank transactions
         discount_transaction = BankTransaction.objects.filter(
             project=project,
-            bank=discount_bank,
+            bank_id=discount_bank_id,
             related_table="incoming_funds",
             related_id=id,
         ).first()
 
         target_transaction = BankTransaction.objects.filter(
             project=project,
-            bank=target_bank,
+            bank_id=target_bank_id,
             related_table="incoming_funds",
             related_id=id,
         ).first()
@@ -714,14 +651,12 @@ class IncomingFundSerializer(serializers.ModelSerializer):
         # Logic for refund transactions
         if reference == "refund":
             # Use Account_Payable bank for refunds
-            account_payable_bank = Bank.objects.filter(
-                used_for="Account_Payable", project=project
-            ).first()
+            account_payable_bank_id = get_account_id(project, "Account_Payable")
             
             # Update refund entry in Account_Payable
             BankTransaction.objects.filter(
                 project=project,
-                bank=account_payable_bank,
+                bank_id=account_payable_bank_id,
                 transaction_type="Customer_Refund",
                 related_table=related_table,
                 related_id=related_id,
@@ -753,14 +688,12 @@ class IncomingFundSerializer(serializers.ModelSerializer):
 
         else:
             # Logic for non-refund transactions (payments)
-            account_receivable_bank = Bank.objects.filter(
-                used_for="Account_Receivable", project=project
-            ).first()
+            account_receivable_bank_id = get_account_id(project, "Account_Receivable")
             
             # Update payment entry in Account_Receivable
             BankTransaction.objects.filter(
                 project=project,
-                bank=account_receivable_bank,
+                bank_id=account_receivable_bank_id,
                 transaction_type="Customer_Payment",
                 related_table=related_table,
                 related_id=related_id,
@@ -1101,6 +1034,10 @@ class BankDepositDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = BankDepositDetail
         exclude = ["bank_deposit"]
+        list_serializer_class = NestedTransactionsListSerializer
+
+    def get_transactions(self, instance):
+        return [instance.payment]
 
     def to_internal_value(self, data):
         validated_data = super().to_internal_value(data)
@@ -1131,6 +1068,10 @@ class BankDepositSerializer(serializers.ModelSerializer):
     class Meta:
         model = BankDeposit
         fields = "__all__"
+        list_serializer_class = NestedTransactionsListSerializer
+
+    def get_transactions(self, instance):
+        return [detail.payment for detail in instance.details.all()]
 
     @transaction.atomic
     def create(self, validated_data):
@@ -1388,13 +1329,11 @@ class DealerPaymentsSerializer(serializers.ModelSerializer):
             payment_amount = amount
             deposit_amount = 0
 
-        account_payable_bank = Bank.objects.filter(
-            used_for="Account_Payable", project=project
-        ).first()
+        account_payable_bank_id = get_account_id(project, "Account_Payable")
 
         BankTransaction.objects.create(
             project=project,
-            bank=account_payable_bank,
+            bank_id=account_payable_bank_id,
             transaction_type=transaction_type,
             payment=payment_amount,
             deposit=deposit_amount,
@@ -1468,13 +1407,11 @@ class DealerPaymentsSerializer(serializers.ModelSerializer):
             payment_amount = amount
             deposit_amount = 0
 
-        account_payable_bank = Bank.objects.filter(
-            used_for="Account_Payable", project=project
-        ).first()
+        account_payable_bank_id = get_account_id(project, "Account_Payable")
 
         BankTransaction.objects.filter(
             project=project,
-            bank=account_payable_bank,
+            bank_id=account_payable_bank_id,
             transaction_type=transaction_type,
             related_table="dealer_payments",
             related_id=payment.id,
@@ -1554,7 +1491,7 @@ class JournalEntrySerializer(serializers.ModelSerializer):
         fields = "__all__"
 
     def get_amount(self, obj):
-        return obj.details.aggregate(total_credit=Sum("credit"))["total_credit"] or 0
+        return sum(detail.credit for detail in obj.details.all()) or 0
 
     def create_bank_transactions(self, journal_entry, transaction_type):
         for detail in journal_entry.details.all():
@@ -1744,6 +1681,10 @@ class ChequeClearanceDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = ChequeClearanceDetail
         exclude = ["cheque_clearance"]
+        list_serializer_class = NestedTransactionsListSerializer
+
+    def get_transactions(self, instance):
+        return [instance.expense]
 
     def to_internal_value(self, data):
         validated_data = super().to_internal_value(data)
@@ -1759,12 +1700,13 @@ class ChequeClearanceSerializer(serializers.ModelSerializer):
     class Meta:
         model = ChequeClearance
         fields = "__all__"
+        list_serializer_class = NestedTransactionsListSerializer
+
+    def get_transactions(self, instance):
+        return [detail.expense for detail in instance.details.all()]
 
     def get_amount(self, obj):
-        return (
-            obj.details.aggregate(total_credit=Sum("expense__payment"))["total_credit"]
-            or 0
-        )
+        return sum(detail.expense.payment for detail in obj.details.all()) or 0
 
     def create(self, validated_data):
         files_data = validated_data.pop("files", [])
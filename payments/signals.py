@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from booking.financials import FUND_VALUES, apply_fund_changes, collect_fund_changes, fund_state
+from booking.schedules import allocate_payments
+from .models import Bank, BankTransaction, IncomingFund
+from .accounts import invalidate_project_accounts
+from .balances import (
+    ROLLUP_VALUES,
+    apply_daily_balance_changes,
+    collect_daily_balance_changes,
+)
+
+
+@receiver(pre_save, sender=BankTransaction)
+def remember_bank_transaction_state(sender, instance, **kwargs):
+    # Instances not loaded through the ORM (e.g. built with an explicit pk)
+    # have no remembered state, read what is currently stored instead
+    if instance.pk and not hasattr(instance, "_rollup_state"):
+        instance._rollup_state = (
+            BankTransaction.objects.filter(pk=instance.pk)
+            .values(*ROLLUP_VALUES)
+            .first()
+        )
+
+
+@receiver(post_save, sender=BankTransaction)
+def update_daily_balance_on_save(sender, instance, created, **kwargs):
+    changes = {}
+    previous = getattr(instance, "_rollup_state", None)
+    if not created and previous:
+        collect_daily_balance_changes([previous], sign=-1, changes=changes)
+    collect_daily_balance_changes([instance], sign=1, changes=changes)
+    apply_daily_balance_changes(changes)
+    instance._rollup_state = instance.rollup_state()
+
+
+@receiver(post_delete, sender=BankTransaction)
+def update_daily_balance_on_delete(sender, instance, **kwargs):
+    previous = getattr(instance, "_rollup_state", None) or instance.rollup_state()
+    apply_daily_balance_changes(collect_daily_balance_changes([previous], sign=-1))
+
+
+@receiver(pre_save, sender=IncomingFund)
+def remember_incoming_fund_state(sender, instance, **kwargs):
+    instance._previous_state = None
+    if instance.pk:
+        instance._previous_state = (
+            IncomingFund.objects.filter(pk=instance.pk).values(*FUND_VALUES).first()
+        )
+    instance._previous_booking_id = (
+        instance._previous_state["booking_id"] if instance._previous_state else None
+    )
+
+
+# Connected before allocate_booking_payments, which reads the updated totals
+@receiver(post_save, sender=IncomingFund)
+def update_booking_financials_on_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous_state", None)
+    current = fund_state(instance)
+    if previous == current:
+        return
+    changes = {}
+    if not created and previous:
+        collect_fund_changes([previous], sign=-1, changes=changes)
+    collect_fund_changes([current], sign=1, changes=changes)
+    apply_fund_changes(changes)
+
+
+@receiver(post_delete, sender=IncomingFund)
+def update_booking_financials_on_delete(sender, instance, **kwargs):
+    apply_fund_changes(collect_fund_changes([fund_state(instance)], sign=-1))
+
+
+@receiver(post_save, sender=IncomingFund)
+@receiver(post_delete, sender=IncomingFund)
+def allocate_booking_payments(sender, instance, **kwargs):
+    allocate_payments(
+        [instance.booking_id, getattr(instance, "_previous_booking_id", None)]
+    )
+
+
+@receiver(post_save, sender=Bank)
+@receiver(post_delete, sender=Bank)
+def invalidate_account_registry(sender, instance, **kwargs):
+    invalidate_project_accounts(instance.project_id)
+    # Drop what other requests loaded before the change was committed
+    transaction.on_commit(lambda: invalidate_project_accounts(instance.project_id))
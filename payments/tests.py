@@ -1,3 +1,432 @@
-from django.test import TestCase
+import io
+import json
+import random
+import threading
+from datetime import date
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from rest_framework import serializers
+from rest_framework.test import APIClient
+from booking.models import Booking
+from projects.models import Projects
+from Zeeland.metrics import get_metrics, reset_metrics
+from Zeeland.testing import QueryBudgetTestCase
+from .posting import check_balanced, entry_line, post_entry, reverse_entry
+from .reconciliation import reconcile
+from .serializers import IncomingFundSerializer
+from .models import (
+    AccountDailyBalance,
+    Bank,
+    BankDeposit,
+    BankTransaction,
+    BankTransfer,
+    ChequeClearance,
+    DealerPayments,
+    ExpensePerson,
+    IncomingFund,
+    JournalEntry,
+    JournalVoucher,
+    OutgoingFund,
+    PaymentReminder,
+)
 
-# Create your tests here.
+
+class PaymentsQueryBudgetTests(QueryBudgetTestCase):
+    def test_incoming_funds(self):
+        # The list ETags add their aggregate and the data version lookup
+        self.assertQueryBudget(6, "payments/")
+        self.assertDetailQueryBudget(4, "payments/", IncomingFund.objects.filter(project=self.large))
+
+    def test_latest_payment(self):
+        self.assertQueryBudget(6, "latest_payment/")
+
+    def test_outgoing_funds(self):
+        self.assertQueryBudget(5, "expenses/")
+        self.assertDetailQueryBudget(3, "expenses/", OutgoingFund.objects.filter(project=self.large))
+
+    def test_journal_vouchers(self):
+        self.assertQueryBudget(1, "journal-voucher/")
+        self.assertDetailQueryBudget(
+            1, "journal-voucher/", JournalVoucher.objects.filter(project=self.large)
+        )
+
+    def test_expense_types(self):
+        # Expense types are not kept per project
+        self.assertEqual(self.count_queries("expense-type/", {}), 1)
+
+    def test_payment_reminders(self):
+        self.assertQueryBudget(3, "payments-reminder/")
+        self.assertDetailQueryBudget(
+            3, "payments-reminder/", PaymentReminder.objects.filter(project=self.large)
+        )
+
+    def test_expense_persons(self):
+        self.assertQueryBudget(1, "expense-persons/")
+        self.assertDetailQueryBudget(
+            1, "expense-persons/", ExpensePerson.objects.filter(project=self.large)
+        )
+
+    def test_banks(self):
+        self.assertQueryBudget(2, "banks/")
+        self.assertDetailQueryBudget(2, "banks/", Bank.objects.filter(project=self.large))
+
+    def test_bank_deposits(self):
+        self.assertQueryBudget(10, "bank-deposit/")
+        self.assertDetailQueryBudget(
+            6, "bank-deposit/", BankDeposit.objects.filter(project=self.large)
+        )
+
+    def test_bank_transactions(self):
+        self.assertQueryBudget(10, "bank-transactions/")
+        self.assertDetailQueryBudget(
+            3, "bank-transactions/", BankTransaction.objects.filter(project=self.large)
+        )
+
+    def test_account_statement(self):
+        self.assertQueryBudget(
+            2,
+            "v2/bank-transactions/",
+            lambda project: {
+                "bank_id": Bank.objects.get(project=project, name="Cash in Hand").id
+            },
+        )
+
+    def test_dealer_payments(self):
+        self.assertQueryBudget(3, "dealer-payments/")
+        self.assertDetailQueryBudget(
+            3, "dealer-payments/", DealerPayments.objects.filter(project=self.large)
+        )
+
+    def test_journal_entries(self):
+        self.assertQueryBudget(3, "journal-entries/")
+        self.assertDetailQueryBudget(
+            3, "journal-entries/", JournalEntry.objects.filter(project=self.large)
+        )
+
+    def test_bank_transfers(self):
+        self.assertQueryBudget(2, "bank-transfer/")
+        self.assertDetailQueryBudget(
+            2, "bank-transfer/", BankTransfer.objects.filter(project=self.large)
+        )
+
+    def test_cheque_clearances(self):
+        # One query per kind of document the cleared cheques belong to
+        self.assertQueryBudget(8, "cheque-clearance/")
+        self.assertDetailQueryBudget(
+            6, "cheque-clearance/", ChequeClearance.objects.filter(project=self.large)
+        )
+
+    def test_due_payments(self):
+        self.assertQueryBudget(3, "due-payments/")
+
+    def test_due_payments_invalid_page_size(self):
+        for page_size in ("0", "-1", "x"):
+            response = self.client.get(
+                "/api/due-payments/",
+                {"project": self.large.id, "page": 1, "page_size": page_size},
+            )
+            self.assertEqual(response.status_code, 400)
+
+
+class BankStatementPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("statement", "statement@example.com", "statement")
+        call_command("generate_dataset", scale=0.05, months=4, seed=6, stdout=io.StringIO())
+        cls.cash = Bank.objects.get(name="Cash in Hand")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_statement(self, **params):
+        return self.client.get(
+            "/api/v2/bank-transactions/",
+            {
+                "project": self.cash.project_id,
+                "bank_id": self.cash.id,
+                "start_date": "2000-01-01",
+                "end_date": "2100-12-31",
+                **params,
+            },
+        )
+
+    def test_pages_match_the_full_statement(self):
+        full = self.get_statement().json()
+        transactions = []
+        cursor = None
+        while True:
+            page = self.get_statement(page_size=7, **({"cursor": cursor} if cursor else {})).json()
+            transactions += page["transactions"]
+            cursor = page["next"]
+            if not cursor:
+                break
+        self.assertEqual(transactions, full["transactions"])
+        self.assertEqual(page["closing_balance"], full["closing_balance"])
+
+    def test_streamed_statement_metrics(self):
+        reset_metrics()
+        response = self.get_statement(stream="true")
+        content = b"".join(response.streaming_content)
+        response.close()
+
+        metrics = get_metrics()["GET api/v2/bank-transactions/"]
+        # The statement rows are read while the response is streamed
+        self.assertGreaterEqual(metrics["queries"]["max"], 2)
+        self.assertEqual(metrics["response_bytes_avg"], len(content))
+        self.assertEqual(
+            json.loads(content)["transactions"], self.get_statement().json()["transactions"]
+        )
+
+    def test_invalid_page_size_and_cursor(self):
+        for page_size in ("0", "-5", "x"):
+            self.assertEqual(self.get_statement(page_size=page_size).status_code, 400)
+
+        cursor = self.get_statement(page_size=1).json()["next"]
+        value, signature = cursor.rsplit(":", 1)
+        tampered = value[:-1] + ("A" if value[-1] != "A" else "B") + ":" + signature
+        self.assertEqual(self.get_statement(cursor=tampered).status_code, 400)
+
+
+class PostingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Projects.objects.create(name="Posting")
+        cls.bank = cls.add_account("Bank Account", "Asset")
+        cls.add_account("Account Receivable", "Asset", "Account_Receivable")
+        cls.add_account("Account Payable", "Liabilities", "Account_Payable")
+        cls.add_account("Land Inventory", "Asset", "Land_Inventory")
+        cls.add_account("Plot Sales", "Income", "Sale_Account")
+        cls.add_account("Cost of Land Sold", "Expense", "Cost_of_Good_Sold")
+
+    @classmethod
+    def add_account(cls, name, main_type, used_for=None):
+        return Bank.objects.create(
+            project=cls.project,
+            name=name,
+            main_type=main_type,
+            account_type=used_for or "Bank",
+            detail_type=used_for or "Bank",
+            used_for=used_for,
+        )
+
+    def post(self, lines, **kwargs):
+        return post_entry(
+            self.project, lines, "Booking", date(2026, 1, 10), "Booking", 1, **kwargs
+        )
+
+    def test_booking_payment_and_refund_entries_balance(self):
+        booking = self.post(
+            [
+                entry_line("Account_Receivable", deposit=1000),
+                entry_line("Sale_Account", deposit=1000),
+                entry_line("Cost_of_Good_Sold", deposit=400),
+                entry_line("Land_Inventory", payment=400),
+            ]
+        )
+        payment = self.post(
+            [
+                entry_line("Account_Receivable", payment=300),
+                entry_line(self.bank, deposit=300),
+            ]
+        )
+        refund = self.post(
+            [
+                entry_line("Account_Payable", payment=100),
+                entry_line(self.bank, payment=100),
+            ]
+        )
+        self.assertEqual((len(booking), len(payment), len(refund)), (4, 2, 2))
+
+    def test_unbalanced_entry(self):
+        lines = [
+            entry_line("Account_Receivable", deposit=1000),
+            entry_line("Sale_Account", deposit=900),
+        ]
+        with self.assertRaises(serializers.ValidationError):
+            self.post(lines)
+        self.assertFalse(BankTransaction.objects.exists())
+        self.assertEqual(len(self.post(lines, validate=False)), 2)
+
+    def test_unknown_main_type_is_not_checked(self):
+        check_balanced(
+            [
+                {"main_type": "Asset", "deposit": 1000, "payment": 0},
+                {"main_type": "Current Assets", "deposit": 1000, "payment": 0},
+            ]
+        )
+        with self.assertRaises(serializers.ValidationError):
+            check_balanced(
+                [
+                    {"main_type": "Asset", "deposit": 1000, "payment": 0},
+                    {"main_type": "Asset", "deposit": 1000, "payment": 0},
+                ]
+            )
+
+    def test_missing_role_skips_its_group(self):
+        created = self.post(
+            [
+                entry_line("Account_Receivable", deposit=1000),
+                entry_line("Sale_Account", deposit=1000),
+                entry_line("Account_Payable", deposit=50, group="comission"),
+                entry_line("Dealer_Expense", deposit=50, group="comission"),
+            ]
+        )
+        self.assertEqual(
+            sorted(row.bank.used_for for row in created), ["Account_Receivable", "Sale_Account"]
+        )
+
+    def test_reverse_entry_by_transaction_type(self):
+        self.post(
+            [
+                entry_line("Account_Receivable", deposit=1000),
+                entry_line("Sale_Account", deposit=1000),
+                entry_line("Account_Receivable", payment=300, transaction_type="Booking_Advance"),
+                entry_line(self.bank, deposit=300, transaction_type="Booking_Advance"),
+            ]
+        )
+        reverse_entry("Booking", 1, ["Booking_Advance"])
+        self.assertEqual(
+            list(BankTransaction.objects.values_list("transaction_type", flat=True)),
+            ["Booking", "Booking"],
+        )
+        reverse_entry("Booking", 1)
+        self.assertFalse(BankTransaction.objects.exists())
+
+
+class ReconciliationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("generate_dataset", scale=0.05, months=4, seed=3, stdout=io.StringIO())
+
+    def test_fix_mismatches(self):
+        booking = Booking.objects.order_by("id").first()
+        Booking.objects.filter(pk=booking.pk).update(remaining=F("remaining") + 500)
+
+        run, bookings, accounts = reconcile(fix=True)
+        self.assertEqual(run.bookings_checked, Booking.objects.count())
+        self.assertEqual([row["id"] for row in bookings], [booking.id])
+        self.assertEqual(bookings[0]["expected_remaining"], booking.remaining)
+        self.assertEqual(run.accounts_checked, Bank.objects.count())
+        self.assertEqual(accounts, [])
+
+        run, bookings, accounts = reconcile()
+        self.assertEqual((bookings, accounts), ([], []))
+
+    def test_fix_account_daily_balances(self):
+        day = AccountDailyBalance.objects.order_by("id").first()
+        AccountDailyBalance.objects.filter(pk=day.pk).update(deposit=F("deposit") + 500)
+        balance = Bank.objects.get(pk=day.bank_id).balance
+
+        run, bookings, accounts = reconcile(fix=True)
+        self.assertEqual([row["id"] for row in accounts], [day.bank_id])
+        self.assertAlmostEqual(accounts[0]["deposit"] - accounts[0]["expected_deposit"], 500)
+        self.assertEqual(Bank.objects.get(pk=day.bank_id).balance, balance)
+
+        run, bookings, accounts = reconcile()
+        self.assertEqual(accounts, [])
+
+    def test_incremental_run_checks_changed_rows(self):
+        reconcile(fix=True)
+        booking = Booking.objects.order_by("id").last()
+        Booking.objects.filter(pk=booking.pk).update(remaining=0)
+        run, bookings, accounts = reconcile(incremental=True)
+        self.assertEqual((run.bookings_checked, run.accounts_checked), (0, 0))
+
+        fund = IncomingFund.objects.filter(booking=booking, reference="payment").first()
+        fund.remarks = "checked"
+        fund.amount += 100
+        fund.save()
+        run, bookings, accounts = reconcile(incremental=True)
+        self.assertEqual(run.bookings_checked, 1)
+        self.assertEqual([row["id"] for row in bookings], [booking.id])
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ConcurrentPaymentsTests(TransactionTestCase):
+    """
+    Post payments, discounts and refunds on a few bookings from many
+    threads at once and check that no change of the booking totals is
+    lost. SQLite serializes all writes, so this runs on MySQL/PostgreSQL.
+    """
+
+    operations = 2000
+    threads = 16
+
+    def setUp(self):
+        call_command("generate_dataset", scale=0.04, months=2, stdout=io.StringIO())
+        self.project = Projects.objects.get()
+        self.cash = Bank.objects.get(project=self.project, name="Cash in Hand")
+        self.booking_ids = list(
+            Booking.objects.filter(project=self.project).values_list("id", flat=True)
+        )
+
+    def post(self, booking_id, reference, amount, discount=0):
+        booking = Booking.objects.select_related("project").get(pk=booking_id)
+        IncomingFundSerializer().create(
+            {
+                "project": booking.project,
+                "booking": booking,
+                "reference": reference,
+                "date": date.today(),
+                "installement_month": date.today().replace(day=1),
+                "amount": amount,
+                "discount_amount": discount,
+                "bank": self.cash,
+                "payment_type": "cash",
+            }
+        )
+
+    def run_operations(self, operations, errors):
+        try:
+            for operation in operations:
+                self.post(*operation)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connection.close()
+
+    def test_concurrent_payments_keep_booking_totals(self):
+        # Post one of each first so today's daily balance rows exist and
+        # the threads only contend on the booking rows
+        self.post(self.booking_ids[0], "payment", 1000, 100)
+        self.post(self.booking_ids[0], "refund", 500)
+        before = {
+            booking.id: (booking.total_receiving_amount, booking.remaining)
+            for booking in Booking.objects.filter(pk__in=self.booking_ids)
+        }
+        last_fund_id = IncomingFund.objects.order_by("-id").values_list("id", flat=True)[0]
+
+        generator = random.Random(1)
+        operations = []
+        for n in range(self.operations):
+            booking_id = generator.choice(self.booking_ids)
+            if n % 5 == 0:
+                operations.append((booking_id, "refund", generator.randint(1, 50) * 100))
+            else:
+                discount = generator.choice([0, 0, 0, 100])
+                operations.append((booking_id, "payment", generator.randint(1, 100) * 100, discount))
+
+        errors = []
+        workers = [
+            threading.Thread(target=self.run_operations, args=(operations[n :: self.threads], errors))
+            for n in range(self.threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(errors, [])
+
+        funds = IncomingFund.objects.filter(pk__gt=last_fund_id)
+        self.assertEqual(funds.filter(reference__in=["payment", "refund"]).count(), self.operations)
+        for booking in Booking.objects.filter(pk__in=self.booking_ids):
+            received = 0
+            for reference, amount in funds.filter(booking=booking).values_list("reference", "amount"):
+                received += -amount if reference == "refund" else amount
+            total_before, remaining_before = before[booking.id]
+            self.assertEqual(booking.total_receiving_amount, total_before + received)
+            self.assertEqual(booking.remaining, remaining_before - received)
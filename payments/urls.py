@@ -15,7 +15,8 @@ from .views import (
     JournalEntryViewSet,
     BankTransferViewSet,
     ChequeClearanceViewSet,
-    LatestPaymentView
+    LatestPaymentView,
+    ReconciliationView,
 )
 from rest_framework import routers
 
@@ -47,4 +48,5 @@ urlpatterns = [
     path("due-payments/", DuePaymentsView.as_view(), name="due_payments"),
     path("v2/bank-transactions/", BankTransactionAPIView.as_view()),
     path('latest_payment/', LatestPaymentView.as_view(), name='latest_payment'),
+    path("reconciliation/", ReconciliationView.as_view(), name="reconciliation"),
 ]
@@ -1,7 +1,11 @@
 from django.db.models import Max
-from django.db.models import Q, Sum,Prefetch,FloatField
+from django.db.models import Q, F, Sum,Prefetch,FloatField, Case, When, Value, Subquery, OuterRef
 from django.db.models.functions import Coalesce,Cast
+from django.db import transaction
 import math
+from django.core import signing
+from django.http import StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import action
 import datetime
@@ -31,6 +35,7 @@ from django.conf import settings
 from .models import (
     IncomingFund,
     OutgoingFund,
+    OutgoingFundDetails,
     ExpenseType,
     JournalVoucher,
     PaymentReminder,
@@ -44,14 +49,22 @@ from .models import (
     BankDepositDocuments,
     DealerPayments,
     JournalEntry,
+    JournalEntryLine,
     BankTransfer,
     ChequeClearance,
+    ChequeClearanceDetail,
+    ReconciliationRun,
 )
+from .balances import get_account_balances
+from .reconciliation import reconcile, run_summary
+from booking.schedules import expected_amount, outstanding_amount
 from rest_framework.views import APIView
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError
 from datetime import date
 from booking.models import Booking, Token
+from Zeeland.etags import ConditionalListMixin
 from customer.models import Customers
 import os
 class BankViewSet(viewsets.ModelViewSet):
@@ -80,7 +93,11 @@ class BankViewSet(viewsets.ModelViewSet):
         if parent_account == "null":
             query_filters &= Q(parent_account__isnull=True)
 
-        queryset = Bank.objects.filter(query_filters)
+        queryset = (
+            Bank.objects.filter(query_filters)
+            .select_related("parent_account")
+            .prefetch_related("sub_accounts")
+        )
         return queryset
 
 
@@ -112,18 +129,45 @@ class BankTransactionViewSet(viewsets.ModelViewSet):
             query_filters &= Q(is_deposit=is_deposit)
         if is_cheque_clear:
             query_filters &= Q(is_cheque_clear=is_cheque_clear)
-        queryset = BankTransaction.objects.filter(query_filters)
+        queryset = BankTransaction.objects.filter(query_filters).select_related("bank")
         queryset = queryset.exclude(bank__name="Discount Given")
 
         return queryset
 
 
+BANK_STATEMENT_CURSOR_SALT = "payments.bank-statement-cursor"
+
+
 class BankTransactionAPIView(APIView):
+    """
+    Bank statement with a running balance.
+
+    Without extra parameters the whole period is returned in one response.
+    Passing ``page_size`` (and the ``next`` value of the previous page as
+    ``cursor``) returns keyset paginated pages that carry the running balance
+    forward, and ``stream=true`` streams the statement row by row.
+    """
+
+    statement_fields = (
+        "id",
+        "bank_id",
+        "transaction_type",
+        "payment",
+        "deposit",
+        "transaction_date",
+        "related_table",
+        "related_id",
+    )
+    max_page_size = 1000
+
     def get(self, request, *args, **kwargs):
         project_id = self.request.query_params.get("project")
         bank_id = request.query_params.get("bank_id")
         start_date = request.query_params.get("start_date")
         end_date = request.query_params.get("end_date")
+        page_size = request.query_params.get("page_size")
+        cursor = request.query_params.get("cursor")
+        stream = request.query_params.get("stream") in ("1", "true", "True")
 
         if not bank_id or not start_date or not end_date or not project_id:
             return Response(
@@ -142,43 +186,74 @@ class BankTransactionAPIView(APIView):
 
         # Filter transactions based on bank_id and date range
         query_filters = Q(bank_id=bank_id, project_id=project_id, is_cheque_clear=True)
-        transactions = BankTransaction.objects.filter(
-            query_filters, transaction_date__range=[start_date, end_date]
-        ).order_by("transaction_date", "id")
-
-        # Calculate opening balance before start_date
-        opening_balance_data = BankTransaction.objects.filter(
-            query_filters, transaction_date__lt=start_date
-        ).aggregate(deposit_sum=Sum("deposit"), payment_sum=Sum("payment"))
-        opening_balance = (opening_balance_data["deposit_sum"] or 0) - (
-            opening_balance_data["payment_sum"] or 0
+        transactions = (
+            BankTransaction.objects.filter(
+                query_filters, transaction_date__range=[start_date, end_date]
+            )
+            .order_by("transaction_date", "id")
+            .values(*self.statement_fields, bank_name=F("bank__name"))
         )
 
-        # Prepare transaction records with running balance
-        transaction_records = []
-        current_balance = opening_balance
-        for transaction in transactions:
-            deposit = transaction.deposit
-            payment = transaction.payment
-            current_balance += deposit - payment
-            transaction_records.append(
+        if cursor:
+            try:
+                last_date, last_id, opening_balance = self.decode_cursor(cursor)
+            except ValueError:
+                return Response(
+                    {"error": "Invalid cursor."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            transactions = transactions.filter(
+                Q(transaction_date__gt=last_date)
+                | Q(transaction_date=last_date, id__gt=last_id)
+            )
+        else:
+            # Calculate opening balance before start_date from the daily rollup
+            opening_balance = get_account_balances(
+                project_id=project_id,
+                end_date=start_date - datetime.timedelta(days=1),
+                banks=[bank_id],
+                cleared_only=True,
+            ).get(int(bank_id), 0)
+
+        if stream:
+            return StreamingHttpResponse(
+                self.stream_statement(transactions.iterator(), opening_balance),
+                content_type="application/json",
+            )
+
+        if page_size or cursor:
+            try:
+                page_size = min(int(page_size or 100), self.max_page_size)
+                if page_size < 1:
+                    raise ValueError("page_size must be positive")
+            except ValueError:
+                return Response(
+                    {"error": "page_size must be a positive integer."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            rows = list(transactions[: page_size + 1])
+            has_next = len(rows) > page_size
+            transaction_records, closing_balance = self.build_records(
+                rows[:page_size], opening_balance
+            )
+            next_cursor = None
+            if has_next:
+                last = transaction_records[-1]
+                next_cursor = self.encode_cursor(
+                    last["transaction_date"], last["id"], closing_balance
+                )
+            return Response(
                 {
-                    "id": transaction.id,
-                    "bank_id": transaction.bank_id,
-                    "bank_name": transaction.bank.name,
-                    "transaction_type": transaction.transaction_type,
-                    "payment": str(payment),
-                    "deposit": str(deposit),
-                    "transaction_date": transaction.transaction_date,
-                    "related_table": transaction.related_table,
-                    "related_id": transaction.related_id,
-                    "balance": str(current_balance),
+                    "opening_balance": str(opening_balance),
+                    "closing_balance": str(closing_balance),
+                    "transactions": transaction_records,
+                    "next": next_cursor,
                 }
             )
 
-        # Calculate closing balance
-        closing_balance = current_balance
-
+        transaction_records, closing_balance = self.build_records(
+            transactions, opening_balance
+        )
         response_data = {
             "opening_balance": str(opening_balance),
             "closing_balance": str(closing_balance),
@@ -187,11 +262,72 @@ class BankTransactionAPIView(APIView):
 
         return Response(response_data)
 
+    @staticmethod
+    def statement_row(transaction, balance):
+        return {
+            "id": transaction["id"],
+            "bank_id": transaction["bank_id"],
+            "bank_name": transaction["bank_name"],
+            "transaction_type": transaction["transaction_type"],
+            "payment": str(transaction["payment"]),
+            "deposit": str(transaction["deposit"]),
+            "transaction_date": transaction["transaction_date"],
+            "related_table": transaction["related_table"],
+            "related_id": transaction["related_id"],
+            "balance": str(balance),
+        }
+
+    def build_records(self, transactions, opening_balance):
+        # Prepare transaction records with running balance
+        transaction_records = []
+        current_balance = opening_balance
+        for transaction in transactions:
+            current_balance += transaction["deposit"] - transaction["payment"]
+            transaction_records.append(self.statement_row(transaction, current_balance))
+        return transaction_records, current_balance
+
+    def stream_statement(self, transactions, opening_balance):
+        encoder = DjangoJSONEncoder()
+        current_balance = opening_balance
+        yield '{"opening_balance": %s, "transactions": [' % encoder.encode(
+            str(opening_balance)
+        )
+        separator = ""
+        for transaction in transactions:
+            current_balance += transaction["deposit"] - transaction["payment"]
+            yield separator + encoder.encode(
+                self.statement_row(transaction, current_balance)
+            )
+            separator = ","
+        yield '], "closing_balance": %s}' % encoder.encode(str(current_balance))
+
+    @staticmethod
+    def encode_cursor(transaction_date, transaction_id, balance):
+        # Signed, the running balance of the next page is taken from it
+        return signing.dumps(
+            [transaction_date.isoformat(), transaction_id, balance],
+            salt=BANK_STATEMENT_CURSOR_SALT,
+        )
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            transaction_date, transaction_id, balance = signing.loads(
+                cursor, salt=BANK_STATEMENT_CURSOR_SALT
+            )
+            return (
+                datetime.date.fromisoformat(transaction_date),
+                int(transaction_id),
+                float(balance),
+            )
+        except (signing.BadSignature, TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+
 
 # Ensure to add the URL route for this view in your urls.py
 
 
-class IncomingFundViewSet(viewsets.ModelViewSet):
+class IncomingFundViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows IncomingFund to be viewed or edited.
     """
@@ -238,15 +374,16 @@ class IncomingFundViewSet(viewsets.ModelViewSet):
             query_filters &= Q(date__gte=start_date) & Q(date__lte=end_date)
         queryset = (
             IncomingFund.objects.filter(query_filters)
-            .select_related("booking", "booking__customer", "bank")
-            .prefetch_related("files")
+            .select_related("booking", "booking__customer", "bank", "reference_plot__block")
+            .prefetch_related("files", "booking__plots__block")
         )
         return queryset
   
+    @transaction.atomic
     def perform_destroy(self, instance):
          # Handle discount instance and related transactions
         try:
-            discount_instance = IncomingFund.objects.get(document_number=f"D-{instance.document_number}")
+            discount_instance = IncomingFund.objects.get(project=instance.project, document_number=f"D-{instance.document_number}")
             
             # Delete all bank transactions related to the discount instance
             BankTransaction.objects.filter(
@@ -254,7 +391,8 @@ class IncomingFundViewSet(viewsets.ModelViewSet):
                 related_id=discount_instance.id
             ).delete()
             
-            # Delete the discount instance
+            # Delete the discount instance, it no longer counts as received
+            instance.booking.add_received_amount(-discount_instance.amount)
             discount_instance.delete()
         except IncomingFund.DoesNotExist:
             pass  # No discount instance exists, continue deletion of the main payment
@@ -280,12 +418,9 @@ class IncomingFundViewSet(viewsets.ModelViewSet):
         booking = instance.booking
         reference = instance.reference
         if reference == "payment":
-            booking.remaining += amount
-            booking.total_receiving_amount -= amount
+            booking.add_received_amount(-amount)
         elif reference == "refund":
-            booking.remaining -= amount
-            booking.total_receiving_amount += amount
-        booking.save()
+            booking.add_received_amount(amount)
         return super().perform_destroy(instance)
 
 
@@ -299,7 +434,11 @@ class LatestPaymentView(APIView):
             return Response({'error': 'Project ID is required'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            filtered_payments = IncomingFund.objects.filter(project_id=project_id, reference="payment")
+            filtered_payments = (
+                IncomingFund.objects.filter(project_id=project_id, reference="payment")
+                .select_related("booking__customer", "bank", "reference_plot__block")
+                .prefetch_related("files", "booking__plots__block")
+            )
             print(f"Filtered Payments Count: {filtered_payments.count()}")
 
             if not filtered_payments.exists():
@@ -314,7 +453,7 @@ class LatestPaymentView(APIView):
             print(f"Error: {e}")
             return Response({'error': 'An unexpected error occurred'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class OutgoingFundViewSet(viewsets.ModelViewSet):
+class OutgoingFundViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows OutgoingFund to be viewed or edited.
     """
@@ -322,7 +461,17 @@ class OutgoingFundViewSet(viewsets.ModelViewSet):
     serializer_class = OutgoingFundSerializer
 
     def get_queryset(self):
-        queryset = OutgoingFund.objects.all().select_related("bank")
+        queryset = (
+            OutgoingFund.objects.all()
+            .select_related("bank", "payee")
+            .prefetch_related(
+                "files",
+                Prefetch(
+                    "details",
+                    queryset=OutgoingFundDetails.objects.select_related("category"),
+                ),
+            )
+        )
         project_id = self.request.query_params.get("project")
         if project_id:
             queryset = queryset.filter(project_id=project_id)
@@ -409,7 +558,11 @@ class PaymentReminderViewSet(viewsets.ModelViewSet):
     parser_classes = (MultiPartParser, FormParser)
 
     def get_queryset(self):
-        queryset = PaymentReminder.objects.all()
+        queryset = (
+            PaymentReminder.objects.all()
+            .select_related("booking__customer")
+            .prefetch_related("files", "booking__plots")
+        )
         project_id = self.request.query_params.get("project")
         if project_id:
             queryset = queryset.filter(project_id=project_id)
@@ -491,103 +644,150 @@ def get_plot_info(booking):
             f"{plot.plot_number} || {plot.get_type_display()} || {plot.get_plot_size()}"
             for plot in booking.plots.all()
         ]
+
+
 class DuePaymentsView(APIView):
+    """
+    Bookings with installments due that are not paid yet, read from the
+    InstallmentSchedule of each booking.
+
+    Optional ``ordering`` (short_fall_amount / -short_fall_amount) sorts the
+    result, ``page`` and ``page_size`` paginate it.
+    """
+
+    ordering_fields = ("short_fall_amount", "-short_fall_amount")
+    max_page_size = 1000
 
     def get(self, request):
         project_id = request.query_params.get("project")
-        current_month = date.today().replace(day=1)
+        ordering = request.query_params.get("ordering")
+        page = request.query_params.get("page")
+        page_size = request.query_params.get("page_size")
+
+        if ordering and ordering not in self.ordering_fields:
+            return Response(
+                {"error": f"ordering must be one of {', '.join(self.ordering_fields)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            page = max(int(page or 1), 1)
+            page_size = min(int(page_size), self.max_page_size) if page_size else None
+        except ValueError:
+            return Response(
+                {"error": "page and page_size must be integers."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if page_size is not None and page_size < 1:
+            return Response(
+                {"error": "page_size must be a positive integer."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        today = date.today()
 
         # Filter active bookings
         active_bookings = Booking.objects.filter(
             status="active", booking_type="installment_payment"
         )
-        
+
         if project_id:
             active_bookings = active_bookings.filter(project_id=project_id)
 
-        due_payments = []
+        active_bookings = active_bookings.annotate(
+            short_fall=outstanding_amount(today),
+        ).filter(short_fall__gt=0.5)
+
+        if ordering == "short_fall_amount":
+            active_bookings = active_bookings.order_by("short_fall", "id")
+        elif ordering == "-short_fall_amount":
+            active_bookings = active_bookings.order_by("-short_fall", "id")
+        else:
+            active_bookings = active_bookings.order_by("id")
+
+        response_data = {}
+        if page_size:
+            response_data["count"] = active_bookings.count()
+            active_bookings = active_bookings[(page - 1) * page_size : page * page_size]
+
+        active_bookings = active_bookings.annotate(
+            expected_amount=expected_amount(today),
+            installment_received_amount=Coalesce(
+                F("financials__paid_amount") + F("financials__discount_amount"),
+                Value(0.0),
+                output_field=FloatField(),
+            ),
+            refunded_amount=Coalesce(
+                "financials__refunded_amount", Value(0.0), output_field=FloatField()
+            ),
+            token_amount_received=Coalesce(
+                "financials__token_amount", Value(0.0), output_field=FloatField()
+            ),
+        ).values(
+            "id",
+            "booking_id",
+            "installment_date",
+            "installment_per_month",
+            "total_amount",
+            "customer_id",
+            "short_fall",
+            "expected_amount",
+            "installment_received_amount",
+            "refunded_amount",
+            "token_amount_received",
+            customer_name=F("customer__name"),
+            customer_contact=F("customer__contact"),
+        )
 
-        for booking in active_bookings.prefetch_related('customer', 'plots'):
-            installment_received_amount = (
-                IncomingFund.objects
-                .filter(booking=booking, reference__in=["payment", "Discount"])
-                .annotate(amount_as_float=Cast("amount", FloatField()))  # Cast amount to FloatField
-                .aggregate(total=Coalesce(Sum("amount_as_float"), 0.0)).get("total", 0.0)
-            )
-            refunded_amount= (
-                IncomingFund.objects
-                .filter(booking=booking, reference="refund")
-                .annotate(amount_as_float=Cast("amount", FloatField()))  # Cast amount to FloatField
-                .aggregate(total=Coalesce(Sum("amount_as_float"), 0.0)).get("total", 0.0)
+        due_payments = []
+        for booking in active_bookings:
+            token_amount_received = booking["token_amount_received"]
+            received_amount_total = (
+                booking["installment_received_amount"]
+                + token_amount_received
+                - booking["refunded_amount"]
             )
-            token_amount_received = 0.0
-            if booking.token:
-                if booking.token.status!="refunded":
-                    token_amount_received=booking.token.amount
-            
-            received_amount_total = installment_received_amount + token_amount_received - refunded_amount
-
-            # Get the latest installment reminder date
-            reminder_date = booking.installment_date
-
-            # Ensure reminder_date is not None before comparing
-            if reminder_date and date.today().day < reminder_date:
-                if booking.due_date <= date.today():
-                    current_month=(booking.due_date.replace(day=1)- timedelta(days=1)).replace(day=1)
-                else:
-                    # If today's date is less than the reminder date, use the previous month
-                    current_month = (date.today().replace(day=1) - timedelta(days=1)).replace(day=1)
-            else:
-                if booking.due_date <= date.today():
-                    current_month=booking.due_date.replace(day=1)
-                else:
-                    # Otherwise, use the current month
-                    current_month = date.today().replace(day=1)
-
-            # Get the booking date's first day of the month
-            booking_month = booking.booking_date.replace(day=1)
-
-            # Calculate the total months since booking
-            booking_months_count = (current_month.year - booking_month.year) * 12 + (current_month.month - booking_month.month)
+            booking_payments_total = booking["expected_amount"] + token_amount_received
+            short_fall_amount = round(booking["short_fall"])
 
-            booking_payments_total= booking_months_count * booking.installment_per_month + token_amount_received
-            
-            short_fall_amount=round(booking_payments_total-received_amount_total)
-            
             if booking_payments_total == 0:
-                performance = 0  # or another appropriate value
+                performance = 0
             else:
-                performance = round(((received_amount_total / booking_payments_total) * 100), 3)
-            # Calculate the remaining months difference
-            if short_fall_amount > 0:
-                if booking.installment_per_month != 0:
-                    months_diff = math.ceil(short_fall_amount / booking.installment_per_month)
-                else:
-                    months_diff = 0
+                performance = round(
+                    ((received_amount_total / booking_payments_total) * 100), 3
+                )
+            installment_per_month = booking["installment_per_month"]
+            if installment_per_month != 0:
+                months_diff = math.ceil(short_fall_amount / installment_per_month)
             else:
-                months_diff=0
-
-            customer = booking.customer
-            plot_info = get_plot_info(booking)
-
-            if short_fall_amount > 0:
-                due_payments.append({
-                    "id": booking.id,
-                    "booking_id": booking.booking_id,
-                    "plot_info": plot_info,
-                    "customer_name": customer.name,
-                    "customer_id": customer.id,
-                    "customer_contact": customer.contact,
-                    "due_date": booking.installment_date,
-                    "total_remaining_amount": booking.total_amount - received_amount_total,
+                months_diff = 0
+
+            due_payments.append(
+                {
+                    "id": booking["id"],
+                    "booking_id": booking["booking_id"],
+                    "plot_info": [],
+                    "customer_name": booking["customer_name"],
+                    "customer_id": booking["customer_id"],
+                    "customer_contact": booking["customer_contact"],
+                    "due_date": booking["installment_date"],
+                    "total_remaining_amount": booking["total_amount"]
+                    - received_amount_total,
                     "month_difference": months_diff,
                     "performance": performance,
-                    "short_fall_amount": short_fall_amount
-                })
-
-        return Response({"due_payments": due_payments})
+                    "short_fall_amount": short_fall_amount,
+                }
+            )
 
+        # Plots are only loaded for the rows being returned
+        bookings = Booking.objects.filter(
+            pk__in=[row["id"] for row in due_payments]
+        ).prefetch_related("plots")
+        plot_info = {booking.id: get_plot_info(booking) for booking in bookings}
+        for row in due_payments:
+            row["plot_info"] = plot_info.get(row["id"], [])
 
+        response_data["due_payments"] = due_payments
+        return Response(response_data)
 
 
 class BankDepositViewSet(viewsets.ModelViewSet):
@@ -715,7 +915,13 @@ class JournalEntryViewSet(viewsets.ModelViewSet):
         if project_id:
             query_filters &= Q(project_id=project_id)
 
-        queryset = JournalEntry.objects.filter(query_filters).prefetch_related("files")
+        queryset = JournalEntry.objects.filter(query_filters).prefetch_related(
+            "files",
+            Prefetch(
+                "details",
+                queryset=JournalEntryLine.objects.select_related("account", "person"),
+            ),
+        )
         return queryset
 
     def perform_destroy(self, instance):
@@ -748,7 +954,11 @@ class BankTransferViewSet(viewsets.ModelViewSet):
         if project_id:
             query_filters &= Q(project_id=project_id)
 
-        queryset = BankTransfer.objects.filter(query_filters).prefetch_related("files")
+        queryset = (
+            BankTransfer.objects.filter(query_filters)
+            .select_related("transfer_from", "transfer_to")
+            .prefetch_related("files")
+        )
         return queryset
 
     def perform_destroy(self, instance):
@@ -780,7 +990,11 @@ class ChequeClearanceViewSet(viewsets.ModelViewSet):
         if project_id:
             query_filters &= Q(project_id=project_id)
         queryset = ChequeClearance.objects.filter(query_filters).prefetch_related(
-            "files"
+            "files",
+            Prefetch(
+                "details",
+                queryset=ChequeClearanceDetail.objects.select_related("expense__bank"),
+            ),
         )
         return queryset
 
@@ -794,3 +1008,34 @@ class ChequeClearanceViewSet(viewsets.ModelViewSet):
 
         # Delete the BankDeposit instance
         super().perform_destroy(instance)
+
+
+class ReconciliationView(APIView):
+    """
+    GET lists the latest reconciliation runs. POST runs one, optionally for
+    a ``project``, ``incremental`` from the last run and with ``fix`` to
+    write the recomputed totals, and returns the mismatches it found.
+    """
+
+    permission_classes = [IsAdminUser]
+    true_values = (True, "1", "true", "True")
+
+    def get(self, request):
+        runs = ReconciliationRun.objects.order_by("-started_at")[:20]
+        return Response([run_summary(run) for run in runs])
+
+    def post(self, request):
+        project_id = request.data.get("project")
+        try:
+            project_id = int(project_id) if project_id else None
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "project must be an integer."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        run, bookings, accounts = reconcile(
+            project_id=project_id,
+            incremental=request.data.get("incremental") in self.true_values,
+            fix=request.data.get("fix") in self.true_values,
+        )
+        return Response({"run": run_summary(run), "bookings": bookings, "accounts": accounts})
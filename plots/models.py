@@ -27,6 +27,7 @@ class Plots(models.Model):
     cost_price=models.FloatField(default=0)
     status = models.CharField(max_length=10, default='active')
     parent_plot = models.ForeignKey('self', on_delete=models.CASCADE, blank=True, null=True, related_name='sub_plots')
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.plot_number
@@ -128,7 +128,7 @@ class ResalePlotsSerializer(serializers.ModelSerializer):
     category_name = serializers.SerializerMethodField(read_only=True)
     plot_size = serializers.SerializerMethodField(read_only=True)
     booking_count = serializers.SerializerMethodField(read_only=True)
-    booking_details = BookingDetailSerializer(many=True)
+    booking_details = BookingDetailSerializer(source='booking', many=True)
 
     def get_plot_size(self, instance):
         return instance.get_plot_size()
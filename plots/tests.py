@@ -1,3 +1,16 @@
-from django.test import TestCase
+from Zeeland.testing import QueryBudgetTestCase
+from .models import Block, Plots
 
-# Create your tests here.
+
+class PlotsQueryBudgetTests(QueryBudgetTestCase):
+    def test_plots(self):
+        # The list ETag adds its aggregate and the data version lookup
+        self.assertQueryBudget(5, "plots/")
+        self.assertDetailQueryBudget(3, "plots/", Plots.objects.filter(project=self.large))
+
+    def test_blocks(self):
+        self.assertQueryBudget(1, "blocks/")
+        self.assertDetailQueryBudget(1, "blocks/", Block.objects.filter(project=self.large))
+
+    def test_resold_plots(self):
+        self.assertQueryBudget(2, "resold-plots/")
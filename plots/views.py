@@ -5,6 +5,7 @@ from .serializers import PlotsSerializer, ResalePlotsSerializer,BlockSerializer
 from .models import Plots,PlotsDocuments,Block
 from booking.models import Booking
 from django.db.models import Count, Prefetch
+from Zeeland.etags import ConditionalListMixin
 
 
 class BlockViewSet(viewsets.ModelViewSet):
@@ -21,7 +22,7 @@ class BlockViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class PlotsViewSet(viewsets.ModelViewSet):
+class PlotsViewSet(ConditionalListMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows Plots to be viewed or edited.
     """
@@ -30,7 +31,7 @@ class PlotsViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         subplots_prefetch = Prefetch('sub_plots', queryset=Plots.objects.all().select_related('parent_plot'))
         files_prefetch = Prefetch('files', queryset=PlotsDocuments.objects.all())
-        queryset = Plots.objects.all().prefetch_related(files_prefetch,subplots_prefetch).select_related('parent_plot')
+        queryset = Plots.objects.all().prefetch_related(files_prefetch,subplots_prefetch).select_related('block', 'parent_plot')
         
         project_id = self.request.query_params.get('project')
         customer_id = self.request.query_params.get('customer_id')
@@ -68,9 +69,9 @@ class ResalePlotListView(ListAPIView):
     serializer_class = ResalePlotsSerializer
 
     def get_queryset(self):
-        queryset = Plots.objects.annotate(booking_count=Count('booking_details')).filter(
+        queryset = Plots.objects.annotate(booking_count=Count('booking')).filter(
             booking_count__gt=1).prefetch_related(
-                Prefetch('booking_details',
+                Prefetch('booking',
                          queryset=Booking.objects.select_related('customer'))
         )
 
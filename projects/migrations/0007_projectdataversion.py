@@ -0,0 +1,26 @@
+# Generated by Django 4.2.16 on 2026-10-18 13:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_projects_cost_per_marla'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectDataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='data_version', to='projects.projects')),
+            ],
+            options={
+                'db_table': 'project_data_versions',
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.16 on 2026-10-18 16:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+from projects.sequences import DOCUMENT_KINDS, document_prefix, used_max_number
+
+
+def seed_document_sequences(apps, schema_editor):
+    Projects = apps.get_model("projects", "Projects")
+    DocumentSequence = apps.get_model("projects", "DocumentSequence")
+    models_by_kind = {
+        kind: apps.get_model(model._meta.label) for kind, (model, _, _) in DOCUMENT_KINDS.items()
+    }
+    sequences = [
+        DocumentSequence(
+            project_id=project_id,
+            kind=kind,
+            prefix=document_prefix(project_id, kind),
+            last_number=used_max_number(project_id, kind, model=model),
+        )
+        for project_id in Projects.objects.values_list("id", flat=True).iterator()
+        for kind, model in models_by_kind.items()
+    ]
+    DocumentSequence.objects.bulk_create(sequences, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0043_token_document_number'),
+        ('payments', '0058_incomingfund_document_number'),
+        ('projects', '0007_projectdataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('booking', 'Booking'), ('token', 'Token'), ('payment', 'Payment'), ('refund', 'Refund')], max_length=20)),
+                ('prefix', models.CharField(blank=True, default='', max_length=20)),
+                ('last_number', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_sequences', to='projects.projects')),
+            ],
+            options={
+                'db_table': 'document_sequences',
+                'unique_together': {('project', 'kind', 'prefix')},
+            },
+        ),
+        migrations.RunPython(seed_document_sequences, migrations.RunPython.noop),
+    ]
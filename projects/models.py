@@ -1,5 +1,6 @@
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 
 # Create your models here.
 
@@ -22,6 +23,49 @@ class Projects(models.Model):
         db_table = 'projects'
 
 
+class ProjectDataVersion(models.Model):
+    """Counter bumped whenever data shown on the dashboards and reports changes."""
+
+    project = models.OneToOneField(
+        Projects, related_name="data_version", on_delete=models.CASCADE
+    )
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'project_data_versions'
+
+    @classmethod
+    def get_version(cls, project_id):
+        version = (
+            cls.objects.filter(project_id=project_id)
+            .values_list("version", flat=True)
+            .first()
+        )
+        return version or 0
+
+    @classmethod
+    def bump(cls, project_id):
+        updated = cls.objects.filter(project_id=project_id).update(
+            version=models.F("version") + 1, updated_at=timezone.now()
+        )
+        if not updated:
+            version, created = cls.objects.get_or_create(
+                project_id=project_id, defaults={"version": 1}
+            )
+            if not created:
+                cls.objects.filter(pk=version.pk).update(
+                    version=models.F("version") + 1, updated_at=timezone.now()
+                )
+
+    @classmethod
+    def bump_on_commit(cls, *project_ids):
+        """Bump the versions of the projects once the current transaction commits."""
+        for project_id in set(project_ids):
+            if project_id:
+                transaction.on_commit(lambda project_id=project_id: cls.bump(project_id))
+
+
 class BalanceSheet(models.Model):
     user = models.ForeignKey(User, on_delete=models.PROTECT)
     date = models.DateField()
@@ -38,3 +82,29 @@ class BalanceSheetAmountDetails(models.Model):
     project = models.ForeignKey(Projects, on_delete=models.PROTECT)
     amount=models.FloatField(default=0)
 
+
+
+class DocumentSequence(models.Model):
+    """
+    Last document number handed out for a kind of document of a project,
+    e.g. the "R-" refund numbers. Numbers are taken by locking the row.
+    """
+
+    KINDS = (
+        ("booking", "Booking"),
+        ("token", "Token"),
+        ("payment", "Payment"),
+        ("refund", "Refund"),
+    )
+
+    project = models.ForeignKey(
+        Projects, related_name="document_sequences", on_delete=models.CASCADE
+    )
+    kind = models.CharField(max_length=20, choices=KINDS)
+    prefix = models.CharField(max_length=20, blank=True, default="")
+    last_number = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'document_sequences'
+        unique_together = ("project", "kind", "prefix")
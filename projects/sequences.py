@@ -0,0 +1,138 @@
+from django.db import IntegrityError, transaction
+from booking.models import Booking, Token
+from payments.models import IncomingFund
+from .models import DocumentSequence
+
+# kind: (model, number field, prefix) of the documents numbered by the
+# sequence. "{project_id}" in a prefix is replaced by the project id.
+DOCUMENT_KINDS = {
+    "booking": (Booking, "booking_id", "{project_id}-"),
+    "token": (Token, "document_number", ""),
+    "payment": (IncomingFund, "document_number", ""),
+    "refund": (IncomingFund, "document_number", "R-"),
+}
+
+
+def _project_id(project):
+    return getattr(project, "pk", project)
+
+
+def document_prefix(project, kind):
+    return DOCUMENT_KINDS[kind][2].format(project_id=_project_id(project))
+
+
+def format_document_number(project, kind, number):
+    return f"{document_prefix(project, kind)}{str(number).zfill(3)}"
+
+
+def parse_document_number(project, kind, document_number):
+    """Number of a document number of the kind, None if it is not one."""
+    prefix = document_prefix(project, kind)
+    if not document_number or not document_number.startswith(prefix):
+        return None
+    number = document_number[len(prefix):]
+    return int(number) if number.isdigit() else None
+
+
+def used_max_number(project, kind, model=None):
+    """
+    Highest number already given to a document of the kind. Migrations
+    pass the historical ``model`` of the documents.
+    """
+    default_model, field, _ = DOCUMENT_KINDS[kind]
+    model = model or default_model
+    prefix = document_prefix(project, kind)
+    numbers = model.objects.filter(project_id=_project_id(project))
+    if prefix:
+        numbers = numbers.filter(**{f"{field}__startswith": prefix})
+    numbers = [
+        parse_document_number(project, kind, value)
+        for value in numbers.values_list(field, flat=True)
+    ]
+    return max([number for number in numbers if number is not None], default=0)
+
+
+def _locked_sequence(project, kind):
+    """
+    Sequence row of the kind locked for the current transaction, created
+    from the numbers already in use the first time. Migration 0008 seeds
+    the rows of the existing projects, as two first allocations racing on
+    the missing row can deadlock on MySQL.
+    """
+    lookup = {
+        "project_id": _project_id(project),
+        "kind": kind,
+        "prefix": document_prefix(project, kind),
+    }
+    sequence = DocumentSequence.objects.select_for_update().filter(**lookup).first()
+    if sequence is None:
+        try:
+            with transaction.atomic():
+                sequence = DocumentSequence.objects.create(
+                    last_number=used_max_number(project, kind), **lookup
+                )
+        except IntegrityError:
+            # Created by a concurrent request in the meantime
+            sequence = DocumentSequence.objects.select_for_update().get(**lookup)
+    return sequence
+
+
+@transaction.atomic
+def reserve_document_numbers(project, kind, count=1):
+    """
+    Take ``count`` consecutive document numbers of the kind, e.g. for an
+    import, and return them formatted.
+    """
+    sequence = _locked_sequence(project, kind)
+    first = sequence.last_number + 1
+    sequence.last_number += count
+    sequence.save(update_fields=["last_number", "updated_at"])
+    return [
+        format_document_number(project, kind, number)
+        for number in range(first, first + count)
+    ]
+
+
+def next_document_number(project, kind):
+    return reserve_document_numbers(project, kind)[0]
+
+
+def peek_document_number(project, kind):
+    """Number the next document of the kind would get, without taking it."""
+    sequence = (
+        DocumentSequence.objects.filter(
+            project_id=_project_id(project),
+            kind=kind,
+            prefix=document_prefix(project, kind),
+        )
+        .values_list("last_number", flat=True)
+        .first()
+    )
+    if sequence is None:
+        sequence = used_max_number(project, kind)
+    return format_document_number(project, kind, sequence + 1)
+
+
+@transaction.atomic
+def claim_document_number(project, kind, document_number):
+    """
+    Move the sequence past a number entered by hand, so it is not handed
+    out again. Numbers not of the kind are ignored.
+    """
+    number = parse_document_number(project, kind, document_number)
+    if number is None:
+        return
+    sequence = _locked_sequence(project, kind)
+    if number > sequence.last_number:
+        sequence.last_number = number
+        sequence.save(update_fields=["last_number", "updated_at"])
+
+
+def reset_document_sequences(project=None, kinds=None):
+    """Forget the sequences, they restart from the numbers in use on next use."""
+    sequences = DocumentSequence.objects.all()
+    if project:
+        sequences = sequences.filter(project_id=_project_id(project))
+    if kinds:
+        sequences = sequences.filter(kind__in=kinds)
+    sequences.delete()
@@ -1,3 +1,72 @@
+import io
+from django.core.management import call_command
 from django.test import TestCase
+from booking.models import Booking
+from payments.models import IncomingFund
+from Zeeland.testing import QueryBudgetTestCase
+from .models import BalanceSheet, DocumentSequence, Projects
+from .sequences import (
+    claim_document_number,
+    next_document_number,
+    peek_document_number,
+    reserve_document_numbers,
+    reset_document_sequences,
+)
 
-# Create your tests here.
+
+class ProjectsQueryBudgetTests(QueryBudgetTestCase):
+    def test_projects(self):
+        self.assertQueryBudget(2, "projects/")
+        self.assertDetailQueryBudget(2, "projects/", Projects.objects.all())
+
+    def test_balance_sheets(self):
+        # Balance sheets cover every project
+        self.assertQueryBudget(4, "balance-sheet/")
+        self.assertDetailQueryBudget(4, "balance-sheet/", BalanceSheet.objects.all())
+
+
+class DocumentSequenceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("generate_dataset", scale=0.05, months=2, seed=4, stdout=io.StringIO())
+        cls.project = Projects.objects.order_by("id").first()
+        cls.bookings = Booking.objects.filter(project=cls.project).count()
+        cls.payments = IncomingFund.objects.filter(
+            project=cls.project, reference="payment"
+        ).count()
+
+    def setUp(self):
+        # Start from the numbers in use, as for a project without sequences
+        reset_document_sequences(self.project)
+
+    def test_seeded_from_numbers_in_use(self):
+        self.assertEqual(
+            peek_document_number(self.project, "booking"),
+            f"{self.project.id}-{self.bookings + 1:03}",
+        )
+        self.assertFalse(DocumentSequence.objects.filter(project=self.project).exists())
+        self.assertEqual(
+            next_document_number(self.project, "booking"),
+            f"{self.project.id}-{self.bookings + 1:03}",
+        )
+        self.assertEqual(
+            next_document_number(self.project, "booking"),
+            f"{self.project.id}-{self.bookings + 2:03}",
+        )
+        self.assertEqual(next_document_number(self.project, "refund"), "R-001")
+
+    def test_reserve_consecutive_numbers(self):
+        first = self.payments + 1
+        self.assertEqual(
+            reserve_document_numbers(self.project, "payment", 3),
+            [f"{number:03}" for number in range(first, first + 3)],
+        )
+        self.assertEqual(next_document_number(self.project, "payment"), f"{first + 3:03}")
+
+    def test_claim_document_number(self):
+        claim_document_number(self.project, "refund", "R-041")
+        self.assertEqual(next_document_number(self.project, "refund"), "R-042")
+        # Lower numbers and numbers of other kinds leave the sequence alone
+        claim_document_number(self.project, "refund", "R-007")
+        claim_document_number(self.project, "refund", "900")
+        self.assertEqual(next_document_number(self.project, "refund"), "R-043")
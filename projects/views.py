@@ -12,7 +12,7 @@ class ProjectsViewSet(viewsets.ModelViewSet):
     """
     API endpoint that allows Projects to be viewed or edited.
     """
-    queryset = Projects.objects.all()
+    queryset = Projects.objects.all().prefetch_related("user")
     serializer_class = ProjectsSerializer
 
 
@@ -25,7 +25,7 @@ class BalanceSheetViewSet(viewsets.ModelViewSet):
 
 
     def get_queryset(self):
-        queryset = BalanceSheet.objects.all()
+        queryset = BalanceSheet.objects.all().prefetch_related('details__amount_details__project')
         date = self.request.query_params.get('date')
         if date:
             queryset = queryset.filter(date=date)
@@ -0,0 +1,141 @@
+import hashlib
+import threading
+from datetime import date
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from projects.models import ProjectDataVersion
+from .profiling import PROFILE_PARAM
+
+_lock = threading.Lock()
+_stats = {}
+
+
+def report_cache():
+    alias = getattr(settings, "REPORT_CACHE_ALIAS", None)
+    return caches[alias] if alias else None
+
+
+def record(report, outcome):
+    with _lock:
+        counts = _stats.setdefault(report, {"hits": 0, "misses": 0, "bypassed": 0})
+        counts[outcome] += 1
+
+
+def get_stats():
+    with _lock:
+        stats = {}
+        for report, counts in sorted(_stats.items()):
+            lookups = counts["hits"] + counts["misses"]
+            stats[report] = {
+                **counts,
+                "hit_rate": round(counts["hits"] / lookups, 3) if lookups else None,
+            }
+    hits = sum(counts["hits"] for counts in stats.values())
+    lookups = hits + sum(counts["misses"] for counts in stats.values())
+    return {
+        "hit_rate": round(hits / lookups, 3) if lookups else None,
+        "reports": stats,
+    }
+
+
+def reset_stats():
+    with _lock:
+        _stats.clear()
+
+
+def params_digest(query_params):
+    """Hash of the query parameters, independent of their order and empty values."""
+    params = sorted(
+        (name, value)
+        for name in query_params
+        if not name.startswith(PROFILE_PARAM)
+        for value in query_params.getlist(name)
+        if value != ""
+    )
+    return hashlib.sha1(repr(params).encode()).hexdigest()
+
+
+class ReportCacheMixin:
+    """
+    Serve GET responses of a report from the REPORT_CACHE_ALIAS cache.
+
+    Entries are keyed by the report, its query parameters, the date and the
+    data version of the project, which every write to a tracked model bumps
+    (see reports.signals), so a cached report is never stale. The project
+    comes from ``project_id``/``project`` or, for reports of a single
+    record, from the ``cache_owner = (parameter, model)`` it belongs to.
+    Requests without a project and profiled requests are not cached.
+    """
+
+    cache_owner = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method == "GET" and report_cache() is not None:
+            # dispatch() looks the handler up after initial()
+            self.get = self.cached(self.get)
+
+    def get_cache_project(self, request):
+        params = request.query_params
+        if self.cache_owner:
+            param, model = self.cache_owner
+            owner_id = params.get(param)
+            if owner_id and owner_id.isdigit():
+                return (
+                    model.objects.filter(pk=owner_id)
+                    .values_list("project_id", flat=True)
+                    .first()
+                )
+        project_id = params.get("project_id") or params.get("project")
+        return int(project_id) if project_id and project_id.isdigit() else None
+
+    def cached(self, handler):
+        def run(request, *args, **kwargs):
+            report = self.__class__.__name__
+            project_id = None
+            if PROFILE_PARAM not in request.query_params:
+                project_id = self.get_cache_project(request)
+            if project_id is None:
+                record(report, "bypassed")
+                return handler(request, *args, **kwargs)
+
+            version = ProjectDataVersion.get_version(project_id)
+            key = ":".join(
+                [
+                    "report",
+                    report,
+                    str(project_id),
+                    str(version),
+                    date.today().isoformat(),
+                    params_digest(request.query_params),
+                ]
+            )
+            cache = report_cache()
+            data = cache.get(key)
+            if data is not None:
+                record(report, "hits")
+                return Response(data)
+
+            record(report, "misses")
+            response = handler(request, *args, **kwargs)
+            if isinstance(response, Response) and response.status_code == 200:
+                cache.set(key, response.data)
+            return response
+
+        return run
+
+
+class ReportCacheStatsView(APIView):
+    """Hit rates of the report cache in this process, DELETE starts them over."""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_stats())
+
+    def delete(self, request):
+        reset_stats()
+        return Response(status=204)
@@ -0,0 +1,242 @@
+from collections import defaultdict
+from datetime import date, datetime
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Abs, TruncMonth
+from booking.models import Booking, Token
+from customer.models import Customers
+from payments.models import (
+    IncomingFund,
+    OutgoingFund,
+    DealerPayments,
+    BankDepositTransactions,
+    JournalEntry,
+    JournalEntryLine,
+)
+from .ledger import OpeningSource, sum_sources
+from .models import LedgerCheckpoint, LedgerVersion
+
+SIGNED_PAYMENT = Case(
+    When(reference="payment", then=F("amount")),
+    When(reference="refund", then=-F("amount")),
+    default=Value(0),
+    output_field=FloatField(),
+)
+
+# party type: (model, party field, date field, signed amount) of every kind
+# of entry that moves the opening balance of its ledger. Employees use the
+# vendor ledger balances.
+PARTY_SOURCES = {
+    "customer": [
+        (Booking, "customer_id", "booking_date", F("total_amount")),
+        (IncomingFund, "booking__customer_id", "date", -SIGNED_PAYMENT),
+        (Token, "customer_id", "date", -F("amount")),
+    ],
+    "dealer": [
+        (Booking, "dealer_id", "booking_date", F("dealer_comission_amount")),
+        (DealerPayments, "booking__dealer_id", "date", -SIGNED_PAYMENT),
+    ],
+    "vendor": [
+        (JournalEntryLine, "person_id", "journal_entry__date", F("credit") - F("debit")),
+        (BankDepositTransactions, "customer_id", "date", -Abs(F("amount"))),
+        (OutgoingFund, "payee_id", "date", -F("amount")),
+    ],
+}
+
+# model: (party type, party field, date field) of the rows whose changes
+# make later checkpoints stale
+CHECKPOINT_TRACKED = defaultdict(list)
+for party_type, sources in PARTY_SOURCES.items():
+    for model, party_field, date_field, amount in sources:
+        CHECKPOINT_TRACKED[model].append((party_type, party_field, date_field))
+# Moving a journal entry moves all of its lines
+CHECKPOINT_TRACKED[JournalEntry].append(("vendor", "details__person_id", "date"))
+
+
+def _to_date(value):
+    if isinstance(value, str):
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    return value
+
+
+def opening_sources(party_type, party_id, start_date=None, end_date=None):
+    """Opening sources of a party for the entries dated in [start_date, end_date)."""
+    sources = []
+    for model, party_field, date_field, amount in PARTY_SOURCES[party_type]:
+        queryset = model.objects.filter(**{party_field: party_id})
+        if start_date:
+            queryset = queryset.filter(**{f"{date_field}__gte": start_date})
+        if end_date:
+            queryset = queryset.filter(**{f"{date_field}__lt": end_date})
+        sources.append(OpeningSource(queryset, amount))
+    return sources
+
+
+def get_opening_balance(party_type, party_id, start_date):
+    """
+    Balance of a party's ledger from the entries dated before start_date:
+    the checkpoint of the month plus the entries since its first day.
+
+    A missing checkpoint is computed from the previous one and stored, so
+    the next request for the same month reads it directly, unless an entry
+    of the party changed meanwhile (see save_checkpoint).
+    """
+    if not party_id or not start_date:
+        return 0.0
+    start_date = _to_date(start_date)
+    period = start_date.replace(day=1)
+
+    # Later months still receive entries, only keep settled ones
+    settled = period <= date.today().replace(day=1)
+    # Read before the checkpoint and entries a new checkpoint is built from
+    version = ledger_version(party_type, party_id) if settled else None
+    checkpoint = (
+        LedgerCheckpoint.objects.filter(
+            party_type=party_type, party_id=party_id, period__lte=period
+        )
+        .order_by("-period")
+        .values("period", "balance")
+        .first()
+    )
+    if checkpoint and checkpoint["period"] == period:
+        balance = checkpoint["balance"]
+    else:
+        since = checkpoint["period"] if checkpoint else None
+        balance = (checkpoint["balance"] if checkpoint else 0.0) + sum_sources(
+            opening_sources(party_type, party_id, since, period)
+        )
+        if settled:
+            save_checkpoint(party_type, party_id, period, balance, version)
+
+    if start_date > period:
+        balance += sum_sources(opening_sources(party_type, party_id, period, start_date))
+    return balance
+
+
+def ledger_version(party_type, party_id):
+    """Version of a party's ledger, 0 until one of its entries changed."""
+    return (
+        LedgerVersion.objects.filter(party_type=party_type, party_id=party_id)
+        .values_list("version", flat=True)
+        .first()
+    ) or 0
+
+
+def save_checkpoint(party_type, party_id, period, balance, version):
+    """
+    Store a checkpoint computed from the ledger at ``version``. Entries
+    changed since then bumped the version when they dropped the
+    checkpoints, the balance may miss them and is not stored.
+    """
+    project_id = (
+        Customers.objects.filter(pk=party_id).values_list("project_id", flat=True).first()
+    )
+    if not project_id:
+        return
+    with transaction.atomic():
+        # Waits for a transaction changing the party's entries to finish,
+        # also one creating the version
+        current, _ = LedgerVersion.objects.select_for_update().get_or_create(
+            party_type=party_type, party_id=party_id
+        )
+        if current.version != version:
+            return
+        LedgerCheckpoint.objects.update_or_create(
+            project_id=project_id,
+            party_type=party_type,
+            party_id=party_id,
+            period=period,
+            defaults={"balance": balance},
+        )
+
+
+def checkpoint_changes(model, pk):
+    """(party type, party id, date) of every ledger a stored row belongs to."""
+    changes = set()
+    for party_type, party_field, date_field in CHECKPOINT_TRACKED.get(model, []):
+        for party_id, entry_date in model.objects.filter(pk=pk).values_list(
+            party_field, date_field
+        ):
+            if party_id and entry_date:
+                changes.add((party_type, party_id, entry_date))
+    return changes
+
+
+def invalidate_checkpoints(changes):
+    """
+    Drop the checkpoints that include an entry dated on or after a change
+    and bump the ledger versions of the parties, so checkpoints being
+    computed from the entries before the change are not stored.
+    """
+    for party_type, party_id in {(party_type, party_id) for party_type, party_id, _ in changes}:
+        versions = LedgerVersion.objects.filter(party_type=party_type, party_id=party_id)
+        if not versions.update(version=F("version") + 1):
+            version, created = LedgerVersion.objects.get_or_create(
+                party_type=party_type, party_id=party_id, defaults={"version": 1}
+            )
+            if not created:
+                versions.update(version=F("version") + 1)
+
+    query = Q()
+    for party_type, party_id, entry_date in changes:
+        query |= Q(party_type=party_type, party_id=party_id, period__gt=entry_date)
+    if query:
+        LedgerCheckpoint.objects.filter(query).delete()
+
+
+def rebuild_checkpoints(project_id=None, party_types=None):
+    """
+    Recreate the checkpoints of every party from scratch: one after each
+    month that has entries. Returns the number of checkpoints created.
+    """
+    last_period = date.today().replace(day=1)
+    checkpoints = []
+    for party_type in party_types or PARTY_SOURCES:
+        monthly = defaultdict(float)
+        for model, party_field, date_field, amount in PARTY_SOURCES[party_type]:
+            queryset = model.objects.exclude(**{f"{party_field}__isnull": True})
+            if project_id:
+                queryset = queryset.filter(
+                    **{
+                        f"{party_field}__in": Customers.objects.filter(
+                            project_id=project_id
+                        ).values("id")
+                    }
+                )
+            rows = (
+                queryset.annotate(ledger_month=TruncMonth(date_field))
+                .values_list(party_field, "ledger_month")
+                .annotate(total=Sum(amount, output_field=FloatField()))
+                .order_by()
+            )
+            for party_id, month, total in rows:
+                monthly[(party_id, month)] += total or 0.0
+
+        projects = dict(
+            Customers.objects.filter(
+                id__in={party_id for party_id, month in monthly}
+            ).values_list("id", "project_id")
+        )
+        balances = defaultdict(float)
+        for party_id, month in sorted(monthly):
+            balances[party_id] += monthly[(party_id, month)]
+            period = month + relativedelta(months=1)
+            if period <= last_period:
+                checkpoints.append(
+                    LedgerCheckpoint(
+                        project_id=projects[party_id],
+                        party_type=party_type,
+                        party_id=party_id,
+                        period=period,
+                        balance=balances[party_id],
+                    )
+                )
+
+    existing = LedgerCheckpoint.objects.filter(party_type__in=party_types or PARTY_SOURCES)
+    if project_id:
+        existing = existing.filter(project_id=project_id)
+    with transaction.atomic():
+        existing.delete()
+        LedgerCheckpoint.objects.bulk_create(checkpoints, batch_size=1000)
+    return len(checkpoints)
@@ -0,0 +1,103 @@
+from datetime import date
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, FloatField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from customer.models import Customers
+from plots.models import Plots
+from booking.models import Booking, Token
+from payments.models import IncomingFund, OutgoingFund, JournalVoucher
+from projects.models import Projects, ProjectDataVersion
+
+COUNT_FIELDS = [
+    "customer_count",
+    "active_plots_count",
+    "sold_plots_count",
+    "resale_plots_count",
+    "booking_count",
+    "non_expired_tokens_count",
+]
+AMOUNT_FIELDS = [
+    "incoming_amount",
+    "outgoing_amount",
+    "journal_voucher_in_amount",
+    "journal_voucher_out_amount",
+]
+
+
+def _project_count(queryset):
+    return Coalesce(
+        Subquery(
+            queryset.filter(project=OuterRef("pk"))
+            .order_by()
+            .values("project")
+            .annotate(total=Count("pk"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def _project_sum(queryset, field="amount"):
+    return Coalesce(
+        Subquery(
+            queryset.filter(project=OuterRef("pk"))
+            .order_by()
+            .values("project")
+            .annotate(total=Sum(field))
+            .values("total"),
+            output_field=FloatField(),
+        ),
+        Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def compute_dashboard_summary(project_id, today=None):
+    """All dashboard counts and amounts of a project in a single query."""
+    today = today or date.today()
+    resold_plots = (
+        Booking.plots.through.objects.order_by()
+        .values("plots_id")
+        .annotate(booking_count=Count("booking_id"))
+        .filter(booking_count__gt=1)
+        .values("plots_id")
+    )
+    summary = (
+        Projects.objects.filter(pk=project_id)
+        .annotate(
+            customer_count=_project_count(Customers.objects.all()),
+            active_plots_count=_project_count(Plots.objects.filter(status="active")),
+            sold_plots_count=_project_count(Plots.objects.filter(status="sold")),
+            resale_plots_count=_project_count(Plots.objects.filter(id__in=resold_plots)),
+            booking_count=_project_count(Booking.objects.all()),
+            non_expired_tokens_count=_project_count(
+                Token.objects.filter(expire_date__gte=today)
+            ),
+            incoming_amount=_project_sum(IncomingFund.objects.all()),
+            outgoing_amount=_project_sum(OutgoingFund.objects.all()),
+            journal_voucher_in_amount=_project_sum(JournalVoucher.objects.filter(type="in")),
+            journal_voucher_out_amount=_project_sum(JournalVoucher.objects.filter(type="out")),
+        )
+        .values(*COUNT_FIELDS, *AMOUNT_FIELDS)
+        .first()
+    )
+    if summary is None:
+        summary = {field: 0 for field in COUNT_FIELDS + AMOUNT_FIELDS}
+    return summary
+
+
+def get_dashboard_summary(project_id):
+    """
+    Dashboard summary of a project, cached until its data version changes.
+    The date is part of the key since the token count depends on it.
+    """
+    today = date.today()
+    version = ProjectDataVersion.get_version(project_id) if project_id else 0
+    key = f"dashboard-summary:{project_id}:{version}:{today.isoformat()}"
+    summary = cache.get(key)
+    if summary is None:
+        summary = compute_dashboard_summary(project_id, today)
+        cache.set(key, summary, getattr(settings, "DASHBOARD_CACHE_TIMEOUT", 3600))
+    return summary
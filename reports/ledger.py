@@ -0,0 +1,154 @@
+import datetime
+from django.db import connections
+from django.db.models import CharField, DateField, F, FloatField, IntegerField, Sum, TextField, Value
+from django.db.models.functions import Cast, Coalesce
+
+# Output type of every column a ledger source can provide
+COLUMN_TYPES = {
+    "id": IntegerField,
+    "date": DateField,
+    "remarks": TextField,
+    "reference": CharField,
+    "document": CharField,
+    "credit": FloatField,
+    "debit": FloatField,
+    "customer_name": CharField,
+    "dealer_name": CharField,
+    "booking_id": IntegerField,
+    "deposit_id": IntegerField,
+}
+ALIAS_PREFIX = "ledger_"
+
+
+def _expression(value, column):
+    output_field = COLUMN_TYPES[column]()
+    if value is None:
+        return Value(None, output_field=output_field)
+    if isinstance(value, str):
+        value = F(value)
+    if isinstance(output_field, (DateField, IntegerField)):
+        return value
+    # Casting keeps the column types of the union parts identical
+    return Cast(value, output_field=output_field)
+
+
+class LedgerSource:
+    """
+    One kind of ledger entry: a queryset and the expression of each ledger
+    column, e.g. LedgerSource(Booking.objects.filter(...), date="booking_date",
+    credit="total_amount", debit=Value(0.0), ...).
+    Columns a source does not declare are NULL.
+    """
+
+    def __init__(self, queryset, **columns):
+        unknown = set(columns) - set(COLUMN_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown ledger columns: {', '.join(sorted(unknown))}")
+        self.queryset = queryset
+        self.columns = columns
+
+    def as_values(self, columns, order):
+        annotations = {f"{ALIAS_PREFIX}source": Value(order, output_field=IntegerField())}
+        for column in columns:
+            annotations[ALIAS_PREFIX + column] = _expression(
+                self.columns.get(column), column
+            )
+        return self.queryset.order_by().annotate(**annotations).values(*annotations)
+
+
+class OpeningSource:
+    """A signed amount summed over a queryset for the opening balance."""
+
+    def __init__(self, queryset, amount):
+        self.queryset = queryset
+        self.amount = F(amount) if isinstance(amount, str) else amount
+
+    def as_values(self):
+        return (
+            self.queryset.order_by()
+            .annotate(ledger_group=Value(1, output_field=IntegerField()))
+            .values("ledger_group")
+            .annotate(
+                ledger_total=Coalesce(
+                    Sum(self.amount, output_field=FloatField()),
+                    Value(0.0),
+                    output_field=FloatField(),
+                )
+            )
+            .values("ledger_total")
+        )
+
+
+def _union_sql(querysets):
+    first, *rest = querysets
+    combined = first.union(*rest, all=True) if rest else first
+    sql, params = combined.query.get_compiler(using=combined.db).as_sql()
+    return combined.db, sql, params
+
+
+def sum_sources(opening_sources):
+    """Sum of every opening source, computed in one query."""
+    if not opening_sources:
+        return 0.0
+    db, sql, params = _union_sql([source.as_values() for source in opening_sources])
+    with connections[db].cursor() as cursor:
+        cursor.execute(
+            f"SELECT COALESCE(SUM(ledger_total), 0) FROM ({sql}) ledger_opening",
+            params,
+        )
+        return float(cursor.fetchone()[0] or 0)
+
+
+def _to_date(value):
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value[:10])
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+
+def get_ledger_entries(sources, columns, opening_balance=0.0):
+    """
+    Combine the sources with UNION ALL and let the database order them and
+    compute the running balance (opening + credit - debit) with a window SUM.
+
+    Entries are ordered by date, then by the order of the sources, then by id.
+    Returns a list of dicts holding ``columns`` and ``balance``.
+    """
+    if not sources:
+        return []
+    columns = list(columns)
+    for required in ("id", "date", "credit", "debit"):
+        if required not in columns:
+            raise ValueError(f"Ledger columns must include {required}")
+
+    db, sql, params = _union_sql(
+        [source.as_values(columns, order) for order, source in enumerate(sources)]
+    )
+    aliases = [ALIAS_PREFIX + column for column in columns]
+    ordering = f"{ALIAS_PREFIX}date, {ALIAS_PREFIX}source, {ALIAS_PREFIX}id"
+    query = (
+        f"SELECT {', '.join(aliases)}, "
+        f"%s + SUM(COALESCE({ALIAS_PREFIX}credit, 0) - COALESCE({ALIAS_PREFIX}debit, 0)) "
+        f"OVER (ORDER BY {ordering} ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) "
+        f"AS {ALIAS_PREFIX}balance "
+        f"FROM ({sql}) ledger_entries ORDER BY {ordering}"
+    )
+
+    entries = []
+    with connections[db].cursor() as cursor:
+        cursor.execute(query, [opening_balance, *params])
+        for row in cursor.fetchall():
+            entry = dict(zip(columns, row))
+            entry["date"] = _to_date(entry["date"])
+            entry["balance"] = row[-1]
+            entries.append(entry)
+    return entries
+
+
+def build_ledger(sources, columns, opening_balance=0.0):
+    """Opening balance, entries and closing balance of a ledger."""
+    opening_balance = round(opening_balance, 2)
+    entries = get_ledger_entries(sources, columns, opening_balance)
+    closing_balance = entries[-1]["balance"] if entries else opening_balance
+    return opening_balance, entries, closing_balance
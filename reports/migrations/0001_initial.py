@@ -0,0 +1,33 @@
+# Generated by Django 4.2.16 on 2026-10-18 15:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('projects', '0007_projectdataversion'),
+        ('customer', '0020_customers_designation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('party_type', models.CharField(choices=[('customer', 'Customer'), ('dealer', 'Dealer'), ('vendor', 'Vendor')], max_length=10)),
+                ('period', models.DateField()),
+                ('balance', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('party', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_checkpoints', to='customer.customers')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='projects.projects')),
+            ],
+            options={
+                'db_table': 'ledger_checkpoints',
+                'unique_together': {('project', 'party_type', 'party', 'period')},
+            },
+        ),
+    ]
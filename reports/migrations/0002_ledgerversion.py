@@ -0,0 +1,28 @@
+# Generated by Django 4.2.16 on 2026-10-19 09:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0021_customers_updated_at'),
+        ('reports', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('party_type', models.CharField(choices=[('customer', 'Customer'), ('dealer', 'Dealer'), ('vendor', 'Vendor')], max_length=10)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('party', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_versions', to='customer.customers')),
+            ],
+            options={
+                'db_table': 'ledger_versions',
+                'unique_together': {('party_type', 'party')},
+            },
+        ),
+    ]
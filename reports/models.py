@@ -1,3 +1,50 @@
 from django.db import models
+from projects.models import Projects
+from customer.models import Customers
 
 # Create your models here.
+
+
+class LedgerCheckpoint(models.Model):
+    """
+    Balance of a party's ledger from all entries dated before ``period``
+    (the first day of a month), so opening balances only need the entries
+    between the last checkpoint and the requested date.
+    """
+
+    PARTY_TYPES = (
+        ("customer", "Customer"),
+        ("dealer", "Dealer"),
+        ("vendor", "Vendor"),
+    )
+
+    project = models.ForeignKey(Projects, on_delete=models.CASCADE)
+    party_type = models.CharField(max_length=10, choices=PARTY_TYPES)
+    party = models.ForeignKey(
+        Customers, related_name="ledger_checkpoints", on_delete=models.CASCADE
+    )
+    period = models.DateField()
+    balance = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "ledger_checkpoints"
+        unique_together = ("project", "party_type", "party", "period")
+
+
+class LedgerVersion(models.Model):
+    """
+    Counter of a party's ledger, bumped in the same transaction as every
+    change that drops its checkpoints. A checkpoint computed on read is
+    only stored if the counter did not move while it was computed.
+    """
+
+    party_type = models.CharField(max_length=10, choices=LedgerCheckpoint.PARTY_TYPES)
+    party = models.ForeignKey(
+        Customers, related_name="ledger_versions", on_delete=models.CASCADE
+    )
+    version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        db_table = "ledger_versions"
+        unique_together = ("party_type", "party")
@@ -0,0 +1,113 @@
+import cProfile
+import io
+import os
+import pstats
+import time
+from datetime import datetime
+from django.conf import settings
+from django.db import connection
+from rest_framework.response import Response
+
+PROFILE_PARAM = "profile"
+PROFILE_LIMIT = 30
+
+
+def profile_stats(profiler, limit):
+    """Functions with the highest cumulative time of a profile."""
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    stats.sort_stats(pstats.SortKey.CUMULATIVE)
+    rows = []
+    for function in stats.fcn_list[:limit]:
+        primitive_calls, calls, total_time, cumulative_time, callers = stats.stats[function]
+        filename, line, name = function
+        rows.append(
+            {
+                "function": f"{filename}:{line}({name})",
+                "calls": calls,
+                "tottime_ms": round(total_time * 1000, 2),
+                "cumtime_ms": round(cumulative_time * 1000, 2),
+            }
+        )
+    return rows
+
+
+class QueryLog:
+    """Database execute wrapper keeping every statement with its duration."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                {
+                    "time_ms": round((time.perf_counter() - started) * 1000, 2),
+                    "sql": sql,
+                    "params": [str(param) for param in params or []] if not many else [],
+                }
+            )
+
+
+def save_profile(profiler, view_name):
+    directory = getattr(settings, "PROFILE_DIR", os.path.join(settings.BASE_DIR, "profiles"))
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{view_name}-{datetime.now():%Y%m%d-%H%M%S-%f}.prof")
+    profiler.dump_stats(path)
+    return path
+
+
+class ProfilingMixin:
+    """
+    Run the view under cProfile when a superuser passes ``profile``.
+
+    ``profile=1`` returns {"data": <normal response>, "profile": ...},
+    ``profile=only`` only the profile. ``profile_save=1`` also writes the
+    stats to PROFILE_DIR for pstats, ``profile_limit`` sets how many
+    functions are listed. Rendering the response is not included.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        mode = request.query_params.get(PROFILE_PARAM)
+        if mode in ("1", "true", "only") and request.user.is_superuser:
+            method = request.method.lower()
+            handler = getattr(self, method, None)
+            if handler:
+                # dispatch() looks the handler up after initial()
+                setattr(self, method, self.profiled(handler, mode))
+
+    def profiled(self, handler, mode):
+        def run(request, *args, **kwargs):
+            profiler = cProfile.Profile()
+            query_log = QueryLog()
+            with connection.execute_wrapper(query_log):
+                started = time.perf_counter()
+                response = profiler.runcall(handler, request, *args, **kwargs)
+                seconds = time.perf_counter() - started
+
+            try:
+                limit = int(request.query_params.get("profile_limit", PROFILE_LIMIT))
+            except ValueError:
+                limit = PROFILE_LIMIT
+            sql_ms = sum(query["time_ms"] for query in query_log.queries)
+            profile = {
+                "wall_ms": round(seconds * 1000, 2),
+                "sql_ms": round(sql_ms, 2),
+                "python_ms": round(seconds * 1000 - sql_ms, 2),
+                "query_count": len(query_log.queries),
+                "queries": sorted(query_log.queries, key=lambda query: -query["time_ms"]),
+                "functions": profile_stats(profiler, limit),
+            }
+            if request.query_params.get("profile_save") in ("1", "true"):
+                profile["file"] = save_profile(profiler, self.__class__.__name__)
+
+            if mode == "only" or not isinstance(response, Response):
+                return Response({"status": response.status_code, "profile": profile})
+            return Response(
+                {"data": response.data, "profile": profile}, status=response.status_code
+            )
+
+        return run
@@ -22,10 +22,11 @@ class IncomingFundReportSerializer(serializers.ModelSerializer):
         return instance.booking.customer.name
 
     def get_plot(self, instance):
-        plot = instance.booking.plot
-        return (
+        plots = instance.booking.plots.all()
+        return [
             f"{plot.plot_number} || {plot.get_type_display()} || {plot.get_plot_size()}"
-        )
+            for plot in plots
+        ]
 
     class Meta:
         model = IncomingFund
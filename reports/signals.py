@@ -0,0 +1,102 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from customer.models import Customers
+from plots.models import Plots
+from booking.models import Booking, PlotResale, Token
+from payments.models import (
+    Bank,
+    BankDeposit,
+    BankTransaction,
+    BankTransfer,
+    ChequeClearance,
+    DealerPayments,
+    IncomingFund,
+    JournalEntry,
+    JournalVoucher,
+    OutgoingFund,
+)
+from projects.models import ProjectDataVersion
+from .checkpoints import CHECKPOINT_TRACKED, checkpoint_changes, invalidate_checkpoints
+
+# Models whose changes make the cached dashboards and reports of their
+# project stale, bulk writes of BankTransaction bump it in its queryset
+TRACKED_MODELS = [
+    Customers,
+    Plots,
+    Booking,
+    Token,
+    PlotResale,
+    IncomingFund,
+    OutgoingFund,
+    JournalVoucher,
+    JournalEntry,
+    BankTransaction,
+    BankDeposit,
+    BankTransfer,
+    ChequeClearance,
+    DealerPayments,
+    Bank,
+]
+
+
+def invalidate_project_data(project_id):
+    """Bump the data version of a project once the current transaction commits."""
+    ProjectDataVersion.bump_on_commit(project_id)
+
+
+def invalidate_instance_project(sender, instance, **kwargs):
+    project_id = getattr(instance, "project_id", None)
+    # Resales only reach their project through the booking
+    if project_id is None and getattr(instance, "booking_id", None):
+        project_id = (
+            Booking.objects.filter(pk=instance.booking_id)
+            .values_list("project_id", flat=True)
+            .first()
+        )
+    invalidate_project_data(project_id)
+
+
+for model in TRACKED_MODELS:
+    post_save.connect(
+        invalidate_instance_project,
+        sender=model,
+        dispatch_uid=f"reports_invalidate_{model._meta.label_lower}_save",
+    )
+    post_delete.connect(
+        invalidate_instance_project,
+        sender=model,
+        dispatch_uid=f"reports_invalidate_{model._meta.label_lower}_delete",
+    )
+
+
+def remember_checkpoint_changes(sender, instance, **kwargs):
+    instance._checkpoint_changes = (
+        checkpoint_changes(sender, instance.pk) if instance.pk else set()
+    )
+
+
+def invalidate_saved_checkpoints(sender, instance, **kwargs):
+    changes = getattr(instance, "_checkpoint_changes", set())
+    invalidate_checkpoints(changes | checkpoint_changes(sender, instance.pk))
+    instance._checkpoint_changes = set()
+
+
+def invalidate_deleted_checkpoints(sender, instance, **kwargs):
+    invalidate_checkpoints(checkpoint_changes(sender, instance.pk))
+
+
+for model in CHECKPOINT_TRACKED:
+    pre_save.connect(
+        remember_checkpoint_changes,
+        sender=model,
+        dispatch_uid=f"reports_checkpoints_{model._meta.label_lower}_pre_save",
+    )
+    post_save.connect(
+        invalidate_saved_checkpoints,
+        sender=model,
+        dispatch_uid=f"reports_checkpoints_{model._meta.label_lower}_save",
+    )
+    pre_delete.connect(
+        invalidate_deleted_checkpoints,
+        sender=model,
+        dispatch_uid=f"reports_checkpoints_{model._meta.label_lower}_delete",
+    )
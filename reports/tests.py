@@ -1,3 +1,157 @@
+import io
+from datetime import date
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
 from django.test import TestCase
+from rest_framework.test import APIClient
+from booking.models import Booking
+from customer.models import Customers
+from payments.models import IncomingFund
+from projects.models import Projects
+from Zeeland.testing import QueryBudgetTestCase
+from .cache import reset_stats
+from .checkpoints import get_opening_balance, ledger_version, save_checkpoint
+from .models import LedgerCheckpoint
 
-# Create your tests here.
+
+class ReportsQueryBudgetTests(QueryBudgetTestCase):
+    # Budgets of the cached reports include the data version lookup and,
+    # for the ledgers of a single record, the lookup of its project. The
+    # party ledgers also store their opening balance checkpoint, guarded
+    # by the ledger version
+    def ledger_params(self, project):
+        booking = (
+            Booking.objects.filter(project=project, dealer__isnull=False)
+            .order_by("-total_receiving_amount")
+            .first()
+        )
+        people = Customers.objects.filter(project=project)
+        return {
+            "customer_id": booking.customer_id,
+            "dealer_id": booking.dealer_id,
+            "plot_id": booking.plots.first().id,
+            "vendor_id": people.filter(reference="vendor").first().id,
+            "employee_id": people.filter(reference="employee").first().id,
+        }
+
+    def test_fund_reports(self):
+        self.assertQueryBudget(3, "incoming-fund-report/")
+        self.assertQueryBudget(2, "outgoing-fund-report/")
+        self.assertQueryBudget(2, "journal-voucher-report/")
+
+    def test_payment_reports(self):
+        self.assertQueryBudget(5, "incoming-payment-report/")
+        self.assertQueryBudget(4, "outgoing-payment-report/")
+
+    def test_cheque_reports(self):
+        self.assertQueryBudget(4, "incoming-cheque-report/")
+        self.assertQueryBudget(3, "outgoing-cheque-report/")
+
+    def test_dashboard(self):
+        self.assertQueryBudget(2, "dashboard-counts/")
+        self.assertQueryBudget(2, "dashboard-amounts/")
+        self.assertQueryBudget(2, "dashboard-summary/")
+        self.assertQueryBudget(7, "monthly-incoming-fund/")
+        self.assertQueryBudget(7, "annual-incoming-fund/")
+        self.assertQueryBudget(
+            4, "time-series/", lambda project: {"source": "incoming", "granularity": "month"}
+        )
+
+    def test_time_series_invalid_bank_id(self):
+        response = self.client.get(
+            "/api/time-series/",
+            {
+                **self.project_params(self.large),
+                "source": "account",
+                "granularity": "month",
+                "bank_id": "abc",
+            },
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_ledgers(self):
+        self.assertQueryBudget(20, "dealer-ledger/", self.ledger_params)
+        self.assertQueryBudget(27, "customer-ledger/", self.ledger_params)
+        self.assertQueryBudget(17, "vendor-ledger/", self.ledger_params)
+        self.assertQueryBudget(17, "employee-ledger/", self.ledger_params)
+        self.assertQueryBudget(10, "plot-ledger/", self.ledger_params)
+
+    def test_financial_statements(self):
+        self.assertQueryBudget(3, "balance-report/")
+        self.assertQueryBudget(3, "profit-report/")
+
+
+class ReportCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("cache", "cache@example.com", "cache")
+        call_command("generate_dataset", scale=0.03, months=3, seed=4, stdout=io.StringIO())
+        cls.project = Projects.objects.get()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for cache in caches.all():
+            cache.clear()
+        reset_stats()
+
+    def get_report(self, **params):
+        response = self.client.get(
+            "/api/incoming-payment-report/", {"project_id": self.project.id, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cached_until_project_data_changes(self):
+        first = self.get_report()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_report(), first)
+        # Parameter order and empty parameters share the entry
+        with self.assertNumQueries(1):
+            self.client.get(f"/api/incoming-payment-report/?start_date=&project_id={self.project.id}")
+
+        fund = IncomingFund.objects.filter(project=self.project).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            fund.amount += 1000
+            fund.save()
+        self.assertNotEqual(self.get_report(), first)
+
+        stats = self.client.get("/api/cache-stats/").json()
+        self.assertEqual(stats["reports"]["IncomingPaymentsReport"]["hits"], 2)
+        self.assertEqual(stats["reports"]["IncomingPaymentsReport"]["misses"], 2)
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_requests_without_project_are_not_cached(self):
+        self.client.get("/api/incoming-fund-report/")
+        stats = self.client.get("/api/cache-stats/").json()
+        self.assertEqual(stats["reports"]["IncomingFundReportView"]["bypassed"], 1)
+
+
+class LedgerCheckpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command("generate_dataset", scale=0.03, months=4, seed=7, stdout=io.StringIO())
+        cls.fund = IncomingFund.objects.filter(reference="payment").order_by("date").first()
+        cls.customer_id = cls.fund.booking.customer_id
+        cls.period = date.today().replace(day=1)
+
+    def test_checkpoint_is_stored_when_read(self):
+        balance = get_opening_balance("customer", self.customer_id, self.period)
+        checkpoint = LedgerCheckpoint.objects.get(party_type="customer", party_id=self.customer_id)
+        self.assertEqual((checkpoint.period, checkpoint.balance), (self.period, balance))
+
+    def test_checkpoint_computed_before_a_change_is_not_stored(self):
+        version = ledger_version("customer", self.customer_id)
+        balance = get_opening_balance("customer", self.customer_id, self.period)
+        LedgerCheckpoint.objects.all().delete()
+
+        # A backdated change commits while the stale balance is computed
+        self.fund.amount += 1000
+        self.fund.save()
+        save_checkpoint("customer", self.customer_id, self.period, balance, version)
+        self.assertFalse(LedgerCheckpoint.objects.exists())
+
+        self.assertEqual(
+            get_opening_balance("customer", self.customer_id, self.period), balance - 1000
+        )
@@ -0,0 +1,130 @@
+from datetime import date, timedelta
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import (
+    TruncDay,
+    TruncWeek,
+    TruncMonth,
+    TruncQuarter,
+    TruncYear,
+)
+from booking.models import Booking, Token
+from payments.models import IncomingFund, OutgoingFund, BankTransaction, AccountDailyBalance
+from projects.models import ProjectDataVersion
+
+GRANULARITIES = {
+    "day": (TruncDay, relativedelta(days=1)),
+    "week": (TruncWeek, relativedelta(weeks=1)),
+    "month": (TruncMonth, relativedelta(months=1)),
+    "quarter": (TruncQuarter, relativedelta(months=3)),
+    "year": (TruncYear, relativedelta(years=1)),
+}
+
+# source: (model, date field, amount expression); accounts are summed from
+# the daily balance rollup and counted from the transactions themselves
+SOURCES = {
+    "incoming": (IncomingFund, "date", F("amount")),
+    "outgoing": (OutgoingFund, "date", F("amount")),
+    "bookings": (Booking, "booking_date", F("total_amount")),
+    "tokens": (Token, "date", F("amount")),
+    "account": (AccountDailyBalance, "date", F("deposit") - F("payment")),
+}
+METRICS = ("amount", "count")
+MAX_BUCKETS = 5000
+
+
+def bucket_start(value, granularity):
+    """First day of the bucket ``value`` falls in, matching the SQL Trunc functions."""
+    if granularity == "week":
+        return value - timedelta(days=value.weekday())
+    if granularity == "month":
+        return value.replace(day=1)
+    if granularity == "quarter":
+        return value.replace(month=(value.month - 1) // 3 * 3 + 1, day=1)
+    if granularity == "year":
+        return value.replace(month=1, day=1)
+    return value
+
+
+def bucket_range(start_date, end_date, granularity):
+    step = GRANULARITIES[granularity][1]
+    current = bucket_start(start_date, granularity)
+    while current <= end_date:
+        yield current
+        current += step
+
+
+def _source_queryset(source, project_id, metric, bank_id=None):
+    model, date_field, amount = SOURCES[source]
+    if source == "account" and metric == "count":
+        model, date_field = BankTransaction, "transaction_date"
+    queryset = model.objects.filter(project_id=project_id)
+    if source == "account":
+        queryset = queryset.filter(bank_id=bank_id)
+    value = Count("pk") if metric == "count" else Sum(amount, output_field=FloatField())
+    return queryset, date_field, value
+
+
+def query_buckets(source, project_id, start_date, end_date, granularity, metric="amount", bank_id=None):
+    """{bucket_start: total} grouped in SQL for dates between start and end (inclusive)."""
+    if start_date > end_date:
+        return {}
+    queryset, date_field, value = _source_queryset(source, project_id, metric, bank_id)
+    trunc = GRANULARITIES[granularity][0]
+    rows = (
+        queryset.filter(**{f"{date_field}__gte": start_date, f"{date_field}__lte": end_date})
+        .annotate(bucket=trunc(date_field))
+        .values("bucket")
+        .annotate(total=value)
+        .order_by()
+    )
+    return {row["bucket"]: row["total"] or 0 for row in rows}
+
+
+def get_time_series(
+    source,
+    project_id,
+    start_date,
+    end_date,
+    granularity="day",
+    metric="amount",
+    bank_id=None,
+    today=None,
+):
+    """
+    List of (bucket_start, total) covering every bucket between start_date
+    and end_date, empty buckets included.
+
+    Buckets that ended before the current one are cached per project data
+    version, so repeated calls only query the current and later buckets.
+    """
+    today = today or date.today()
+    current_bucket = bucket_start(today, granularity)
+
+    totals = {}
+    past_end = min(end_date, current_bucket - timedelta(days=1))
+    if start_date <= past_end:
+        version = ProjectDataVersion.get_version(project_id)
+        key = (
+            f"time-series:{source}:{metric}:{project_id}:{bank_id}:{granularity}:"
+            f"{start_date.isoformat()}:{past_end.isoformat()}:{version}"
+        )
+        past = cache.get(key)
+        if past is None:
+            past = query_buckets(
+                source, project_id, start_date, past_end, granularity, metric, bank_id
+            )
+            cache.set(key, past, getattr(settings, "DASHBOARD_CACHE_TIMEOUT", 3600))
+        totals.update(past)
+
+    live_start = max(start_date, current_bucket)
+    totals.update(
+        query_buckets(source, project_id, live_start, end_date, granularity, metric, bank_id)
+    )
+
+    return [
+        (bucket, totals.get(bucket, 0))
+        for bucket in bucket_range(start_date, end_date, granularity)
+    ]
@@ -1,12 +1,15 @@
 from django.urls import path
+from .cache import ReportCacheStatsView
 from .views import (
     IncomingFundReportView,
     OutgoingFundReportView,
     JournalVoucherReportView,
     TotalCountView,
     TotalAmountView,
+    DashboardSummaryView,
     MonthlyIncomingFundGraphView,
     AnnualIncomingFundGraphView,
+    TimeSeriesView,
     DealerLedgerView,
     CustomerLedgerView,
     PlotLedgerView,
@@ -30,8 +33,10 @@ urlpatterns = [
     path("journal-voucher-report/", JournalVoucherReportView.as_view()),
     path("dashboard-counts/", TotalCountView.as_view()),
     path("dashboard-amounts/", TotalAmountView.as_view()),
+    path("dashboard-summary/", DashboardSummaryView.as_view()),
     path("monthly-incoming-fund/", MonthlyIncomingFundGraphView.as_view()),
     path("annual-incoming-fund/", AnnualIncomingFundGraphView.as_view()),
+    path("time-series/", TimeSeriesView.as_view()),
     path("dealer-ledger/", DealerLedgerView.as_view()),
     path("customer-ledger/", CustomerLedgerView.as_view()),
     path("vendor-ledger/", VendorLedgerView.as_view()),
@@ -39,4 +44,5 @@ urlpatterns = [
     path("plot-ledger/", PlotLedgerView.as_view()),
     path("balance-report/", BalanceSheetView.as_view()),
     path("profit-report/", ProfitReportView.as_view()),
+    path("cache-stats/", ReportCacheStatsView.as_view(), name="report_cache_stats"),
 ]
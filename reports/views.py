@@ -7,13 +7,14 @@ from payments.models import (
     JournalVoucher,
     BankTransaction,
     DealerPayments,
+    BankDeposit,
     BankDepositTransactions,
     JournalEntryLine,
 )
 from customer.models import Customers, CustomerMessages, Dealers
 from plots.models import Plots
 from payments.models import PaymentReminder,PaymentReminderDocuments
-from booking.models import Booking, Token, PlotResale
+from booking.models import Booking, BookingFinancials, Token, PlotResale
 from .serializers import (
     IncomingFundReportSerializer,
     OutgoingFundReportSerializer,
@@ -38,10 +39,13 @@ from django.db.models import (
     FloatField,
     Case,
     When,
+    OuterRef,
+    Subquery,
+    Exists,
 )
 from django.db.models.functions import Coalesce, Abs
 from rest_framework.exceptions import ValidationError
-from itertools import groupby
+from itertools import groupby, islice
 from operator import itemgetter
 
 from datetime import date, datetime, timedelta
@@ -50,16 +54,25 @@ import calendar
 # views.py
 
 from payments.models import Bank
+from payments.balances import get_account_tree
+from .ledger import LedgerSource, OpeningSource, build_ledger, sum_sources
+from .checkpoints import get_opening_balance
+from .dashboard import get_dashboard_summary, COUNT_FIELDS, AMOUNT_FIELDS
+from .timeseries import get_time_series, bucket_range, GRANULARITIES, SOURCES, METRICS, MAX_BUCKETS
+from .profiling import ProfilingMixin
+from .cache import ReportCacheMixin
 from payments.serializers import BankSerializer
 from collections import defaultdict
 
 
-class IncomingFundReportView(generics.ListAPIView):
+class IncomingFundReportView(ReportCacheMixin, ProfilingMixin, generics.ListAPIView):
     serializer_class = IncomingFundReportSerializer
 
     def get_queryset(self):
-        queryset = IncomingFund.objects.all().select_related(
-            "booking__customer", "booking__plot"
+        queryset = (
+            IncomingFund.objects.all()
+            .select_related("booking__customer")
+            .prefetch_related("booking__plots")
         )
         project_id = self.request.query_params.get("project_id")
         booking_id = self.request.query_params.get("booking_id")
@@ -78,11 +91,11 @@ class IncomingFundReportView(generics.ListAPIView):
         return queryset
 
 
-class OutgoingFundReportView(generics.ListAPIView):
+class OutgoingFundReportView(ReportCacheMixin, ProfilingMixin, generics.ListAPIView):
     serializer_class = OutgoingFundReportSerializer
 
     def get_queryset(self):
-        queryset = OutgoingFund.objects.all()
+        queryset = OutgoingFund.objects.all().select_related("bank", "payee")
         project_id = self.request.query_params.get("project_id")
         expense_type = self.request.query_params.get("expense_type")
         start_date = self.request.query_params.get("start_date")
@@ -100,7 +113,7 @@ class OutgoingFundReportView(generics.ListAPIView):
         return queryset
 
 
-class JournalVoucherReportView(generics.ListAPIView):
+class JournalVoucherReportView(ReportCacheMixin, ProfilingMixin, generics.ListAPIView):
     serializer_class = JournalVoucherReportSerializer
 
     def get_queryset(self):
@@ -122,231 +135,146 @@ class JournalVoucherReportView(generics.ListAPIView):
         return queryset
 
 
-class TotalCountView(APIView):
+class TotalCountView(ProfilingMixin, APIView):
     def get(self, request):
         project_id = request.GET.get("project_id")
-        today = date.today()
-        customer_count = Customers.objects.filter(project_id=project_id).count()
-        active_plots_count = Plots.objects.filter(
-            project_id=project_id, status="active"
-        ).count()
-        sold_plots_count = Plots.objects.filter(
-            project_id=project_id, status="sold"
-        ).count()
-        resale_plots_count = (
-            Plots.objects.filter(project_id=project_id)
-            .annotate(booking_count=Count("booking"))
-            .filter(booking_count__gt=1)
-            .count()
-        )
-        booking_count = Booking.objects.filter(project_id=project_id).count()
-        non_expired_tokens_count = Token.objects.filter(
-            project_id=project_id, expire_date__gte=today
-        ).count()
-
-        data = {
-            "customer_count": customer_count,
-            "active_plots_count": active_plots_count,
-            "sold_plots_count": sold_plots_count,
-            "resale_plots_count": resale_plots_count,
-            "booking_count": booking_count,
-            "non_expired_tokens_count": non_expired_tokens_count,
-        }
+        summary = get_dashboard_summary(project_id)
+        data = {field: summary[field] for field in COUNT_FIELDS}
 
         return Response(data)
 
 
-class TotalAmountView(APIView):
+class TotalAmountView(ProfilingMixin, APIView):
     def get(self, request):
-        start_date = request.GET.get("start_date")
-        end_date = request.GET.get("end_date")
         project_id = request.GET.get("project_id")
+        summary = get_dashboard_summary(project_id)
+        response_data = {field: summary[field] for field in AMOUNT_FIELDS}
 
-        # Calculate total incoming amount
-        incoming_amount = IncomingFund.objects.filter(project=project_id).aggregate(
-            total_amount=Sum("amount")
-        )["total_amount"]
-
-        # Calculate total outgoing amount
-        outgoing_amount = OutgoingFund.objects.filter(project=project_id).aggregate(
-            total_amount=Sum("amount")
-        )["total_amount"]
-
-        # Calculate total journal voucher amount
-        journal_voucher_in_amount = JournalVoucher.objects.filter(
-            project=project_id, type="in"
-        ).aggregate(total_amount=Sum("amount"))["total_amount"]
+        return Response(response_data)
 
-        journal_voucher_out_amount = JournalVoucher.objects.filter(
-            project=project_id, type="out"
-        ).aggregate(total_amount=Sum("amount"))["total_amount"]
 
-        # Prepare response
-        response_data = {
-            "incoming_amount": incoming_amount or 0,
-            "outgoing_amount": outgoing_amount or 0,
-            "journal_voucher_in_amount": journal_voucher_in_amount or 0,
-            "journal_voucher_out_amount": journal_voucher_out_amount or 0,
-        }
+class DashboardSummaryView(ProfilingMixin, APIView):
+    def get(self, request):
+        project_id = request.GET.get("project_id")
+        return Response(get_dashboard_summary(project_id))
 
-        return Response(response_data)
 
+class TimeSeriesView(ReportCacheMixin, ProfilingMixin, APIView):
+    """
+    Totals of a source grouped into day, week, month, quarter or year buckets
+    between start_date and end_date, e.g.
+    ?project_id=1&source=incoming&granularity=month&start_date=2024-01-01&end_date=2024-12-31
+    The account source needs a bank_id, metric=count counts rows instead of
+    summing amounts.
+    """
 
-class MonthlyIncomingFundGraphView(APIView):
     def get(self, request):
         project_id = request.GET.get("project_id")
-        current_date = datetime.now().date()
-        start_date = current_date.replace(day=1)
-        end_date = start_date + timedelta(days=32)
-        end_date = end_date.replace(day=1)
+        source = request.GET.get("source", "incoming")
+        granularity = request.GET.get("granularity", "day")
+        metric = request.GET.get("metric", "amount")
+        bank_id = request.GET.get("bank_id")
+        start_date = request.GET.get("start_date")
+        end_date = request.GET.get("end_date")
 
-        incoming_funds_by_day = (
-            IncomingFund.objects.filter(
-                date__gte=start_date, date__lt=end_date, project=project_id
+        if not project_id or not start_date or not end_date:
+            return Response(
+                {"error": "project_id, start_date and end_date are required"},
+                status=400,
             )
-            .annotate(day=functions.TruncDay("date"))
-            .values("day")
-            .annotate(total_amount=Sum("amount"))
-            .order_by("day")
-        )
-
-        outgoing_funds_by_day = (
-            OutgoingFund.objects.filter(
-                date__gte=start_date, date__lt=end_date, project=project_id
+        if source not in SOURCES:
+            return Response(
+                {"error": f"source must be one of {', '.join(SOURCES)}"}, status=400
+            )
+        if granularity not in GRANULARITIES:
+            return Response(
+                {"error": f"granularity must be one of {', '.join(GRANULARITIES)}"},
+                status=400,
+            )
+        if metric not in METRICS:
+            return Response(
+                {"error": f"metric must be one of {', '.join(METRICS)}"}, status=400
+            )
+        if source == "account" and not bank_id:
+            return Response({"error": "bank_id is required for account"}, status=400)
+        if bank_id and not bank_id.isdigit():
+            return Response({"error": "bank_id must be an integer"}, status=400)
+        try:
+            start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+            end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
+        except ValueError:
+            return Response(
+                {"error": "Invalid date format. Use YYYY-MM-DD."}, status=400
+            )
+        if start_date > end_date:
+            return Response(
+                {"error": "start_date must be before end_date"}, status=400
+            )
+        buckets = bucket_range(start_date, end_date, granularity)
+        if len(list(islice(buckets, MAX_BUCKETS + 1))) > MAX_BUCKETS:
+            return Response(
+                {"error": f"The range has more than {MAX_BUCKETS} buckets"}, status=400
             )
-            .annotate(day=functions.TruncDay("date"))
-            .values("day")
-            .annotate(total_amount=Sum("amount"))
-            .order_by("day")
-        )
-
-        incoming_report_data = [
-            {
-                "day": fund["day"].strftime("%Y-%m-%d"),
-                "total_amount": fund["total_amount"] or 0,
-            }
-            for fund in incoming_funds_by_day
-        ]
 
-        outgoing_report_data = [
+        series = get_time_series(
+            source,
+            project_id,
+            start_date,
+            end_date,
+            granularity=granularity,
+            metric=metric,
+            bank_id=bank_id,
+        )
+        return Response(
             {
-                "day": fund["day"].strftime("%Y-%m-%d"),
-                "total_amount": fund["total_amount"] or 0,
+                "source": source,
+                "granularity": granularity,
+                "metric": metric,
+                "start_date": start_date,
+                "end_date": end_date,
+                "series": [
+                    {"period": period.strftime("%Y-%m-%d"), "total": total}
+                    for period, total in series
+                ],
             }
-            for fund in outgoing_funds_by_day
-        ]
-
-        current_day = start_date
-        while current_day < end_date:
-            current_day_str = current_day.strftime("%Y-%m-%d")
-
-            if not any(d["day"] == current_day_str for d in incoming_report_data):
-                incoming_report_data.append({"day": current_day_str, "total_amount": 0})
-
-            if not any(d["day"] == current_day_str for d in outgoing_report_data):
-                outgoing_report_data.append({"day": current_day_str, "total_amount": 0})
-
-            current_day += timedelta(days=1)
-
-        sorted_incoming_report_data = sorted(
-            incoming_report_data, key=lambda x: x["day"]
-        )
-        sorted_outgoing_report_data = sorted(
-            outgoing_report_data, key=lambda x: x["day"]
         )
 
-        result = {
-            "incoming_funds": sorted_incoming_report_data,
-            "outgoing_funds": sorted_outgoing_report_data,
-        }
+
+class MonthlyIncomingFundGraphView(ReportCacheMixin, ProfilingMixin, APIView):
+    def get(self, request):
+        project_id = request.GET.get("project_id")
+        current_date = datetime.now().date()
+        start_date = current_date.replace(day=1)
+        end_date = (start_date + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+        result = {}
+        for key, source in (("incoming_funds", "incoming"), ("outgoing_funds", "outgoing")):
+            result[key] = [
+                {"day": day.strftime("%Y-%m-%d"), "total_amount": total}
+                for day, total in get_time_series(
+                    source, project_id, start_date, end_date, granularity="day"
+                )
+            ]
 
         return Response(result)
 
 
-class AnnualIncomingFundGraphView(APIView):
+class AnnualIncomingFundGraphView(ReportCacheMixin, ProfilingMixin, APIView):
     def get(self, request):
         project_id = request.GET.get("project_id")
         current_year = datetime.now().year
-        start_date = datetime(current_year, 1, 1)
-        end_date = datetime(current_year + 1, 1, 1)
-
-        incoming_funds_by_month = (
-            IncomingFund.objects.filter(
-                date__gte=start_date, date__lt=end_date, project=project_id
-            )
-            .annotate(month=functions.TruncMonth("date"))
-            .values("month")
-            .annotate(total_amount=Sum("amount"))
-            .order_by("month")
-        )
-
-        outgoing_funds_by_month = (
-            OutgoingFund.objects.filter(
-                date__gte=start_date, date__lt=end_date, project=project_id
-            )
-            .annotate(month=functions.TruncMonth("date"))
-            .values("month")
-            .annotate(total_amount=Sum("amount"))
-            .order_by("month")
-        )
-
-        incoming_report_data = [
-            {
-                "month": fund["month"].strftime("%Y-%m"),
-                "total_amount": fund["total_amount"] or 0,
-            }
-            for fund in incoming_funds_by_month
-        ]
-
-        outgoing_report_data = [
-            {
-                "month": fund["month"].strftime("%Y-%m"),
-                "total_amount": fund["total_amount"] or 0,
-            }
-            for fund in outgoing_funds_by_month
-        ]
-
-        for month in range(1, 13):
-            current_month_str = datetime(current_year, month, 1).strftime("%Y-%m")
-
-            if not any(d["month"] == current_month_str for d in incoming_report_data):
-                incoming_report_data.append(
-                    {"month": current_month_str, "total_amount": 0}
-                )
-
-            if not any(d["month"] == current_month_str for d in outgoing_report_data):
-                outgoing_report_data.append(
-                    {"month": current_month_str, "total_amount": 0}
-                )
-
-        sorted_incoming_report_data = sorted(
-            incoming_report_data, key=lambda x: x["month"]
-        )
-        sorted_outgoing_report_data = sorted(
-            outgoing_report_data, key=lambda x: x["month"]
-        )
+        start_date = date(current_year, 1, 1)
+        end_date = date(current_year, 12, 31)
 
-        result = {
-            "incoming_funds": sorted_incoming_report_data,
-            "outgoing_funds": sorted_outgoing_report_data,
-        }
         # Return the result with month names
-        result_with_month_names = {
-            "incoming_funds": [
-                {
-                    "month": calendar.month_abbr[int(data["month"].split("-")[1])],
-                    "total_amount": data["total_amount"],
-                }
-                for data in sorted_incoming_report_data
-            ],
-            "outgoing_funds": [
-                {
-                    "month": calendar.month_abbr[int(data["month"].split("-")[1])],
-                    "total_amount": data["total_amount"],
-                }
-                for data in sorted_outgoing_report_data
-            ],
-        }
+        result_with_month_names = {}
+        for key, source in (("incoming_funds", "incoming"), ("outgoing_funds", "outgoing")):
+            result_with_month_names[key] = [
+                {"month": calendar.month_abbr[month.month], "total_amount": total}
+                for month, total in get_time_series(
+                    source, project_id, start_date, end_date, granularity="month"
+                )
+            ]
 
         return Response(result_with_month_names)
 
@@ -354,7 +282,18 @@ class AnnualIncomingFundGraphView(APIView):
 # new reports
 
 
-class DealerLedgerView(APIView):
+class DealerLedgerView(ReportCacheMixin, ProfilingMixin, APIView):
+    ledger_columns = [
+        "id",
+        "remarks",
+        "document",
+        "credit",
+        "debit",
+        "date",
+        "dealer_name",
+        "reference",
+    ]
+
     def get(self, request):
         project_id = request.query_params.get("project_id")
         dealer_id = request.query_params.get("dealer_id")
@@ -382,6 +321,13 @@ class DealerLedgerView(APIView):
             )
             payment_query_filters &= Q(date__gte=start_date) & Q(date__lte=end_date)
 
+        signed_payment = Case(
+            When(reference="payment", then=F("amount")),
+            When(reference="refund", then=-F("amount")),
+            default=Value(0),
+            output_field=FloatField(),
+        )
+
         try:
             bookings = Booking.objects.filter(dealer_id=dealer_id).values(
                 "id",
@@ -389,29 +335,24 @@ class DealerLedgerView(APIView):
                 document=F("booking_id"),
             )
 
-            booking_data = (
-                Booking.objects.filter(booking_query_filters)
-                .select_related("dealer")
-                .values(
-                    "id",
-                    "remarks",
-                    document=F("booking_id"),
-                    credit=F("dealer_comission_amount"),
+            sources = [
+                LedgerSource(
+                    Booking.objects.filter(booking_query_filters),
+                    id="id",
+                    remarks="remarks",
+                    document="booking_id",
+                    credit="dealer_comission_amount",
                     debit=Value(0.0),
-                    date=F("booking_date"),
-                    dealer_name=F("dealer__name"),
-                    reference=Value("booking", output_field=CharField()),
-                )
-            )
-
-            payment_data = (
-                DealerPayments.objects.filter(payment_query_filters)
-                .select_related("booking__dealer")
-                .values(
-                    "id",
-                    "date",
-                    "remarks",
-                    "reference",
+                    date="booking_date",
+                    dealer_name="dealer__name",
+                    reference=Value("booking"),
+                ),
+                LedgerSource(
+                    DealerPayments.objects.filter(payment_query_filters),
+                    id="id",
+                    date="date",
+                    remarks="remarks",
+                    reference="reference",
                     credit=Case(
                         When(reference="refund", then=F("amount")),
                         default=Value(0),
@@ -422,85 +363,41 @@ class DealerLedgerView(APIView):
                         default=Value(0),
                         output_field=FloatField(),
                     ),
-                    document=F("id"),
-                    dealer_name=F("booking__dealer__name"),
-                )
-            )
-
-            combined_data = sorted(
-                list(booking_data) + list(payment_data), key=lambda x: x["date"]
-            )
-
-            comission_amount = (
-                Booking.objects.filter(
-                    dealer_id=dealer_id, booking_date__lt=start_date
-                ).aggregate(
-                    total_amount=Coalesce(
-                        Sum("dealer_comission_amount"),
-                        Value(0, output_field=FloatField()),
-                    )
-                )[
-                    "total_amount"
-                ]
-                or 0.0
-            )
-
-            paid_amount = (
-                DealerPayments.objects.filter(
-                    booking__dealer_id=dealer_id, date__lt=start_date
-                ).aggregate(
-                    total_amount=Sum(
-                        Case(
-                            When(reference="payment", then=F("amount")),
-                            When(reference="refund", then=-F("amount")),
-                            default=Value(0),
-                            output_field=FloatField(),
-                        )
-                    )
-                )[
-                    "total_amount"
-                ]
-                or 0.0
+                    document="id",
+                    dealer_name="booking__dealer__name",
+                ),
+            ]
+            opening_balance, combined_data, current_balance = build_ledger(
+                sources,
+                self.ledger_columns,
+                get_opening_balance("dealer", dealer_id, start_date),
             )
 
-            opening_balance = round((comission_amount - paid_amount), 2)
-            current_balance = opening_balance
-
-            for entry in combined_data:
-                current_balance += entry["credit"] - entry["debit"]
-                entry["balance"] = current_balance
-
             dealer_info = (
                 Customers.objects.filter(id=dealer_id)
                 .values("id", "name", "contact", "address")
                 .first()
             )
 
-            plot_query = Plots.objects.filter(booking__dealer=dealer_id)
+            plot_query = Plots.objects.filter(booking__dealer=dealer_id).select_related(
+                "block"
+            )
             plot_serializer = PlotsSerializer(plot_query, many=True)
 
-            total_amount = (
-                Booking.objects.filter(dealer_id=dealer_id).aggregate(
-                    total_amount=Coalesce(
-                        Sum("dealer_comission_amount"),
-                        Value(0, output_field=FloatField()),
-                    )
-                )["total_amount"]
-                or 0.0
+            totals = Booking.objects.filter(dealer_id=dealer_id).aggregate(
+                total_amount=Coalesce(
+                    Sum("dealer_comission_amount"),
+                    Value(0, output_field=FloatField()),
+                )
             )
-
-            paid_amount = (
-                DealerPayments.objects.filter(booking__dealer_id=dealer_id).aggregate(
-                    total_amount=Sum(
-                        Case(
-                            When(reference="payment", then=F("amount")),
-                            When(reference="refund", then=-F("amount")),
-                            default=Value(0),
-                            output_field=FloatField(),
-                        )
+            total_amount = totals["total_amount"] or 0.0
+            paid_amount = sum_sources(
+                [
+                    OpeningSource(
+                        DealerPayments.objects.filter(booking__dealer_id=dealer_id),
+                        signed_payment,
                     )
-                )["total_amount"]
-                or 0.0
+                ]
             )
 
             total_amount = round(total_amount, 2)
@@ -523,7 +420,21 @@ class DealerLedgerView(APIView):
             )
 
 
-class CustomerLedgerView(APIView):
+class CustomerLedgerView(ReportCacheMixin, ProfilingMixin, APIView):
+    ledger_columns = [
+        "id",
+        "date",
+        "remarks",
+        "reference",
+        "booking_id",
+        "credit",
+        "debit",
+        "document",
+        "customer_name",
+        "deposit_id",
+    ]
+    cache_owner = ("customer_id", Customers)
+
     def get(self, request):
         project_id = self.request.query_params.get("project_id")
         customer_id = self.request.query_params.get("customer_id")
@@ -540,13 +451,13 @@ class CustomerLedgerView(APIView):
             booking_query_filters &= Q(project_id=project_id)
             token_query_filters &= Q(project_id=project_id)
             payment_query_filters &= Q(project_id=project_id)
-            resale_query_filters &= Q(project_id=project_id)
+            resale_query_filters &= Q(booking__project_id=project_id)
 
         if plot_id:
-            booking_query_filters &= Q(plot_id=plot_id)
-            token_query_filters &= Q(plot_id=plot_id)
-            payment_query_filters &= Q(booking__plot_id=plot_id)
-            resale_query_filters &= Q(booking__plot_id=plot_id)
+            booking_query_filters &= Q(plots=plot_id)
+            token_query_filters &= Q(plot=plot_id)
+            payment_query_filters &= Q(booking__plots=plot_id)
+            resale_query_filters &= Q(booking__plots=plot_id)
 
         if start_date and end_date:
             booking_query_filters &= Q(booking_date__gte=start_date) & Q(
@@ -569,176 +480,118 @@ class CustomerLedgerView(APIView):
             .values("dealer_id", "dealer__name")
         )
 
-        booking_data = (
-            Booking.objects.filter(booking_query_filters, customer_id=customer_id)
-            .select_related("customer")
-            .values(
-                "id",
-                "remarks",
-                document=F("booking_id"),
-                credit=F("total_amount"),
-                debit=Value(0.0),
-                date=F("booking_date"),
-                customer_name=F("customer__name"),
-                reference=Value("booking", output_field=CharField()),
-            )
+        deposit_id = Subquery(
+            BankDeposit.objects.filter(
+                details__payment__related_id=OuterRef("id"),
+                details__payment__bank__detail_type="Undeposited_Funds",
+                details__payment__is_deposit=True,
+            ).values("id")[:1]
         )
-        expense_data = (
-            OutgoingFund.objects.filter(payee=customer_id)
-            .select_related("payee")
-            .values(
-                "id",
-                "date",
-                "remarks",
-                document=F("id"),
-                credit=F("amount"),
-                debit=Value(0.0),
-                customer_name=F("payee__name"),
-                reference=Value("Expenses", output_field=CharField()),
-            )
+        booking_queryset = Booking.objects.filter(
+            booking_query_filters, customer_id=customer_id
         )
-        bank_deposit_data = (
-            BankDepositTransactions.objects.filter(customer_id=customer_id)
-            .select_related("customer")
-            .values(
-                "id",
-                "remarks",
-                "date",
-                document=F("id"),
-                credit=F("amount"),
+        # Entries on the same date keep this order
+        sources = [
+            LedgerSource(
+                booking_queryset,
+                id="id",
+                remarks="remarks",
+                document="booking_id",
+                credit="total_amount",
                 debit=Value(0.0),
-                customer_name=F("customer__name"),
-                reference=Value("Deposits", output_field=CharField()),
-            )
-        )
-        payment_data_query = IncomingFund.objects.filter(
-            payment_query_filters, booking__customer_id=customer_id
-        ).select_related("booking__customer")
-        payment_data = PaymentDataSerializer(payment_data_query, many=True).data
-
-        # Query for normal tokens
-        normal_tokens = Token.objects.filter(
-                token_query_filters, customer_id=customer_id
-            ).select_related("customer").values(
-                "id",
-                "date",
-                "remarks",
-                debit=F("amount"),
+                date="booking_date",
+                customer_name="customer__name",
+                reference=Value("booking"),
+            ),
+            LedgerSource(
+                IncomingFund.objects.filter(
+                    payment_query_filters, booking__customer_id=customer_id
+                ),
+                id="id",
+                date="date",
+                remarks="remarks",
+                reference="reference",
+                booking_id="booking_id",
+                credit=Case(
+                    When(reference="refund", then=F("amount")),
+                    default=Value(0.0),
+                    output_field=FloatField(),
+                ),
+                debit=Case(
+                    When(reference__in=["payment", "Discount"], then=F("amount")),
+                    default=Value(0.0),
+                    output_field=FloatField(),
+                ),
+                document="document_number",
+                customer_name="booking__customer__name",
+                deposit_id=deposit_id,
+            ),
+            LedgerSource(
+                Token.objects.filter(token_query_filters, customer_id=customer_id),
+                id="id",
+                date="date",
+                remarks="remarks",
+                debit="amount",
                 credit=Value(0.0),
-                document=F("document_number"),
-                customer_name=F("customer__name"),
-                reference=Value("token", output_field=CharField()),
-            )
-
-        # Query for refunded tokens
-        refunded_tokens = Token.objects.filter(
-           token_query_filters, customer_id=customer_id,
-            status="refunded",
-        ).select_related("customer").values(
-            "id",
-            "refund_date",
-            "remarks",
-            debit=Value(0.0),
-            credit=F("amount"),
-            document=F("document_number"),
-            customer_name=F("customer__name"),
-            reference=Value("tokenRefund", output_field=CharField()),
-        )
-
-        # Combine the two querysets
-        token_data = normal_tokens.union(refunded_tokens)
-        resale_data = (
-            PlotResale.objects.filter(
-                resale_query_filters, booking__customer_id=customer_id
-            )
-            .select_related("customer")
-            .values(
-                "id",
-                "date",
-                "remarks",
+                document="document_number",
+                customer_name="customer__name",
+                reference=Value("token"),
+            ),
+            LedgerSource(
+                Token.objects.filter(
+                    token_query_filters, customer_id=customer_id, status="refunded"
+                ),
+                id="id",
+                date="refund_date",
+                remarks="remarks",
+                debit=Value(0.0),
+                credit="amount",
+                document="document_number",
+                customer_name="customer__name",
+                reference=Value("tokenRefund"),
+            ),
+            LedgerSource(
+                OutgoingFund.objects.filter(payee=customer_id),
+                id="id",
+                date="date",
+                remarks="remarks",
+                document="id",
+                credit="amount",
+                debit=Value(0.0),
+                customer_name="payee__name",
+                reference=Value("Expenses"),
+            ),
+            LedgerSource(
+                BankDepositTransactions.objects.filter(customer_id=customer_id),
+                id="id",
+                remarks="remarks",
+                date="date",
+                document="id",
+                credit="amount",
+                debit=Value(0.0),
+                customer_name="customer__name",
+                reference=Value("Deposits"),
+            ),
+            LedgerSource(
+                PlotResale.objects.filter(
+                    resale_query_filters, booking__customer_id=customer_id
+                ),
+                id="id",
+                date="date",
+                remarks="remarks",
                 credit=Value(0.0),
-                debit=F("booking__total_amount"),
-                document=F("id"),
-                customer_name=F("booking__customer__name"),
-                reference=Value("close booking", output_field=CharField()),
-            )
-        )
-        # resale_data_extra = (
-        #     PlotResale.objects.filter(
-        #         resale_query_filters, booking__customer_id=customer_id
-        #     )
-        #     .select_related("customer")
-        #     .values(
-        #         "id",
-        #         "date",
-        #         "remarks",
-        #         debit=Value(0.0),
-        #         credit=Value(0.0),
-        #         document=F("id"),
-        #         customer_name=F("booking__customer__name"),
-        #         reference=Value("close booking", output_field=CharField()),
-        #     )
-        # )
-        # Combine and sort by date
-        combined_data = sorted(
-            list(booking_data)
-            + list(payment_data)
-            + list(token_data)
-            + list(expense_data)
-            + list(bank_deposit_data)
-            + list(resale_data),
-            # + list(resale_data_extra),
-            key=lambda x: x["date"],
-        )
+                debit="booking__total_amount",
+                document="id",
+                customer_name="booking__customer__name",
+                reference=Value("close booking"),
+            ),
+        ]
 
-        booking_amount = (
-            Booking.objects.filter(
-                customer_id=customer_id, booking_date__lt=start_date
-            ).aggregate(
-                total_amount=Coalesce(
-                    Sum("total_amount"), Value(0, output_field=FloatField())
-                )
-            )[
-                "total_amount"
-            ]
-            or 0.0
-        )
-        paid_amount = (
-            IncomingFund.objects.filter(
-                booking__customer_id=customer_id, date__lt=start_date
-            ).aggregate(
-                total_amount=Sum(
-                    Case(
-                        When(reference="payment", then=F("amount")),
-                        When(reference="refund", then=-F("amount")),
-                        default=Value(0),
-                        output_field=FloatField(),
-                    )
-                )
-            )[
-                "total_amount"
-            ]
-            or 0.0
+        opening_balance, combined_data, current_balance = build_ledger(
+            sources,
+            self.ledger_columns,
+            get_opening_balance("customer", customer_id, start_date),
         )
-        token_amount = (
-            Token.objects.filter(
-                customer_id=customer_id, date__lt=start_date
-            ).aggregate(
-                total_amount=Coalesce(
-                    Sum("amount"), Value(0, output_field=FloatField())
-                )
-            )[
-                "total_amount"
-            ]
-            or 0.0
-        )
-
-        opening_balance = round(booking_amount - paid_amount - token_amount, 2)
-        current_balance = opening_balance
-
-        for entry in combined_data:
-            current_balance += entry["credit"] - entry["debit"]
-            entry["balance"] = current_balance
         # Fetch customer information
         customer_info = (
             Customers.objects.filter(id=customer_id)
@@ -775,42 +628,37 @@ class CustomerLedgerView(APIView):
             }
             for message in customer_messages
         ]
-        payment_reminder_data = []
-        for booking in booking_data:
-            payment_reminders = PaymentReminder.objects.filter(
-                booking_id=booking["id"]
-            )
-
-            for reminder in payment_reminders:
-                payment_reminder_files = PaymentReminderDocuments.objects.filter(
-                    reminder_id=reminder.id
-                )
-
-                payment_reminder_data.append(
+        payment_reminders = (
+            PaymentReminder.objects.filter(booking__in=booking_queryset.values("id"))
+            .prefetch_related("files")
+            .order_by("booking_id", "id")
+        )
+        payment_reminder_data = [
+            {
+                "id": reminder.id,
+                "user": reminder.user_id,
+                "booking": reminder.booking_id,
+                "date": reminder.reminder_date,
+                "created_at": reminder.created_at,
+                "updated_at": reminder.updated_at,
+                "remarks": reminder.remarks,
+                "parent_reminder_id": reminder.parent_reminder_id,
+                "worked_on": reminder.worked_on,
+                "files": [
                     {
-                        "id": reminder.id,
-                        "user": reminder.user_id,
-                        "booking": reminder.booking_id,
-                        "date": reminder.reminder_date,
-                        "created_at": reminder.created_at,
-                        "updated_at": reminder.updated_at,
-                        "remarks": reminder.remarks,
-                        "parent_reminder_id": reminder.parent_reminder_id,
-                        "worked_on": reminder.worked_on,
-                        "files": [
-                            {
-                                "id": file.id,
-                                "file": file.file.url,
-                                "description": file.description,
-                                "type": file.type,
-                                "created_at": file.created_at,
-                                "updated_at": file.updated_at,
-                                "reminder_id": file.reminder_id
-                            }
-                            for file in payment_reminder_files
-                        ],
+                        "id": file.id,
+                        "file": file.file.url,
+                        "description": file.description,
+                        "type": file.type,
+                        "created_at": file.created_at,
+                        "updated_at": file.updated_at,
+                        "reminder_id": file.reminder_id
                     }
-                )
+                    for file in reminder.files.all()
+                ],
+            }
+            for reminder in payment_reminders
+        ]
         booking_amount = (
             Booking.objects.filter(customer_id=customer_id).aggregate(
                 total_amount=Coalesce(
@@ -819,30 +667,27 @@ class CustomerLedgerView(APIView):
             )["total_amount"]
             or 0.0
         )
-        paid_amount = (
-            IncomingFund.objects.filter(booking__customer_id=customer_id).aggregate(
-                total_amount=Sum(
-                    Case(
-                        When(reference="payment", then=F("amount")),
-                        When(reference="refund", then=-F("amount")),
-                        default=Value(0),
-                        output_field=FloatField(),
-                    )
-                )
-            )["total_amount"]
-            or 0.0
-        )
-        token_amount = (
-            Token.objects.filter(customer_id=customer_id).exclude(status="refunded").aggregate(
-                total_amount=Coalesce(
-                    Sum("amount"), Value(0, output_field=FloatField())
-                )
-            )["total_amount"]
-            or 0.0
+        # Booked amount less payments and tokens that were not refunded
+        remaining_amount = sum_sources(
+            [
+                OpeningSource(
+                    Booking.objects.filter(customer_id=customer_id), "total_amount"
+                ),
+                OpeningSource(
+                    BookingFinancials.objects.filter(booking__customer_id=customer_id),
+                    F("refunded_amount") - F("paid_amount"),
+                ),
+                OpeningSource(
+                    Token.objects.filter(customer_id=customer_id).exclude(
+                        status="refunded"
+                    ),
+                    -F("amount"),
+                ),
+            ]
         )
 
         total_amount = round(booking_amount, 2)
-        remaining_amount = round(booking_amount - paid_amount - token_amount, 2)
+        remaining_amount = round(remaining_amount, 2)
 
         response_data = {
             "customer_info": customer_info,
@@ -860,10 +705,34 @@ class CustomerLedgerView(APIView):
         return Response(response_data)
 
 
-class VendorLedgerView(APIView):
+class PartyLedgerView(ReportCacheMixin, ProfilingMixin, APIView):
+    """
+    Ledger of a vendor or employee: expenses paid to them, their bank
+    deposits and their journal entry lines.
+    """
+
+    person_param = None
+    customer_fields = ("id", "name", "father_name", "contact", "address")
+    ledger_columns = [
+        "id",
+        "date",
+        "remarks",
+        "document",
+        "debit",
+        "credit",
+        "customer_name",
+        "reference",
+    ]
+
+    @property
+    def cache_owner(self):
+        return (self.person_param, Customers)
+
+    def get_deposit_columns(self):
+        raise NotImplementedError
+
     def get(self, request):
-        project_id = self.request.query_params.get("project_id")
-        vendor_id = self.request.query_params.get("vendor_id")
+        person_id = self.request.query_params.get(self.person_param)
         start_date = self.request.query_params.get("start_date")
         end_date = self.request.query_params.get("end_date")
 
@@ -876,97 +745,51 @@ class VendorLedgerView(APIView):
             )
             query_filters &= Q(date__gte=start_date) & Q(date__lte=end_date)
 
-        outgoing_fund_debit = (
-            OutgoingFund.objects.filter(payee=vendor_id, date__lt=start_date)
-            .aggregate(total_debit=Sum("amount", output_field=FloatField()))
-            .get("total_debit", 0.0)
-            or 0.0
-        )
-        bank_deposit_debit = (
-            BankDepositTransactions.objects.filter(
-                customer_id=vendor_id, date__lt=start_date
-            )
-            .aggregate(total_debit=Sum(Abs(F("amount")), output_field=FloatField()))
-            .get("total_debit", 0.0)
-            or 0.0
-        )
-        journal_data = JournalEntryLine.objects.filter(
-            person_id=vendor_id, journal_entry__date__lt=start_date
-        ).aggregate(
-            total_credit=Sum("credit", output_field=FloatField()),
-            total_debit=Sum("debit", output_field=FloatField()),
-        )
-        journal_credit = journal_data.get("total_credit", 0.0) or 0.0
-        journal_debit = journal_data.get("total_debit", 0.0) or 0.0
-        journal_balance = journal_credit - journal_debit
-        opening_balance = journal_balance - bank_deposit_debit - outgoing_fund_debit
-
-        expense_data = (
-            OutgoingFund.objects.filter(query_filters, payee=vendor_id)
-            .select_related("payee")
-            .values(
-                "id",
-                "date",
-                "remarks",
-                document=F("id"),
-                debit=F("amount"),
+        sources = [
+            LedgerSource(
+                OutgoingFund.objects.filter(query_filters, payee=person_id),
+                id="id",
+                date="date",
+                remarks="remarks",
+                document="id",
+                debit="amount",
                 credit=Value(0.0),
-                customer_name=F("payee__name"),
-                reference=Value("Expenses", output_field=CharField()),
-            )
-        )
-
-        bank_deposit_data = (
-            BankDepositTransactions.objects.filter(query_filters, customer_id=vendor_id)
-            .select_related("customer")
-            .values(
-                "id",
-                "remarks",
-                "date",
-                document=F("bank_deposit"),
-                 debit=Case(
-                    When(amount__lte=0, then=Abs(F("amount"))),
-                    default=Value(0.0),
+                customer_name="payee__name",
+                reference=Value("Expenses"),
+            ),
+            LedgerSource(
+                BankDepositTransactions.objects.filter(
+                    query_filters, customer_id=person_id
                 ),
-                credit=Case(
-                    When(amount__gt=0, then=Abs(F("amount"))),
-                    default=Value(0.0),
-                ),
-                customer_name=F("customer__name"),
-                reference=Value("Deposits", output_field=CharField()),
-            )
-        )
-
-        journal_data = (
-            JournalEntryLine.objects.filter(journal_filters, person_id=vendor_id)
-            .select_related("person")
-            .values(
-                "id",
-                "credit",
-                "debit",
-                remarks=F("description"),
-                document=F("journal_entry"),
-                date=F("journal_entry__date"),
-                customer_name=F("person__name"),
-                reference=Value("Journal", output_field=CharField()),
-            )
-        )
-
-        # Combine and sort by date
-        combined_data = sorted(
-            list(expense_data) + list(bank_deposit_data) + list(journal_data),
-            key=lambda x: x["date"],
+                id="id",
+                remarks="remarks",
+                date="date",
+                customer_name="customer__name",
+                reference=Value("Deposits"),
+                **self.get_deposit_columns(),
+            ),
+            LedgerSource(
+                JournalEntryLine.objects.filter(journal_filters, person_id=person_id),
+                id="id",
+                credit="credit",
+                debit="debit",
+                remarks="description",
+                document="journal_entry",
+                date="journal_entry__date",
+                customer_name="person__name",
+                reference=Value("Journal"),
+            ),
+        ]
+        opening_balance, combined_data, current_balance = build_ledger(
+            sources,
+            self.ledger_columns,
+            get_opening_balance("vendor", person_id, start_date),
         )
 
-        current_balance = opening_balance
-
-        for entry in combined_data:
-            current_balance += entry["credit"] - entry["debit"]
-            entry["balance"] = current_balance
         # Fetch customer information
         customer_info = (
-            Customers.objects.filter(id=vendor_id)
-            .values("id", "name", "father_name", "contact", "address")
+            Customers.objects.filter(id=person_id)
+            .values(*self.customer_fields)
             .first()
         )
 
@@ -980,548 +803,444 @@ class VendorLedgerView(APIView):
         return Response(response_data)
 
 
-class EmployeeLedgerView(APIView):
+class VendorLedgerView(PartyLedgerView):
+    person_param = "vendor_id"
+
+    def get_deposit_columns(self):
+        return {
+            "document": "bank_deposit",
+            "debit": Case(
+                When(amount__lte=0, then=Abs(F("amount"))),
+                default=Value(0.0),
+                output_field=FloatField(),
+            ),
+            "credit": Case(
+                When(amount__gt=0, then=Abs(F("amount"))),
+                default=Value(0.0),
+                output_field=FloatField(),
+            ),
+        }
+
+
+class EmployeeLedgerView(PartyLedgerView):
+    person_param = "employee_id"
+    customer_fields = ("id", "name", "father_name", "contact", "designation", "address")
+
+    def get_deposit_columns(self):
+        return {"document": "id", "debit": Abs(F("amount")), "credit": Value(0.0)}
+
+
+class PlotLedgerView(ReportCacheMixin, ProfilingMixin, APIView):
+    """
+    Ledger of a plot and its sub-plots: one entry per booking of each plot,
+    one per token on a plot without a booking, or an empty entry.
+
+    Every kind of record is loaded once for the whole plot family and then
+    grouped per plot and booking, so the number of queries does not depend
+    on how many plots and bookings there are.
+    """
+
+    cache_owner = ("plot_id", Plots)
+
     def get(self, request):
-        project_id = self.request.query_params.get("project_id")
-        vendor_id = self.request.query_params.get("employee_id")
+        plot_id = self.request.query_params.get("plot_id")
         start_date = self.request.query_params.get("start_date")
         end_date = self.request.query_params.get("end_date")
 
-        journal_filters = Q()
-        query_filters = Q()
+        if not plot_id:
+            return Response({"error": "plot_id parameter is required"}, status=400)
 
-        if start_date and end_date:
-            journal_filters &= Q(journal_entry__date__gte=start_date) & Q(
-                journal_entry__date__lte=end_date
+        try:
+            start_date = (
+                datetime.strptime(start_date, "%Y-%m-%d").date() if start_date else None
+            )
+            end_date = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else None
+        except ValueError:
+            return Response(
+                {"error": "Invalid date format. Use YYYY-MM-DD."}, status=400
             )
-            query_filters &= Q(date__gte=start_date) & Q(date__lte=end_date)
 
-        outgoing_fund_debit = (
-            OutgoingFund.objects.filter(payee=vendor_id, date__lt=start_date)
-            .aggregate(total_debit=Sum("amount", output_field=FloatField()))
-            .get("total_debit", 0.0)
-            or 0.0
-        )
-        bank_deposit_debit = (
-            BankDepositTransactions.objects.filter(
-                customer_id=vendor_id, date__lt=start_date
+        try:
+            plots = list(
+                Plots.objects.filter(Q(id=plot_id) | Q(parent_plot_id=plot_id))
+                .select_related("block")
+                .order_by("id")
             )
-            .aggregate(total_debit=Sum(Abs(F("amount")), output_field=FloatField()))
-            .get("total_debit", 0.0)
-            or 0.0
-        )
-        journal_data = JournalEntryLine.objects.filter(
-            person_id=vendor_id, journal_entry__date__lt=start_date
-        ).aggregate(
-            total_credit=Sum("credit", output_field=FloatField()),
-            total_debit=Sum("debit", output_field=FloatField()),
-        )
-        journal_credit = journal_data.get("total_credit", 0.0) or 0.0
-        journal_debit = journal_data.get("total_debit", 0.0) or 0.0
-        journal_balance = journal_credit - journal_debit
-        opening_balance = journal_balance - bank_deposit_debit - outgoing_fund_debit
-
-        expense_data = (
-            OutgoingFund.objects.filter(query_filters, payee=vendor_id)
-            .select_related("payee")
-            .values(
+            plots.sort(key=lambda plot: str(plot.id) != str(plot_id))
+            if not plots or str(plots[0].id) != str(plot_id):
+                return Response({"error": "Plot not found"}, status=404)
+            return Response(self.build_ledgers(plots, start_date, end_date))
+
+        except ValidationError as e:
+            return Response({"error": str(e)}, status=400)
+
+    def in_period(self, value, start_date, end_date):
+        if start_date and value < start_date:
+            return False
+        if end_date and value > end_date:
+            return False
+        return True
+
+    def before_period(self, value, start_date):
+        return bool(start_date) and value < start_date
+
+    def load_data(self, plots):
+        """Every record of the plot family, grouped by plot, booking and token."""
+        plot_ids = [plot.id for plot in plots]
+
+        booking_plots = defaultdict(list)
+        for row in (
+            Booking.plots.through.objects.filter(plots_id__in=plot_ids)
+            .order_by("booking_id")
+            .values("plots_id", "booking_id")
+        ):
+            booking_plots[row["plots_id"]].append(row["booking_id"])
+
+        bookings = {
+            booking["id"]: booking
+            for booking in Booking.objects.filter(
+                id__in={
+                    booking_id
+                    for booking_ids in booking_plots.values()
+                    for booking_id in booking_ids
+                }
+            ).values(
                 "id",
-                "date",
                 "remarks",
-                document=F("id"),
-                debit=F("amount"),
-                credit=Value(0.0),
-                customer_name=F("payee__name"),
-                reference=Value("Expenses", output_field=CharField()),
+                "status",
+                "booking_id",
+                "booking_date",
+                "total_amount",
+                "token_id",
+                "customer_id",
+                "customer__name",
+                "customer__father_name",
+                "customer__contact",
+                "customer__address",
+                "dealer_id",
+                "dealer__name",
             )
-        )
+        }
 
-        bank_deposit_data = (
-            BankDepositTransactions.objects.filter(query_filters, customer_id=vendor_id)
-            .select_related("customer")
+        token_plots = defaultdict(set)
+        for row in Token.plot.through.objects.filter(plots_id__in=plot_ids).values(
+            "plots_id", "token_id"
+        ):
+            token_plots[row["token_id"]].add(row["plots_id"])
+        token_ids = set(token_plots) | {
+            booking["token_id"] for booking in bookings.values() if booking["token_id"]
+        }
+        tokens = {
+            token["id"]: token
+            for token in Token.objects.filter(id__in=token_ids)
+            .annotate(
+                has_booking=Exists(Booking.objects.filter(token_id=OuterRef("pk")))
+            )
             .values(
                 "id",
-                "remarks",
                 "date",
-                document=F("id"),
-                debit=Abs(F("amount")),
-                credit=Value(0.0),
-                customer_name=F("customer__name"),
-                reference=Value("Deposits", output_field=CharField()),
+                "refund_date",
+                "remarks",
+                "amount",
+                "status",
+                "document_number",
+                "has_booking",
+                "customer_id",
+                "customer__name",
+                "customer__father_name",
+                "customer__contact",
+                "customer__address",
             )
-        )
+            .order_by("id")
+        }
 
-        journal_data = (
-            JournalEntryLine.objects.filter(journal_filters, person_id=vendor_id)
-            .select_related("person")
+        payments = defaultdict(list)
+        for payment in (
+            IncomingFund.objects.filter(
+                booking_id__in=list(bookings), reference_plot_id__in=plot_ids
+            )
             .values(
                 "id",
-                "credit",
-                "debit",
-                remarks=F("description"),
-                document=F("journal_entry"),
-                date=F("journal_entry__date"),
-                customer_name=F("person__name"),
-                reference=Value("Journal", output_field=CharField()),
+                "date",
+                "remarks",
+                "reference",
+                "booking_id",
+                "reference_plot_id",
+                "amount",
+                "document_number",
+            )
+            .order_by("id")
+        ):
+            payments[(payment["booking_id"], payment["reference_plot_id"])].append(
+                payment
+            )
+
+        resales = defaultdict(list)
+        for resale in (
+            PlotResale.objects.filter(booking_id__in=list(bookings))
+            .values("id", "date", "remarks", "booking_id", "company_amount_paid")
+            .order_by("id")
+        ):
+            resales[resale["booking_id"]].append(resale)
+
+        messages = defaultdict(list)
+        for message in (
+            CustomerMessages.objects.filter(booking_id__in=list(bookings))
+            .prefetch_related("files")
+            .order_by("id")
+        ):
+            messages[message.booking_id].append(message)
+
+        return {
+            "booking_plots": booking_plots,
+            "bookings": bookings,
+            "token_plots": token_plots,
+            "tokens": tokens,
+            "payments": payments,
+            "resales": resales,
+            "messages": messages,
+        }
+
+    def customer_info(self, row):
+        return {
+            "id": row["customer_id"],
+            "name": row["customer__name"],
+            "father_name": row["customer__father_name"],
+            "contact": row["customer__contact"],
+            "address": row["customer__address"],
+        }
+
+    def token_entries(self, token):
+        entries = [
+            {
+                "id": token["id"],
+                "date": token["date"],
+                "remarks": token["remarks"],
+                "debit": token["amount"],
+                "credit": 0.0,
+                "document": token["document_number"],
+                "customer_name": token["customer__name"],
+                "reference": "token",
+            }
+        ]
+        refund = {
+            "id": token["id"],
+            "date": token["refund_date"],
+            "remarks": token["remarks"],
+            "debit": 0.0,
+            "credit": token["amount"],
+            "document": token["document_number"],
+            "customer_name": token["customer__name"],
+            "reference": "tokenRefund",
+        }
+        return entries, refund
+
+    def message_data(self, message):
+        return {
+            "id": message.id,
+            "user": message.user_id,
+            "booking": message.booking_id,
+            "date": message.date,
+            "created_at": message.created_at,
+            "updated_at": message.updated_at,
+            "notes": message.notes,
+            "follow_up": message.follow_up,
+            "follow_up_message": message.follow_up_message,
+            "files": [
+                {
+                    "id": file.id,
+                    "file": file.file.url,
+                    "description": file.description,
+                    "type": file.type,
+                    "created_at": file.created_at,
+                    "updated_at": file.updated_at,
+                }
+                for file in message.files.all()
+            ],
+        }
+
+    def booking_ledger(self, plot, booking, data, plot_data, start_date, end_date):
+        plot_payments = data["payments"][(booking["id"], plot.id)]
+        booking_resales = data["resales"][booking["id"]]
+        token = data["tokens"].get(booking["token_id"])
+
+        token_data = []
+        if (
+            token
+            and plot.id in data["token_plots"][token["id"]]
+            and self.in_period(token["date"], start_date, end_date)
+        ):
+            token_data, refund = self.token_entries(token)
+            if token["status"] == "refunded":
+                token_data.append(refund)
+
+        booking_data = []
+        if self.in_period(booking["booking_date"], start_date, end_date):
+            booking_data.append(
+                {
+                    "id": booking["id"],
+                    "remarks": booking["remarks"],
+                    "status": booking["status"],
+                    "document": booking["booking_id"],
+                    "credit": booking["total_amount"],
+                    "debit": 0.0,
+                    "date": booking["booking_date"],
+                    "customer_name": booking["customer__name"],
+                    "reference": "booking",
+                }
             )
-        )
 
-        # Combine and sort by date
+        payment_data = [
+            {
+                "id": payment["id"],
+                "date": payment["date"],
+                "remarks": payment["remarks"],
+                "reference": payment["reference"],
+                "booking_id": payment["booking_id"],
+                "credit": payment["amount"] if payment["reference"] == "refund" else 0.0,
+                "debit": (
+                    payment["amount"]
+                    if payment["reference"] in ["payment", "Discount"]
+                    else 0.0
+                ),
+                "document": payment["document_number"],
+                "customer_name": booking["customer__name"],
+            }
+            for payment in plot_payments
+            if self.in_period(payment["date"], start_date, end_date)
+        ]
+
+        resale_data = [
+            {
+                "id": resale["id"],
+                "date": resale["date"],
+                "remarks": resale["remarks"],
+                "debit": resale["company_amount_paid"],
+                "credit": 0.0,
+                "document": resale["id"],
+                "customer_name": booking["customer__name"],
+                "reference": "close booking",
+            }
+            for resale in booking_resales
+            if self.in_period(resale["date"], start_date, end_date)
+        ]
+
         combined_data = sorted(
-            list(expense_data) + list(bank_deposit_data) + list(journal_data),
+            token_data + booking_data + payment_data + resale_data,
             key=lambda x: x["date"],
         )
 
+        def signed_payment(payment):
+            if payment["reference"] == "payment":
+                return payment["amount"]
+            if payment["reference"] == "refund":
+                return -payment["amount"]
+            return 0
+
+        booking_amount = (
+            booking["total_amount"]
+            if self.before_period(booking["booking_date"], start_date)
+            else 0.0
+        )
+        paid_amount = sum(
+            signed_payment(payment)
+            for payment in plot_payments
+            if self.before_period(payment["date"], start_date)
+        )
+        token_amount = (
+            token["amount"]
+            if token and self.before_period(token["date"], start_date)
+            else 0.0
+        )
+        resale_amount = sum(
+            resale["company_amount_paid"]
+            for resale in booking_resales
+            if self.before_period(resale["date"], start_date)
+        )
+        opening_balance = booking_amount - paid_amount - token_amount - resale_amount
         current_balance = opening_balance
 
         for entry in combined_data:
             current_balance += entry["credit"] - entry["debit"]
             entry["balance"] = current_balance
-        # Fetch customer information
-        customer_info = (
-            Customers.objects.filter(id=vendor_id)
-            .values("id", "name", "father_name", "contact", "designation", "address")
-            .first()
+
+        plot_amount = booking["total_amount"]
+        paid_amount = sum(signed_payment(payment) for payment in plot_payments)
+        token_amount = (
+            token["amount"] if token and token["status"] != "refunded" else 0.0
         )
 
-        response_data = {
-            "customer_info": customer_info,
+        return {
+            "plot_data": plot_data,
+            "customer_info": [self.customer_info(booking)],
+            "booking_data": booking_data,
+            "dealer_info": (
+                [{"dealer_id": booking["dealer_id"], "dealer__name": booking["dealer__name"]}]
+                if booking["dealer_id"]
+                else []
+            ),
+            "customer_messages": [
+                self.message_data(message) for message in data["messages"][booking["id"]]
+            ],
+            "total_amount": plot_amount,
+            "remaining_amount": plot_amount - token_amount - paid_amount,
             "opening_balance": opening_balance,
             "closing_balance": current_balance,
             "transactions": combined_data,
         }
 
-        return Response(response_data)
+    def token_ledger(self, token, plot_data):
+        plot_amount = plot_data.get("total")
+        token_amount = token["amount"] if token["status"] != "refunded" else 0.0
 
+        combined_data, refund = self.token_entries(token)
+        if token["status"].lower() == "refunded":
+            combined_data.append(refund)
+        combined_data.sort(key=lambda x: x["date"])
 
-class PlotLedgerView(APIView):
-    def get(self, request):
-        plot_id = self.request.query_params.get("plot_id")
-        start_date = self.request.query_params.get("start_date")
-        end_date = self.request.query_params.get("end_date")
+        opening_balance = plot_amount
+        current_balance = opening_balance
 
-        if not plot_id:
-            return Response({"error": "plot_id parameter is required"}, status=400)
+        for entry in combined_data:
+            current_balance += entry["credit"] - entry["debit"]
+            entry["balance"] = current_balance
 
-        try:
-            parent_plot = Plots.objects.filter(id=plot_id).first()
-            child_plots = Plots.objects.filter(parent_plot_id=plot_id)
-            plots = [parent_plot] + list(child_plots)
-            plot_ids = [plot.id for plot in plots]
-            result = []
-
-            for plot_id in plot_ids:
-                bookings = Booking.objects.filter(plots=plot_id)
-
-                if bookings.exists():
-                    for booking in bookings:
-                        booking_id = booking.id
-
-                        booking_data = (
-                            Booking.objects.filter(
-                                id=booking_id,
-                                booking_date__gte=start_date,
-                                booking_date__lte=end_date,
-                            )
-                            .select_related("customer")
-                            .values(
-                                "id",
-                                "remarks",
-                                "status",
-                                document=F("booking_id"),
-                                credit=F("total_amount"),
-                                debit=Value(0.0),
-                                date=F("booking_date"),
-                                customer_name=F("customer__name"),
-                                reference=Value("booking", output_field=CharField()),
-                            )
-                        )
-
-                        payment_data = (
-                            IncomingFund.objects.filter(
-                                booking_id=booking_id,
-                                reference_plot=plot_id,
-                                date__gte=start_date,
-                                date__lte=end_date,
-                            )
-                            .select_related("booking__customer")
-                            .values(
-                                "id",
-                                "date",
-                                "remarks",
-                                "reference",
-                                "booking_id",
-                                credit=Case(
-                                    When(reference="refund", then=F("amount")),
-                                    default=Value(0),
-                                    output_field=FloatField(),
-                                ),
-                                debit=Case(
-                                    When(reference__in=["payment", "Discount"], then=F("amount")),
-                                    default=Value(0),
-                                    output_field=FloatField(),
-                                ),
-                                document=F("document_number"),
-                                customer_name=F("booking__customer__name"),
-                            )
-                        )
-
-
-                        # Query for normal tokens
-                        normal_tokens = Token.objects.filter(
-                                plot=plot_id,
-                                booking=booking_id,
-                                date__gte=start_date,
-                                date__lte=end_date,
-                            ).select_related("customer").values(
-                                "id",
-                                "date",
-                                "remarks",
-                                debit=F("amount"),
-                                credit=Value(0.0),
-                                document=F("document_number"),
-                                customer_name=F("customer__name"),
-                                reference=Value("token", output_field=CharField()),
-                            )
-
-                        # Query for refunded tokens
-                        refunded_tokens = Token.objects.filter(
-                            plot=plot_id,
-                            booking=booking_id,
-                            date__gte=start_date,
-                            date__lte=end_date,
-                            status="refunded",
-                        ).select_related("customer").values(
-                            "id",
-                            "refund_date",
-                            "remarks",
-                            debit=Value(0.0),
-                            credit=F("amount"),
-                            document=F("document_number"),
-                            customer_name=F("customer__name"),
-                            reference=Value("tokenRefund", output_field=CharField()),
-                        )
-
-                        # Combine the two querysets
-                        token_data = normal_tokens.union(refunded_tokens)
-                        
-
-                        resale_data = (
-                            PlotResale.objects.filter(
-                                booking=booking_id,
-                                date__gte=start_date,
-                                date__lte=end_date,
-                            )
-                            .select_related("customer")
-                            .values(
-                                "id",
-                                "date",
-                                "remarks",
-                                debit=F("company_amount_paid"),
-                                credit=Value(0.0),
-                                document=F("id"),
-                                customer_name=F("booking__customer__name"),
-                                reference=Value(
-                                    "close booking", output_field=CharField()
-                                ),
-                            )
-                        )
-
-                        combined_data = sorted(
-                            list(token_data)
-                            + list(booking_data)
-                            + list(payment_data)
-                            + list(resale_data),
-                            key=lambda x: x["date"],
-                        )
-
-                        booking_amount = (
-                            Booking.objects.filter(
-                                id=booking_id, booking_date__lt=start_date
-                            ).aggregate(
-                                total_amount=Coalesce(
-                                    Sum("total_amount"),
-                                    Value(0, output_field=FloatField()),
-                                )
-                            )[
-                                "total_amount"
-                            ]
-                            or 0.0
-                        )
-
-                        paid_amount = (
-                            IncomingFund.objects.filter(
-                                booking_id=booking_id,
-                                reference_plot=plot_id,
-                                date__lt=start_date,
-                            ).aggregate(
-                                total_amount=Sum(
-                                    Case(
-                                        When(reference="payment", then=F("amount")),
-                                        When(reference="refund", then=-F("amount")),
-                                        default=Value(0),
-                                        output_field=FloatField(),
-                                    )
-                                )
-                            )[
-                                "total_amount"
-                            ]
-                            or 0.0
-                        )
-
-                        token_amount = (
-                            Token.objects.filter(
-                                booking=booking_id, date__lt=start_date
-                            ).aggregate(
-                                total_amount=Coalesce(
-                                    Sum("amount"), Value(0, output_field=FloatField())
-                                )
-                            )[
-                                "total_amount"
-                            ]
-                            or 0.0
-                        )
-
-                        resale_amount = (
-                            PlotResale.objects.filter(
-                                booking=booking_id, date__lt=start_date
-                            ).aggregate(
-                                total_amount=Coalesce(
-                                    Sum("company_amount_paid"),
-                                    Value(0, output_field=FloatField()),
-                                )
-                            )[
-                                "total_amount"
-                            ]
-                            or 0.0
-                        )
-
-                        opening_balance = (
-                            booking_amount - paid_amount - token_amount - resale_amount
-                        )
-                        current_balance = opening_balance
-
-                        for entry in combined_data:
-                            current_balance += entry["credit"] - entry["debit"]
-                            entry["balance"] = current_balance
-
-                        customer_info = Customers.objects.filter(
-                            bookings__id=booking_id
-                        ).values("id", "name", "father_name", "contact", "address")
-
-                        plot_query = Plots.objects.get(id=plot_id)
-                        plot_serializer = PlotsSerializer(plot_query)
-
-                        customer_messages = CustomerMessages.objects.filter(
-                            booking_id=booking_id
-                        ).prefetch_related("files")
-                        customer_messages_data = [
-                            {
-                                "id": message.id,
-                                "user": message.user_id,
-                                "booking": message.booking_id,
-                                "date": message.date,
-                                "created_at": message.created_at,
-                                "updated_at": message.updated_at,
-                                "notes": message.notes,
-                                "follow_up": message.follow_up,
-                                "follow_up_message": message.follow_up_message,
-                                "files": [
-                                    {
-                                        "id": file.id,
-                                        "file": file.file.url,
-                                        "description": file.description,
-                                        "type": file.type,
-                                        "created_at": file.created_at,
-                                        "updated_at": file.updated_at,
-                                    }
-                                    for file in message.files.all()
-                                ],
-                            }
-                            for message in customer_messages
-                        ]
-
-                        dealer_info = (
-                            Booking.objects.filter(id=booking_id)
-                            .exclude(dealer_id__isnull=True)
-                            .select_related("dealer")
-                            .values("dealer_id", "dealer__name")
-                        )
-
-                        plot_data = plot_serializer.data
-                        plot_amount = (
-                            Booking.objects.filter(id=booking_id).aggregate(
-                                total_amount=Coalesce(
-                                    Sum("total_amount"),
-                                    Value(0, output_field=FloatField()),
-                                )
-                            )["total_amount"]
-                            or 0.0
-                        )
-                        paid_amount = (
-                            IncomingFund.objects.filter(
-                                booking_id=booking_id,
-                                reference_plot=plot_id,
-                            ).aggregate(
-                                total_amount=Sum(
-                                    Case(
-                                        When(reference="payment", then=F("amount")),
-                                        When(reference="refund", then=-F("amount")),
-                                        default=Value(0),
-                                        output_field=FloatField(),
-                                    )
-                                )
-                            )[
-                                "total_amount"
-                            ]
-                            or 0.0
-                        )
-
-                        token_amount = (
-                            Token.objects.filter(booking=booking_id).exclude(status="refunded").aggregate(
-                                total_amount=Coalesce(
-                                    Sum("amount"), Value(0, output_field=FloatField())
-                                )
-                            )["total_amount"]
-                            or 0.0
-                        )
-
-                        # resale_amount = (
-                        #     PlotResale.objects.filter(booking=booking_id).aggregate(
-                        #         total_amount=Coalesce(
-                        #             Sum("company_amount_paid"),
-                        #             Value(0, output_field=FloatField()),
-                        #         )
-                        #     )["total_amount"]
-                        #     or 0.0
-                        # )
-
-                        remaining_amount = (
-                            plot_amount - token_amount - paid_amount
-                            # plot_amount - token_amount - paid_amount - resale_amount
-                        )
-
-                        response_data = {
-                            "plot_data": plot_data,
-                            "customer_info": list(customer_info),
-                            "booking_data": list(booking_data),
-                            "dealer_info": list(dealer_info),
-                            "customer_messages": customer_messages_data,
-                            "total_amount": plot_amount,
-                            "remaining_amount": remaining_amount,
-                            "opening_balance": opening_balance,
-                            "closing_balance": current_balance,
-                            "transactions": combined_data,
-                        }
-                        result.append(response_data)
-
-                token_data_no_booking = (
-                    Token.objects.filter(plot=plot_id, booking__isnull=True)
-                    .select_related("customer")
-                    .values(
-                        "id",
-                        "date",
-                        "remarks",
-                        debit=F("amount"),
-                        credit=Value(0.0),
-                        document=F("document_number"),
-                        customer_name=F("customer__name"),
-                        reference=Value("token", output_field=CharField()),
+        return {
+            "plot_data": plot_data,
+            "customer_info": [self.customer_info(token)],
+            "booking_data": [],
+            "dealer_info": [],
+            "customer_messages": [],
+            "total_amount": plot_amount,
+            "remaining_amount": plot_amount - token_amount,
+            "opening_balance": opening_balance,
+            "closing_balance": current_balance,
+            "transactions": combined_data,
+        }
+
+    def build_ledgers(self, plots, start_date, end_date):
+        data = self.load_data(plots)
+        result = []
+
+        for plot in plots:
+            plot_data = PlotsSerializer(plot).data
+
+            for booking_id in data["booking_plots"][plot.id]:
+                booking = data["bookings"][booking_id]
+                result.append(
+                    self.booking_ledger(
+                        plot, booking, data, plot_data, start_date, end_date
                     )
                 )
 
-                if token_data_no_booking.exists():
-                    for token in token_data_no_booking:
-                        token_id = token["id"]
-                        plot_query = Plots.objects.get(id=plot_id)
-                        plot_serializer = PlotsSerializer(plot_query)
-                        plot_data = plot_serializer.data
-                        plot_amount = plot_data.get("total")
-
-                        token_amount = (
-                            Token.objects.filter(id=token_id).exclude(status="refunded").aggregate(
-                                total_amount=Coalesce(
-                                    Sum("amount"), Value(0, output_field=FloatField())
-                                )
-                            )["total_amount"]
-                            or 0.0
-                        )
-                        remaining_amount = plot_amount - token_amount
-
-                        combined_token_data = (
-                        Token.objects.filter(id=token_id)
-                        .select_related("customer")
-                        .values(
-                            "id",
-                            "date",
-                            "remarks",
-                            debit=F("amount"),
-                            credit=Value(0.0),
-                            document=F("document_number"),
-                            customer_name=F("customer__name"),
-                            reference=Value("token", output_field=CharField()),
-                        )
-                    )
+            for token in data["tokens"].values():
+                if plot.id in data["token_plots"][token["id"]] and not token["has_booking"]:
+                    result.append(self.token_ledger(token, plot_data))
 
-                        # Add refunded token data
-                        refunded_token_data = (
-                            Token.objects.filter(id=token_id, status__iexact="refunded")
-                            .select_related("customer")
-                            .values(
-                                "id",
-                                "refund_date",
-                                "remarks",
-                                debit=Value(0.0),
-                                credit=F("amount"),
-                                document=F("document_number"),
-                                customer_name=F("customer__name"),
-                                reference=Value("tokenRefund", output_field=CharField()),
-                            )
-                        )
-                        # Rename the refund_date to date to maintain consistency in the final combined data
-                        refunded_token_data = [
-                            {**entry, "date": entry.pop("refund_date")} for entry in refunded_token_data
-                        ]
-
-
-                        # Combine token and refunded token data
-                        combined_data = sorted(
-                            list(combined_token_data) + list(refunded_token_data),
-                            key=lambda x: x["date"],
-                        )
-
-                        opening_balance = plot_amount
-                        current_balance = opening_balance
-
-                        for entry in combined_data:
-                            current_balance += entry["credit"] - entry["debit"]
-                            entry["balance"] = current_balance
-
-                        customer_info = Customers.objects.filter(
-                            token__id=token_id
-                        ).values("id", "name", "father_name", "contact", "address")
-
-                        response_data = {
-                            "plot_data": plot_data,
-                            "customer_info": list(customer_info),
-                            "booking_data": [],
-                            "dealer_info": [],
-                            "customer_messages": [],
-                            "total_amount": plot_amount,
-                            "remaining_amount": remaining_amount,
-                            "opening_balance": opening_balance,
-                            "closing_balance": current_balance,
-                            "transactions": combined_data,
-                        }
-                        result.append(response_data)
-
-                if not result:
-                    plot_query = Plots.objects.get(id=plot_id)
-                    plot_serializer = PlotsSerializer(plot_query)
-                    plot_data = plot_serializer.data
-                    plot_amount = plot_data.get("total")
-
-                    response_data = {
+            if not result:
+                plot_amount = plot_data.get("total")
+                result.append(
+                    {
                         "plot_data": plot_data,
                         "customer_info": [],
                         "booking_data": [],
@@ -1533,119 +1252,59 @@ class PlotLedgerView(APIView):
                         "closing_balance": plot_amount,
                         "transactions": [],
                     }
-                    result.append(response_data)
-
-            return Response(result)
+                )
 
-        except ValidationError as e:
-            return Response({"error": str(e)}, status=400)
+        return result
 
 
-class BalanceSheetView(APIView):
+class BalanceSheetView(ReportCacheMixin, ProfilingMixin, APIView):
 
     def get(self, request):
         project_id = self.request.query_params.get("project_id")
         start_date = self.request.query_params.get("start_date")
         end_date = self.request.query_params.get("end_date")
 
-        query_filters = Q()
-        if project_id:
-            query_filters &= Q(project_id=project_id)
+        if not (start_date and end_date):
+            start_date = end_date = None
 
-        if start_date and end_date:
-            query_filters &= Q(transaction_date__gte=start_date) & Q(
-                transaction_date__lte=end_date
-            )
-
-        banks = Bank.objects.filter(
-            main_type__in=["Asset", "Liabilities", "Equity"], project_id=project_id
+        banks, balances, roots = get_account_tree(
+            Q(main_type__in=["Asset", "Liabilities", "Equity"], project_id=project_id),
+            project_id=project_id,
+            start_date=start_date,
+            end_date=end_date,
         )
 
         main_type_dict = defaultdict(
             lambda: {
                 "total": 0,
-                "account_types": defaultdict(lambda: {"total": 0, "accounts": {}}),
+                "account_types": defaultdict(lambda: {"total": 0, "accounts": []}),
             }
         )
 
+        # Totals are aggregated under each account's own type
         for bank in banks:
-            main_type = bank.main_type
-            account_type = bank.account_type
-            bank_name = bank.name
-            bank_id = bank.id
-            parent_bank = bank.parent_account
-
-            # Calculate balance
-            transactions = BankTransaction.objects.filter(query_filters, bank=bank)
-            balance = sum(t.deposit for t in transactions) - sum(
-                t.payment for t in transactions
-            )
-
-            # Aggregate balances
-            main_type_dict[main_type]["total"] += balance
-            main_type_dict[main_type]["account_types"][account_type]["total"] += balance
-
-            # Create account entry if it doesn't exist
-            if (
-                bank.id
-                not in main_type_dict[main_type]["account_types"][account_type][
-                    "accounts"
-                ]
-            ):
-                main_type_dict[main_type]["account_types"][account_type]["accounts"][
-                    bank.id
-                ] = {
-                    "bank_name": bank_name,
-                    "bank_id": bank_id,
-                    "balance": balance,
-                    "sub_accounts": [],
-                }
-            else:
-                # Update balance if account already exists (e.g., as a sub-account added earlier)
-                main_type_dict[main_type]["account_types"][account_type]["accounts"][
-                    bank.id
-                ]["balance"] += balance
-
-            # If the bank has a parent, add it as a sub-account
-            if parent_bank:
-                parent_account_type = parent_bank.account_type
-                parent_main_type = parent_bank.main_type
-                if (
-                    parent_bank.id
-                    not in main_type_dict[parent_main_type]["account_types"][
-                        parent_account_type
-                    ]["accounts"]
-                ):
-                    main_type_dict[parent_main_type]["account_types"][
-                        parent_account_type
-                    ]["accounts"][parent_bank.id] = {
-                        "bank_name": parent_bank.name,
-                        "balance": 0,  # Initial balance is 0 since it will be updated by its own entry
-                        "sub_accounts": [],
-                    }
-                main_type_dict[parent_main_type]["account_types"][parent_account_type][
-                    "accounts"
-                ][parent_bank.id]["sub_accounts"].append(
-                    main_type_dict[main_type]["account_types"][account_type][
-                        "accounts"
-                    ][bank.id]
-                )
-                # Remove the sub-account from the main list to avoid duplication
-                del main_type_dict[main_type]["account_types"][account_type][
-                    "accounts"
-                ][bank.id]
+            balance = balances.get(bank.id, 0)
+            main_type_dict[bank.main_type]["total"] += balance
+            main_type_dict[bank.main_type]["account_types"][bank.account_type][
+                "total"
+            ] += balance
+
+        # Top level accounts carry their sub accounts
+        for bank, entry in roots:
+            main_type_dict[bank.main_type]["account_types"][bank.account_type][
+                "accounts"
+            ].append(entry)
 
         # Convert to the desired output format
         result = []
         for main_type, main_data in main_type_dict.items():
             account_types_list = []
             for account_type, account_data in main_data["account_types"].items():
-                accounts_list = list(account_data["accounts"].values())
                 account_types_list.append(
                     {
                         "account_type": account_type,
                         "total": account_data["total"],
-                        "accounts": accounts_list,
+                        "accounts": account_data["accounts"],
                     }
                 )
             result.append(
@@ -1659,7 +1318,7 @@ class BalanceSheetView(APIView):
         return Response(result)
 
 
-class ProfitReportView(APIView):
+class ProfitReportView(ReportCacheMixin, ProfilingMixin, APIView):
     def get(self, request):
         project_id = self.request.query_params.get("project_id")
         start_date = self.request.query_params.get("start_date")
@@ -1674,74 +1333,25 @@ class ProfitReportView(APIView):
             "Other_Expenses",
         ]
 
-        # Apply query filters for transactions
-        query_filters = Q()
-        if project_id:
-            query_filters &= Q(project_id=project_id)
-        if start_date and end_date:
-            query_filters &= Q(transaction_date__gte=start_date) & Q(
-                transaction_date__lte=end_date
-            )
+        if not (start_date and end_date):
+            start_date = end_date = None
 
-        # Filter banks based on allowed account types
-        banks = Bank.objects.filter(
-            account_type__in=allowed_account_types, project_id=project_id
+        banks, balances, roots = get_account_tree(
+            Q(account_type__in=allowed_account_types, project_id=project_id),
+            project_id=project_id,
+            start_date=start_date,
+            end_date=end_date,
+            balance_type=int,
         )
 
         # Initialize the structure for account types
         account_type_dict = defaultdict(lambda: {"total": 0, "accounts": []})
 
         for bank in banks:
-            account_type = bank.account_type
-            bank_name = bank.name
-            bank_id = bank.id
-            parent_bank = bank.parent_account
-
-            # Calculate balance for each bank
-            transactions = BankTransaction.objects.filter(query_filters, bank=bank)
-            balance = int(
-                sum(t.deposit for t in transactions)
-                - sum(t.payment for t in transactions)
-            )
-            # Create account entry
-            account_entry = {
-                "bank_name": bank_name,
-                "bank_id": bank_id,
-                "balance": balance,
-                "sub_accounts": [],
-            }
+            account_type_dict[bank.account_type]["total"] += balances.get(bank.id, 0)
 
-            # If the bank has a parent, add it as a sub-account to the parent entry
-            if parent_bank:
-                parent_entry = next(
-                    (
-                        acc
-                        for acc in account_type_dict[parent_bank.account_type][
-                            "accounts"
-                        ]
-                        if acc["bank_id"] == parent_bank.id
-                    ),
-                    None,
-                )
-                if not parent_entry:
-                    # Create parent entry if it doesn't exist
-                    parent_entry = {
-                        "bank_name": parent_bank.name,
-                        "bank_id": parent_bank.id,
-                        "balance": 0,
-                        "sub_accounts": [],
-                    }
-                    account_type_dict[parent_bank.account_type]["accounts"].append(
-                        parent_entry
-                    )
-                # Append current bank as a sub-account
-                parent_entry["sub_accounts"].append(account_entry)
-            else:
-                # Directly add the account if there's no parent
-                account_type_dict[account_type]["accounts"].append(account_entry)
-
-            # Update the total balance for the account type
-            account_type_dict[account_type]["total"] += balance
+        for bank, entry in roots:
+            account_type_dict[bank.account_type]["accounts"].append(entry)
 
         # Convert defaultdict to list format for final response
         result = [
@@ -1756,7 +1366,7 @@ class ProfitReportView(APIView):
         return Response(result)
 
 
-class IncomingPaymentsReport(APIView):
+class IncomingPaymentsReport(ReportCacheMixin, ProfilingMixin, APIView):
     def get(self, request):
         project_id = self.request.query_params.get("project_id")
         start_date = self.request.query_params.get("start_date")
@@ -1819,7 +1429,7 @@ class IncomingPaymentsReport(APIView):
         return Response(response_data)
 
 
-class OutgoingPaymentsReport(APIView):
+class OutgoingPaymentsReport(ReportCacheMixin, ProfilingMixin, APIView):
     def get(self, request):
         project_id = self.request.query_params.get("project_id")
         start_date = self.request.query_params.get("start_date")
@@ -1845,7 +1455,7 @@ class OutgoingPaymentsReport(APIView):
             .prefetch_related("booking__plots")
         )
         expense_payments = OutgoingFund.objects.filter(query_filters).select_related(
-            "bank"
+            "bank", "payee"
         )
         bank_deposit_payments = BankDepositTransactions.objects.filter(
             deposit_query_filters
@@ -1895,7 +1505,7 @@ class OutgoingPaymentsReport(APIView):
         return Response(response_data)
 
 
-class IncomingChequeReport(APIView):
+class IncomingChequeReport(ReportCacheMixin, ProfilingMixin, APIView):
     def get(self, request):
         project_id = self.request.query_params.get("project_id")
         start_date = self.request.query_params.get("start_date")
@@ -1951,7 +1561,7 @@ class IncomingChequeReport(APIView):
         return Response(combined_payments)
 
 
-class OutgoingChequeReport(APIView):
+class OutgoingChequeReport(ReportCacheMixin, ProfilingMixin, APIView):
     def get(self, request):
         project_id = self.request.query_params.get("project_id")
         start_date = self.request.query_params.get("start_date")
@@ -1977,12 +1587,12 @@ class OutgoingChequeReport(APIView):
                 payment_filters, reference="refund", payment_type="Cheque"
             )
             .select_related("booking__customer", "bank")
-            .prefetch_related("booking__plot")
+            .prefetch_related("booking__plots")
         )
 
         outgoing_payments = OutgoingFund.objects.filter(
             expense_filters, payment_type="Cheque"
-        ).select_related("bank")
+        ).select_related("bank", "payee")
 
         booking_payments_serialized = BookingPaymentsSerializer(
             booking_payments, many=True